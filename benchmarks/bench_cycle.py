@@ -0,0 +1,117 @@
+"""Measure whole scrape cycles against a local fake mirror.
+
+Usage:
+    python benchmarks/bench_cycle.py [ROWS] [VERSIONS] [LATENCY] [CYCLES]
+
+Starts a `mirror.Mirror` with three Debian arches and `VERSIONS` Ubuntu
+releases of `ROWS` files each, answering after `LATENCY` seconds, and times
+`ScraperThread._generate_feed` (scraping, updating and writing the feed and
+publishing it) for every repo:
+
+- ``cold`` - The first cycle with an empty feed and page cache.
+- ``unchanged`` - Nothing changed on the mirror, every page is a ``304``.
+- ``grown`` - Every listing has ten new files.
+
+The last two are run `CYCLES` times and the median is reported. Politeness
+limits are turned off and every request may go to the mirror at once since
+all the repos are on the one host.
+"""
+
+import pathlib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import mirror
+import results
+
+from linux_rss_server.__main__ import ScraperThread
+from linux_rss_server.config import (
+    Concurrency,
+    Config,
+    Politeness,
+    Repo,
+    RepoType,
+)
+from linux_rss_server.publisher import Publisher
+
+DEFAULT_CYCLES = 5
+WORKERS = 8
+
+
+def _config(url: str, tmp: str) -> Config:
+    return Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=[
+            Repo(
+                f'{url}/debian/{{arch}}',
+                ['amd64', 'arm64', 'i386'],
+                RepoType.debian,
+                'debian',
+            ),
+            Repo(f'{url}/ubuntu', None, RepoType.ubuntu, 'ubuntu'),
+        ],
+        rss_cache=pathlib.Path(tmp, 'feed.rss'),
+        start_at=None,
+        concurrency=Concurrency(workers=WORKERS, per_host=WORKERS),
+        politeness=Politeness(rate=0),
+    )
+
+
+def _cycle(scraper: ScraperThread) -> float:
+    started = time.perf_counter()
+    scraper._generate_feed(scraper.config.repos)
+    return time.perf_counter() - started
+
+
+def main(rows: int, versions: int, latency: float, cycles: int) -> list:
+    """Run the benchmark and return its results."""
+    measured = []
+    with (
+        mirror.Mirror(rows, versions, latency) as server,
+        tempfile.TemporaryDirectory() as tmp,
+    ):
+        scraper = ScraperThread(
+            _config(server.url, tmp),
+            threading.Event(),
+            Publisher(),
+        )
+        scraper._setup()
+        params = {'rows': rows, 'versions': versions, 'latency': latency}
+        measured.append(results.result('cold', _cycle(scraper), 's', **params))
+        entries = len(scraper.feed)
+        unchanged = [_cycle(scraper) for _ in range(cycles)]
+        measured.append(
+            results.result(
+                'unchanged',
+                statistics.median(unchanged),
+                's',
+                **params,
+            ),
+        )
+        grown = []
+        for _ in range(cycles):
+            server.grow(10)
+            grown.append(_cycle(scraper))
+        measured.append(
+            results.result('grown', statistics.median(grown), 's', **params),
+        )
+        scraper.feed.close()
+    print(f'{entries} entries, {server.requests} requests')
+    print(f'{"cycle":>10} {"seconds":>9}')
+    for result in measured:
+        print(f'{result["metric"]:>10} {result["value"]:>9.3f}')
+    return measured
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else mirror.DEFAULT_ROWS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else mirror.DEFAULT_VERSIONS,
+        float(sys.argv[3]) if len(sys.argv) > 3 else mirror.DEFAULT_LATENCY,
+        int(sys.argv[4]) if len(sys.argv) > 4 else DEFAULT_CYCLES,
+    )
@@ -0,0 +1,92 @@
+"""Measure the cost of appending to, writing and loading large feeds.
+
+Usage:
+    python benchmarks/bench_feed.py [ENTRIES ...]
+
+For each number of entries appends that many new entries (and re-appends an
+already known one after each, like every scrape cycle does) to an empty
+`feed.Feed` and reports the average cost of an append in the first and the
+last tenth of the run. With the dedup index the cost should stay flat as the
+feed grows. It then reports how long `Feed.dump` takes to write the RSS and
+how long `Feed.load` takes to reopen the feed.
+"""
+
+import pathlib
+import sys
+import tempfile
+import time
+
+import results
+
+from linux_rss_server.config import Config
+from linux_rss_server.feed import Feed
+
+DEFAULT_ENTRIES = (1_000, 10_000, 100_000)
+
+
+def _append(feed: Feed, entries: int) -> tuple[float, float]:
+    """Append `entries` entries and get the cost of the first and last."""
+    step = max(entries // 10, 1)
+    costs = []
+    started = time.perf_counter()
+    for index in range(entries):
+        url = f'https://cd.example.com/{index}/image-{index}.iso.torrent'
+        feed.append(f'image-{index}.iso.torrent', url)
+        feed.append(
+            'image-0.iso.torrent',
+            'https://cd.example.com/0/image-0.iso.torrent',
+        )
+        if (index + 1) % step == 0:
+            costs.append((time.perf_counter() - started) / step)
+            started = time.perf_counter()
+    return costs[0], costs[-1]
+
+
+def main(sizes: list[int]) -> list:
+    """Run the benchmark for each number of entries in `sizes`."""
+    measured = []
+    print(
+        f'{"entries":>9} {"us/append":>10} {"(last)":>10} {"dump s":>8} '
+        f'{"load s":>8}',
+    )
+    for entries in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            config = Config(
+                check_every=None,
+                healthcheck_url=None,
+                port=None,
+                repos=None,
+                rss_cache=pathlib.Path(tmp, 'feed.rss'),
+                start_at=None,
+            )
+            feed = Feed(config)
+            feed.load()
+            first, last = _append(feed, entries)
+            assert len(feed) == entries
+            started = time.perf_counter()
+            feed.dump()
+            dump = time.perf_counter() - started
+            feed.close()
+            started = time.perf_counter()
+            feed = Feed(config)
+            feed.load()
+            feed.append(
+                'image-0.iso.torrent',
+                'https://cd.example.com/0/image-0.iso.torrent',
+            )
+            load = time.perf_counter() - started
+            feed.close()
+        print(
+            f'{entries:>9} {first * 1e6:>10.1f} {last * 1e6:>10.1f} '
+            f'{dump:>8.3f} {load:>8.3f}',
+        )
+        measured += [
+            results.result('append', last * 1e6, 'us', entries=entries),
+            results.result('dump', dump, 's', entries=entries),
+            results.result('load', load, 's', entries=entries),
+        ]
+    return measured
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_ENTRIES)
@@ -0,0 +1,106 @@
+"""Compare link extraction with BeautifulSoup and the streaming parser.
+
+Usage:
+    python benchmarks/bench_links.py [ROWS ...]
+
+Builds synthetic Debian style directory listings with the given number of
+rows and times how long each implementation takes to find the torrent links
+in them along with the peak memory allocated while doing it.
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import bs4
+import results
+
+from linux_rss_server.scrapers import links
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_ROWS = (1_000, 10_000, 50_000)
+
+
+def listing(rows: int) -> bytes:
+    """Build a directory listing with `rows` files."""
+    lines = [
+        '<html><body><table>',
+        '<tr><th><a href="?C=N;O=D">Name</a></th><th>Size</th></tr>',
+    ]
+    for row in range(rows):
+        ext = '.iso.torrent' if row % 2 else '.iso'
+        lines.append(
+            f'<tr><td><a href="debian-{row}-amd64{ext}">debian-{row}</a>'
+            '</td><td align="right">2024-02-10 12:00</td>'
+            '<td align="right">1.2M</td></tr>',
+        )
+    lines.append('</table></body></html>')
+    return '\n'.join(lines).encode()
+
+
+def with_bs4(content: bytes) -> list[str]:
+    """Find the torrents the way the scrapers used to."""
+    found = []
+    soup = bs4.BeautifulSoup(content, features='lxml')
+    for tr in soup.find_all('tr'):
+        try:
+            _, ext = os.path.splitext(tr.td.a.attrs.get('href', ''))
+        except AttributeError:
+            continue
+        if ext == '.torrent':
+            found.append(tr.td.a.attrs['href'])
+    return found
+
+
+def with_stream(content: bytes) -> list[str]:
+    """Find the torrents with the streaming link extractor."""
+    chunks = (
+        content[i : i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)
+    )
+    return [
+        link.href
+        for link in links.iter_links(chunks)
+        if link.row_head and link.href.endswith('.torrent')
+    ]
+
+
+def measure(func, content: bytes) -> tuple[float, int, list[str]]:
+    """Return the seconds, peak bytes allocated, and result of `func`."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main(sizes: list[int]) -> list:
+    """Run the benchmark for each listing size in `sizes`."""
+    measured = []
+    print(f'{"rows":>8} {"impl":>7} {"seconds":>9} {"peak MiB":>9}')
+    for rows in sizes:
+        content = listing(rows)
+        expected = None
+        for name, func in (('bs4', with_bs4), ('stream', with_stream)):
+            elapsed, peak, result = measure(func, content)
+            if expected is None:
+                expected = result
+            assert result == expected, f'{name} found different links'
+            print(f'{rows:>8} {name:>7} {elapsed:>9.3f} {peak / 2**20:>9.1f}')
+            measured += [
+                results.result('seconds', elapsed, 's', rows=rows, impl=name),
+                results.result(
+                    'peak',
+                    peak / 2**20,
+                    'MiB',
+                    rows=rows,
+                    impl=name,
+                ),
+            ]
+    return measured
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS)
@@ -0,0 +1,168 @@
+"""Measure how the server engines hold up under many keep-alive clients.
+
+Usage:
+    python benchmarks/bench_server.py [CLIENTS] [SECONDS]
+
+Starts each server engine in its own process serving a 200 KiB feed and
+points `CLIENTS` concurrent keep-alive clients at it for `SECONDS` seconds.
+Half the clients poll with ``If-None-Match`` (like feed readers do) and half
+fetch the whole feed. Reports the requests per second and the median and
+99th percentile latency for each engine, serving the feed from memory and
+with ``sendfile`` from spooled files (``server.sendfile``).
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import pathlib
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import results
+
+from linux_rss_server.aioserver import AsyncServer
+from linux_rss_server.config import Server
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import ThreadedServer, request_handler_factory
+
+DEFAULT_CLIENTS = 200
+DEFAULT_SECONDS = 10
+FEED_SIZE = 200 * 1024
+
+
+def _serve(engine: str, spool: str, ready: multiprocessing.Queue):
+    """Serve a synthetic feed with `engine` until killed."""
+    # Keep the request log of the threaded engine out of the results.
+    sys.stderr = open(os.devnull, 'w')
+    publisher = Publisher(
+        pathlib.Path(spool) if spool else None,
+    )
+    publisher.publish(b'<rss>' + b'x' * FEED_SIZE + b'</rss>')
+    stop = threading.Event()
+    if engine == 'asyncio':
+        server = AsyncServer(
+            ('127.0.0.1', 0),
+            Server(engine=engine, max_connections=100_000),
+            publisher,
+        )
+        threading.Thread(
+            target=server.serve_forever,
+            args=(stop,),
+            daemon=True,
+        ).start()
+        server.wait_ready(5)
+    else:
+        server = ThreadedServer(
+            ('127.0.0.1', 0),
+            request_handler_factory(publisher),
+        )
+        threading.Thread(
+            target=server.serve_forever,
+            kwargs={'stop': stop},
+            daemon=True,
+        ).start()
+    ready.put((server.server_address, publisher.current.etag))
+    stop.wait()
+
+
+async def _read_response(reader: asyncio.StreamReader):
+    """Read one response from `reader`."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = 0
+    for line in head.split(b'\r\n'):
+        name, _, value = line.partition(b':')
+        if name.lower() == b'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+
+
+async def _client(
+    address: tuple,
+    request: bytes,
+    deadline: float,
+    latencies: list,
+):
+    """Send `request` over one connection until `deadline`."""
+    reader, writer = await asyncio.open_connection(*address)
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            await _read_response(reader)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+async def _load(address: tuple, etag: str, clients: int, seconds: float):
+    """Run `clients` clients against `address` for `seconds` seconds."""
+    fetch = b'GET / HTTP/1.1\r\nHost: bench\r\n\r\n'
+    poll = (
+        b'GET / HTTP/1.1\r\nHost: bench\r\nIf-None-Match: '
+        + etag.encode()
+        + b'\r\n\r\n'
+    )
+    latencies = []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(
+        *(
+            _client(address, poll if i % 2 else fetch, deadline, latencies)
+            for i in range(clients)
+        ),
+    )
+    return latencies
+
+
+def main(clients: int, seconds: float) -> list:
+    """Run the benchmark for each engine."""
+    measured = []
+    print(f'{"engine":>17} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+    for engine, spool in itertools.product(
+        ('threaded', 'asyncio'),
+        (False, True),
+    ):
+        ready = multiprocessing.Queue()
+        with tempfile.TemporaryDirectory() as tmp:
+            process = multiprocessing.Process(
+                target=_serve,
+                args=(engine, tmp if spool else None, ready),
+                daemon=True,
+            )
+            process.start()
+            try:
+                address, etag = ready.get(timeout=10)
+                latencies = asyncio.run(
+                    _load(address, etag, clients, seconds),
+                )
+            finally:
+                process.kill()
+                process.join()
+        quantiles = statistics.quantiles(latencies, n=100)
+        name = f'{engine}+sendfile' if spool else engine
+        print(
+            f'{name:>17} {len(latencies) / seconds:>9.0f} '
+            f'{quantiles[49] * 1e3:>8.2f} {quantiles[98] * 1e3:>8.2f}',
+        )
+        params = {'engine': name, 'clients': clients}
+        measured += [
+            results.result(
+                'throughput',
+                len(latencies) / seconds,
+                'req/s',
+                **params,
+            ),
+            results.result('p50', quantiles[49] * 1e3, 'ms', **params),
+            results.result('p99', quantiles[98] * 1e3, 'ms', **params),
+        ]
+    return measured
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CLIENTS,
+        float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SECONDS,
+    )
@@ -0,0 +1,162 @@
+"""Measure how fast the daemon starts serving the feed.
+
+Usage:
+    python benchmarks/bench_startup.py [ENTRIES] [RUNS]
+
+Reports the median over `RUNS` runs of:
+
+- ``import`` - The time to import the entry point, from
+  ``python -X importtime``.
+- ``first byte`` - The time from starting ``python -m linux_rss_server``
+  with a feed of `ENTRIES` items already on disk to the first byte of the
+  feed reaching a client, for each server engine, in-process and with
+  worker processes.
+
+The scraper has no repos to scrape so only the cost of starting up is
+measured. Serving must not wait for the scraping libraries to be imported or
+for the feed to be compressed, so these should stay in the milliseconds.
+"""
+
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import results
+
+DEFAULT_ENTRIES = 10_000
+DEFAULT_RUNS = 5
+TIMEOUT = 30
+SETUPS = (
+    ('threaded', 0),
+    ('asyncio', 0),
+    ('threaded', 2),
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _feed(entries: int) -> bytes:
+    """Build a synthetic RSS feed of `entries` items."""
+    items = ''.join(
+        f'<item><title>image-{entry}.iso.torrent</title>'
+        f'<link>https://cd.example.com/{entry}/image-{entry}.iso.torrent'
+        f'</link><guid>{entry}</guid></item>'
+        for entry in range(entries)
+    )
+    return f'<rss><channel>{items}</channel></rss>'.encode()
+
+
+def import_time() -> float:
+    """Get the seconds it takes to import the entry point."""
+    stderr = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            'import linux_rss_server.__main__',
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stderr
+    for line in stderr.splitlines():
+        _, cumulative, name = line.split('|')
+        if name.strip() == 'linux_rss_server.__main__':
+            return int(cumulative) / 1e6
+    raise ValueError('The entry point was not imported')
+
+
+def _first_byte(port: int, deadline: float) -> None:
+    """Wait for the first byte of the feed on `port`."""
+    request = b'GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), 1) as sock:
+                sock.sendall(request)
+                if sock.recv(1).startswith(b'H'):
+                    return
+        except OSError:
+            time.sleep(0.001)
+    raise TimeoutError('The server never answered')
+
+
+def first_byte(
+    directory: pathlib.Path,
+    engine: str,
+    workers: int,
+) -> float:
+    """Get the seconds from starting the daemon to the first byte served."""
+    port = _free_port()
+    config = directory / 'config.yml'
+    config.write_text(
+        f'port: {port}\n'
+        f'rss_cache: {directory / "feed.rss"}\n'
+        'repos: []\n'
+        f'server:\n  engine: {engine}\n  workers: {workers}\n',
+    )
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'linux_rss_server'],
+        env={**os.environ, 'CONFIGFILE': str(config)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _first_byte(port, started + TIMEOUT)
+        return time.monotonic() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(entries: int, runs: int) -> list:
+    """Run the benchmark and return its results."""
+    measured = [
+        results.result(
+            'import',
+            statistics.median(import_time() for _ in range(runs)),
+            's',
+        ),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = pathlib.Path(tmp)
+        (directory / 'feed.rss').write_bytes(_feed(entries))
+        for engine, workers in SETUPS:
+            measured.append(
+                results.result(
+                    'first byte',
+                    statistics.median(
+                        first_byte(directory, engine, workers)
+                        for _ in range(runs)
+                    ),
+                    's',
+                    engine=engine,
+                    workers=workers,
+                    entries=entries,
+                ),
+            )
+    print(f'{"metric":>10} {"engine":>9} {"workers":>8} {"ms":>8}')
+    for result in measured:
+        params = result['params']
+        print(
+            f'{result["metric"]:>10} {params.get("engine", "-"):>9} '
+            f'{params.get("workers", "-"):>8} {result["value"] * 1e3:>8.1f}',
+        )
+    return measured
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ENTRIES,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_RUNS,
+    )
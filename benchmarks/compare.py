@@ -0,0 +1,65 @@
+"""Compare two runs of the benchmark suite.
+
+Usage:
+    python benchmarks/compare.py BASELINE RESULTS [THRESHOLD]
+
+Prints every result found in both files with the change from `BASELINE` to
+`RESULTS` and marks the ones that got more than `THRESHOLD` (a fraction,
+``0.1`` by default) worse. Exits with status 1 if any did.
+"""
+
+import pathlib
+import sys
+
+import results
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def main(baseline: pathlib.Path, current: pathlib.Path, threshold: float):
+    """Compare `current` against `baseline`."""
+    old = results.load(baseline)
+    new = results.load(current)
+    print(f'baseline: {old["commit"]} {old["created"]}')
+    print(f' results: {new["commit"]} {new["created"]}')
+    before = {
+        results.key(benchmark, result): result
+        for benchmark, runs in old['benchmarks'].items()
+        for result in runs
+    }
+    regressions = 0
+    for benchmark, runs in new['benchmarks'].items():
+        for result in runs:
+            previous = before.get(results.key(benchmark, result))
+            if previous is None or not previous['value']:
+                continue
+            change = result['value'] / previous['value'] - 1
+            if result['unit'] in results.HIGHER_IS_BETTER:
+                worse = -change
+            else:
+                worse = change
+            flag = ''
+            if worse > threshold:
+                flag = ' REGRESSION'
+                regressions += 1
+            params = ' '.join(
+                f'{name}={value}' for name, value in result['params'].items()
+            )
+            print(
+                f'{benchmark:>8} {result["metric"]:>10} {params:<30} '
+                f'{previous["value"]:>12.4g} {result["value"]:>12.4g} '
+                f'{result["unit"]:<6} {change:>+8.1%}{flag}',
+            )
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    sys.exit(
+        main(
+            pathlib.Path(sys.argv[1]),
+            pathlib.Path(sys.argv[2]),
+            float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_THRESHOLD,
+        ),
+    )
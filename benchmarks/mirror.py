@@ -0,0 +1,195 @@
+"""A local stand-in for the mirrors the scrapers talk to.
+
+Usage:
+    python benchmarks/mirror.py [ROWS] [VERSIONS] [LATENCY]
+
+Serves synthetic directory listings on localhost until interrupted:
+
+- ``/debian/<arch>`` - A Debian style listing with `ROWS` rows, every other
+  one a ``.torrent``.
+- ``/ubuntu`` - An Ubuntu style listing of `VERSIONS` release directories.
+- ``/ubuntu/<version>/`` - A release directory with `ROWS` rows.
+
+Every response is delayed by `LATENCY` seconds and has an ``ETag`` so
+conditional requests for unchanged pages get a ``304 Not Modified``.
+`Mirror.grow` adds files to every listing to simulate new releases.
+"""
+
+import hashlib
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ROWS = 1_000
+DEFAULT_VERSIONS = 10
+DEFAULT_LATENCY = 0.0
+
+_DEBIAN = re.compile(r'^/debian/([^/]+)/?$')
+_UBUNTU = re.compile(r'^/ubuntu/(\d+\.\d+)/?$')
+
+
+def debian_listing(arch: str, rows: int) -> bytes:
+    """Build a Debian style listing of `rows` files for `arch`."""
+    lines = [
+        '<html><body><table>',
+        '<tr><th><a href="?C=N;O=D">Name</a></th><th>Size</th></tr>',
+        '<tr><td><a href="../">Parent Directory</a></td><td>-</td></tr>',
+    ]
+    for row in range(rows):
+        ext = '.iso.torrent' if row % 2 else '.iso'
+        lines.append(
+            f'<tr><td><a href="debian-{row}-{arch}{ext}">debian-{row}</a>'
+            '</td><td align="right">2024-02-10 12:00</td>'
+            '<td align="right">1.2M</td></tr>',
+        )
+    lines.append('</table></body></html>')
+    return '\n'.join(lines).encode()
+
+
+def ubuntu_versions(versions: int) -> bytes:
+    """Build an Ubuntu style listing of `versions` release directories."""
+    lines = ['<html><body><pre>']
+    for version in range(versions):
+        name = f'{20 + version // 2}.{4 if version % 2 else 10:02d}'
+        lines.append(f'<a href="{name}/">{name}/</a>  2024-04-25 12:00  -')
+    lines.append('<a href="HEADER.html">HEADER.html</a>')
+    lines.append('</pre></body></html>')
+    return '\n'.join(lines).encode()
+
+
+def ubuntu_release(version: str, rows: int) -> bytes:
+    """Build an Ubuntu style release directory with `rows` files."""
+    lines = ['<html><body><pre>']
+    for row in range(rows):
+        ext = '.iso.torrent' if row % 2 else '.iso'
+        name = f'ubuntu-{version}.{row}-desktop-amd64{ext}'
+        lines.append(f'<a href="{name}">{name}</a>  2024-04-25 12:00  5.7G')
+    lines.append('</pre></body></html>')
+    return '\n'.join(lines).encode()
+
+
+class Mirror(ThreadingHTTPServer):
+    """Serve synthetic listings on a free local port.
+
+    Arguments:
+        rows: The number of files in every listing.
+        versions: The number of Ubuntu releases.
+        latency: The number of seconds every response is delayed by.
+
+    Attributes:
+        requests: The number of requests answered.
+        not_modified: The number of those answered with ``304``.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        rows: int = DEFAULT_ROWS,
+        versions: int = DEFAULT_VERSIONS,
+        latency: float = DEFAULT_LATENCY,
+    ):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.rows = rows
+        self.versions = versions
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self._added = 0
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """The base URL of the mirror."""
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def __enter__(self) -> 'Mirror':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+        self.server_close()
+
+    def grow(self, rows: int):
+        """Add `rows` new files to every listing."""
+        with self._lock:
+            self._added += rows
+            self._pages.clear()
+
+    def count(self, status: int):
+        """Count a request answered with `status`."""
+        with self._lock:
+            self.requests += 1
+            if status == 304:
+                self.not_modified += 1
+
+    def page(self, path: str) -> bytes:
+        """Get the page at `path` or `None` if there isn't one."""
+        with self._lock:
+            if path not in self._pages:
+                self._pages[path] = self._build(path)
+            return self._pages[path]
+
+    def _build(self, path: str) -> bytes:
+        rows = self.rows + self._added
+        if path.rstrip('/') == '/ubuntu':
+            return ubuntu_versions(self.versions)
+        if match := _DEBIAN.match(path):
+            return debian_listing(match[1], rows)
+        if match := _UBUNTU.match(path):
+            return ubuntu_release(match[1], rows)
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        body = self.server.page(self.path)
+        if body is None:
+            self.server.count(404)
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.server.count(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.server.count(200)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main(rows: int, versions: int, latency: float):
+    """Serve the mirror until interrupted."""
+    with Mirror(rows, versions, latency) as mirror:
+        print(f'Serving {mirror.url}/debian/<arch> and {mirror.url}/ubuntu')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_VERSIONS,
+        float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_LATENCY,
+    )
@@ -0,0 +1,73 @@
+"""Machine readable benchmark results.
+
+Every benchmark's ``main`` returns a list of results made with `result`.
+`run.py` saves the results of the whole suite with `save` as JSON along
+with what they were measured on, and `compare.py` compares two such files.
+"""
+
+import datetime
+import json
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+
+# Units of results that are better when they're higher. Everything else is
+# better when it's lower.
+HIGHER_IS_BETTER = {'req/s'}
+
+
+def result(metric: str, value: float, unit: str, **params) -> dict:
+    """Make a result.
+
+    Arguments:
+        metric: What was measured (eg ``dump``).
+        value: The measurement.
+        unit: The unit of `value` (eg ``s`` or ``req/s``).
+        params: The parameters of the run (eg ``entries=1000``). Results
+            are compared by benchmark, metric and parameters.
+    """
+    return {'metric': metric, 'value': value, 'unit': unit, 'params': params}
+
+
+def key(benchmark: str, result: dict) -> tuple:
+    """Get what identifies `result` between runs."""
+    return (benchmark, result['metric'], *sorted(result['params'].items()))
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            check=True,
+            cwd=pathlib.Path(__file__).parent,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path: pathlib.Path, benchmarks: dict[str, list[dict]]):
+    """Save the results of each benchmark to `path`."""
+    path.write_text(
+        json.dumps(
+            {
+                'created': datetime.datetime.now(
+                    datetime.timezone.utc,
+                ).isoformat(timespec='seconds'),
+                'commit': _commit(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'benchmarks': benchmarks,
+            },
+            indent=2,
+        ),
+    )
+
+
+def load(path: pathlib.Path) -> dict:
+    """Load results saved with `save`."""
+    return json.loads(path.read_text())
@@ -0,0 +1,63 @@
+"""Run the whole benchmark suite and save the results.
+
+Usage:
+    python benchmarks/run.py [RESULTS] [BENCHMARK ...]
+
+Runs every benchmark (or just the named ones) with its default settings and
+saves the results to `RESULTS` as JSON (``results-<time>.json`` by default)
+so they can be compared with another run with `compare.py`.
+"""
+
+import datetime
+import pathlib
+import sys
+
+import bench_cycle
+import bench_feed
+import bench_links
+import bench_server
+import bench_startup
+import mirror
+import results
+
+BENCHMARKS = {
+    'links': lambda: bench_links.main(bench_links.DEFAULT_ROWS),
+    'feed': lambda: bench_feed.main(bench_feed.DEFAULT_ENTRIES),
+    'cycle': lambda: bench_cycle.main(
+        mirror.DEFAULT_ROWS,
+        mirror.DEFAULT_VERSIONS,
+        mirror.DEFAULT_LATENCY,
+        bench_cycle.DEFAULT_CYCLES,
+    ),
+    'server': lambda: bench_server.main(
+        bench_server.DEFAULT_CLIENTS,
+        bench_server.DEFAULT_SECONDS,
+    ),
+    'startup': lambda: bench_startup.main(
+        bench_startup.DEFAULT_ENTRIES,
+        bench_startup.DEFAULT_RUNS,
+    ),
+}
+
+
+def main(path: pathlib.Path, names: list[str]):
+    """Run the benchmarks in `names` and save the results to `path`."""
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f'Unknown benchmarks: {", ".join(sorted(unknown))}')
+    measured = {}
+    for name in names:
+        print(f'# {name}')
+        measured[name] = BENCHMARKS[name]()
+    results.save(path, measured)
+    print(f'Saved the results to {path}')
+
+
+if __name__ == '__main__':
+    now = datetime.datetime.now().strftime('%Y%m%dT%H%M%S')
+    main(
+        pathlib.Path(
+            sys.argv[1] if len(sys.argv) > 1 else f'results-{now}.json'
+        ),
+        sys.argv[2:] or list(BENCHMARKS),
+    )
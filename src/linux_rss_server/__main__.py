@@ -1,26 +1,40 @@
-"""Run the daemon that scrapes repos and serves RSS."""
+"""Run the daemon that scrapes repos and serves RSS.
+
+Only what serving the feed needs is imported up front so the last published
+feed is served as soon as the process starts. The HTTP client and the
+scraping and feed libraries are imported by the scraper thread once the
+server is up (see `ScraperThread.run`).
+"""
 
-import datetime
-import http
 import logging
 import os
-import selectors
 import socket
 import sys
 import threading
 import time
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-from socketserver import ThreadingMixIn, _ServerSelector
 
-import requests
+from . import log, metrics, reload, schedule
+from .config import Config, Repo
+from .publisher import Publisher
+from .server import StopEvent
+from .workers import Workers, make_server
 
-from . import feed, log, scrapers
-from .config import Config
+CYCLE_SECONDS = metrics.histogram(
+    'linux_rss_cycle_seconds',
+    'Time to scrape the due repos and publish the feed.',
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600),
+)
+CYCLE_ENTRIES = metrics.gauge(
+    'linux_rss_cycle_entries_added',
+    'Entries added to the feed by the last scrape.',
+)
 
 
 def _ping_healthcheck(url):
     if not url:
         return
+    import requests
+
     resp = requests.get(url)
     if resp.status >= 300:
         resp = requests.get(url)
@@ -35,14 +49,25 @@ class ScraperThread(threading.Thread):
         config: The application configuration.
         stop_all: The `threading.Event` that will signal all the parts of the
             application to stop.
+        publisher: The publisher to publish the feed with after every scrape.
     """
 
-    def __init__(self, conf: Config, stop_all: threading.Event):
+    def __init__(
+        self,
+        conf: Config,
+        stop_all: threading.Event,
+        publisher: Publisher,
+    ):
         threading.Thread.__init__(self, daemon=True)
         self.__stop = threading.Event()
         self.__stop_all = stop_all
+        self.__wake = threading.Event()
+        self.__lock = threading.Lock()
+        self.__pending = None
         self.config = conf
-        self.check_every = self.config.check_every.timedelta
+        self.publisher = publisher
+        self.feed = None
+        self.exception = None
 
     def halt(self, error: Exception):
         """Stop everything gracefully."""
@@ -50,9 +75,48 @@ class ScraperThread(threading.Thread):
         self.__stop_all.set()
         self.exception = error
 
+    def stop(self):
+        """Stop the scraper after the current scrape."""
+        self.__stop.set()
+        self.__wake.set()
+
+    def reload(self, conf: Config):
+        """Switch to `conf` after the current scrape.
+
+        Repos that were added or changed are scraped right away.
+        """
+        with self.__lock:
+            self.__pending = conf
+        self.__wake.set()
+
+    def _apply(self, scheduler: schedule.Scheduler):
+        """Switch to the config given to `reload` if there is one."""
+        with self.__lock:
+            conf, self.__pending = self.__pending, None
+        if conf is None:
+            return
+        conf = reload.merge(self.config, conf)
+        if conf == self.config:
+            log.info('The config is unchanged')
+            return
+        changed, removed = reload.diff_repos(self.config.repos, conf.repos)
+        if conf.file_extension != self.config.file_extension:
+            changed = conf.repos
+        log.info(
+            'Applying the new config: scraping %s, dropping %s',
+            ', '.join(repo.name for repo in changed) or 'nothing',
+            ', '.join(removed) or 'nothing',
+        )
+        from .scrapers import page
+
+        page.configure(conf.http)
+        self.config = conf
+        scheduler.update(conf, changed, time.time())
+
     def run(self):
         """Run the RSS feed generator thread."""
         try:
+            self._setup()
             self._run_loop()
         except Exception as err:
             log.debug(
@@ -61,84 +125,93 @@ class ScraperThread(threading.Thread):
                 err,
             )
             self.halt(err)
+        finally:
+            if self.feed is not None:
+                self.feed.close()
 
-    def _generate_feed(self):
-        rss_feed = feed.Feed(self.config)
-        rss_feed.load()
-        for repo in self.config.repos:
-            scraper = scrapers.get(repo.type)
-            for url in repo:
-                for filename, file_url in scraper.scrape(self.config, url):
-                    rss_feed.append(filename, file_url)
-        rss_feed.dump()
-
-    def _run_loop(self):
-        while not self.__stop.is_set():
-            self._generate_feed()
-            _ping_healthcheck(self.config.healthcheck_url)
-            now = datetime.datetime.now()
-            then = now + self.check_every
-            then = datetime.datetime(
-                year=then.year,
-                month=then.month,
-                day=then.day,
-                hour=self.config.start_at.hour,
-                minute=self.config.start_at.minute,
-            )
-            time.sleep((then - now).seconds)
-
+    def _setup(self):
+        """Set up the scrapers.
 
-def _request_handler_factory(conf: Config) -> SimpleHTTPRequestHandler:
-    class RequestHandler(SimpleHTTPRequestHandler):
-        _config = conf
+        The scraping libraries are imported here rather than with the module
+        so they don't hold up serving the feed.
+        """
+        from .scrapers import page
 
-        def do_GET(self):
-            self.send_response(http.HTTPStatus.OK)
-            self.send_header('Content-Type', 'application/rss+xml')
-            self.end_headers()
-            self.wfile.write(self._config.rss_cache.read_bytes())
-            self.wfile.flush()
+        page.configure(self.config.http)
+        page.load_cache(self.config.page_cache)
 
-    return RequestHandler
+    def _generate_feed(self, repos: list[Repo]) -> set[str]:
+        """Scrape `repos` and publish the feed.
 
+        Returns:
+            The names of the repos that had new files.
+        """
+        from . import feed
+        from .scrapers import engine, page
 
-class _Server(ThreadingMixIn, HTTPServer):
-    def serve_forever(
-        self,
-        poll_interval: float = 0.5,
-        stop: threading.Event = None,
-    ):
-        """Handle one request at a time until shutdown.
+        if self.feed is None:
+            self.feed = feed.Feed(self.config)
+            self.feed.load()
+        started = time.perf_counter()
+        scraper = engine.Engine(self.config)
+        found = scraper.scrape(repos)
+        upstream = {
+            repo.name: []
+            for repo in repos
+            if repo.name not in scraper.incomplete
+        }
+        # The files of repos that are the same as last time are usually in
+        # the feed already, but not if they were removed since (eg with the
+        # arch they're in) or have other tags, so only those are skipped.
+        known = {repo: self.feed.known(repo) for repo in scraper.unchanged}
+        changed = set()
+        added = 0
+        for item in found:
+            if item.repo in upstream:
+                upstream[item.repo].append(item.url)
+            if item.repo in known and known[item.repo](item.url, item.arch):
+                continue
+            if self.feed.append(
+                item.filename,
+                item.url,
+                item.repo,
+                item.arch,
+                item.checksum,
+                item.size,
+            ):
+                changed.add(item.repo)
+                added += 1
+        self.feed.prune(self.config.retention, upstream)
+        body = self.feed.dump()
+        if body is not None:
+            self.publisher.publish(body, index=self.feed.index)
+        page.save_cache()
+        CYCLE_ENTRIES.set(added)
+        CYCLE_SECONDS.observe(time.perf_counter() - started)
+        if self.config.server.workers:
+            metrics.REGISTRY.save(self.config.metrics)
+        return changed
 
-        Polls for shutdown every poll_interval seconds. Ignores
-        self.timeout. If you need to do periodic tasks, do them in
-        another thread.
-        """
-        # Taken straight from `socketserver.BaseServer`.
-        # Added `threading.Event` `stop` to allow asynchronous shutdown.
-        self._BaseServer__is_shut_down.clear()
-        try:
-            # XXX: Consider using another file descriptor or connecting to the
-            # socket to wake this up instead of polling. Polling reduces our
-            # responsiveness to a shutdown request and wastes cpu at all other
-            # times.
-            with _ServerSelector() as selector:
-                selector.register(self, selectors.EVENT_READ)
-
-                while not (
-                    self._BaseServer__shutdown_request and stop.is_set()
-                ):  # nofmt
-                    ready = selector.select(poll_interval)
-                    # bpo-35017: shutdown() called during select(), exit
-                    #  immediately.
-                    if self._BaseServer__shutdown_request:
-                        break
-                    if ready:
-                        self._handle_request_noblock()
-                    self.service_actions()
-        finally:
-            self._BaseServer__shutdown_request = False
-            self._BaseServer__is_shut_down.set()
+    def _run_loop(self):
+        scheduler = schedule.Scheduler(self.config, time.time())
+        while not self.__stop.is_set():
+            self._apply(scheduler)
+            repos = scheduler.due(time.time())
+            if repos:
+                log.info(
+                    'Scraping %s',
+                    ', '.join(repo.name for repo in repos),
+                )
+                changed = self._generate_feed(repos)
+                now = time.time()
+                for repo in repos:
+                    scheduler.done(repo, repo.name in changed, now)
+                _ping_healthcheck(self.config.healthcheck_url)
+            due = scheduler.next_due()
+            self.__wake.wait(
+                None if due is None else max(due - time.time(), 0),
+            )
+            self.__wake.clear()
 
 
 def main():
@@ -154,18 +227,33 @@ def main():
         CHECK_EVERY_MUL: The multiplier of the. This can be a positive `float`
             or positive `int`. Defaults to
             `config.DEFAULT_CHECK_EVERY_MULTIPLIER`.
+        CONNECT_TIMEOUT: The number of seconds to wait for a mirror to accept
+            a connection. Defaults to `config.DEFAULT_CONNECT_TIMEOUT`.
         DEFAULT_ARCHES: A comma separated list of CPU architectures to grab
             torrent/image links for.
         FILE_EXTENSION: The extension on the filename for the desired files.
             Defaults to `config.DEFAULT_FILE_EXTENSION`.
+        FULL_RECRAWL: Set to ``true`` to fetch every sub-page (eg Ubuntu
+            version) on every scrape instead of just the recent ones.
+        PER_HOST: The maximum number of concurrent requests to any one host
+            while scraping. Defaults to `config.DEFAULT_PER_HOST`.
         PORT: The port for the RSS server to listen on. Defaults to
             `config.DEFAULT_PORT`.
+        READ_TIMEOUT: The number of seconds to wait for a mirror to send
+            data. Defaults to `config.DEFAULT_READ_TIMEOUT`.
         RSS_CACHE: The location of the RSS file on disk. Defaults to
             `config.DEFAULT_RSS_CACHE`.
+        SERVER_ENGINE: The HTTP server implementation, ``threaded`` or
+            ``asyncio``. Defaults to `config.DEFAULT_SERVER_ENGINE`.
+        SERVER_WORKERS: The number of processes serving the feed. ``0``
+            serves it from the scraper's process. Defaults to
+            `config.DEFAULT_SERVER_WORKERS`.
         START_HOUR: The hour of the day to begin scraping. Defaults to
             `config.DEFAULT_START_AT_HOUR`.
         START_MINUTE: The minute of the hour to begin scraping. Defaults to
             `config.DEFAULT_START_AT_MINUTE`.
+        WORKERS: The number of threads scraping the repos. Defaults to
+            `config.DEFAULT_WORKERS`.
         LINUX_RSS_SERVER_CONFIGFILE: The path to this application's config file.
             Defaults to `config.DEFAULT_CONFIG`.
     """
@@ -175,23 +263,56 @@ def main():
         sys.exit(1)
     log.setLevel(getattr(logging, log_level.upper()))
     conf = Config.from_env()
-    stop_all = threading.Event()
-    scraper = ScraperThread(conf, stop_all)
-    scraper.start()
-    request_handler = _request_handler_factory(conf)
-    server = _Server(
-        ('0.0.0.0', conf.port),
-        request_handler,
+    stop_all = StopEvent()
+    # With worker processes serving the feed this process only tells them
+    # about new versions of it so it has no use for the compressed variants.
+    publisher = Publisher(
+        conf.spool if conf.server.sendfile else None,
+        compress=not conf.server.workers,
     )
-    log.info(
-        'Serving RSS on %s:%s',
-        socket.gethostname(),
-        conf.port,
-    )
-    sys.stdout.flush()
-    server.serve_forever(stop=stop_all)
-    scraper.join()
+    publisher.clean()
+    publisher.load(conf.rss_cache, conf.feed_index, defer=True)
+    scraper = ScraperThread(conf, stop_all, publisher)
+    config_path = Config.path_from_env()
+    if config_path.exists():
+        threading.Thread(
+            target=reload.watch,
+            args=(config_path, Config.from_env, scraper.reload, stop_all),
+            daemon=True,
+        ).start()
+    if conf.server.workers:
+        workers = Workers(conf)
+        publisher.subscribe(workers.notify)
+        workers.start()
+        scraper.start()
+        log.info(
+            'Serving RSS on %s:%s with %s %s server workers',
+            socket.gethostname(),
+            conf.port,
+            conf.server.workers,
+            conf.server.engine,
+        )
+        workers.watch(stop_all)
+        workers.stop(conf.server.drain_timeout + 1)
+        exitcode = workers.exitcode
+    else:
+        server = make_server(conf, publisher)
+        scraper.start()
+        log.info(
+            'Serving RSS on %s:%s with the %s server',
+            socket.gethostname(),
+            conf.port,
+            conf.server.engine,
+        )
+        sys.stdout.flush()
+        server.serve_forever(stop=stop_all)
+        exitcode = 0
     log.info('Stopped server')
+    if exitcode:
+        # The scraper only stops by itself when it fails.
+        sys.exit(exitcode)
+    scraper.stop()
+    scraper.join()
     if scraper.exception:
         log.error('Error in scraper', exc_info=scraper.exception)
         sys.exit(1)
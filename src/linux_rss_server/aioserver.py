@@ -0,0 +1,258 @@
+"""Serve the published RSS feed with asyncio.
+
+An alternative to `server.ThreadedServer` that handles every connection as
+a coroutine on one event loop instead of an OS thread. Connections are kept
+alive between requests (up to `config.Server.keepalive_timeout`), the
+number of open connections is capped at `config.Server.max_connections`,
+and no more than `config.Server.max_pipelined` responses are queued for a
+client that pipelines requests without reading the responses. When the
+server stops idle connections are closed and the busy ones get
+`config.Server.drain_timeout` seconds to finish.
+"""
+
+import asyncio
+import email.utils
+import http
+import http.client
+import io
+import threading
+
+from . import log
+from .config import Server
+from .publisher import Publisher
+from .server import Response, respond
+
+_MAX_HEADER_BYTES = 64 * 1024
+_MAX_BODY_BYTES = 64 * 1024
+
+
+class _BadRequest(Exception):
+    """The request couldn't be parsed."""
+
+    def __init__(self, status: http.HTTPStatus):
+        super().__init__(status.phrase)
+        self.status = status
+
+
+def _serialize(response: Response, keep_alive: bool) -> bytes:
+    lines = [
+        f'HTTP/1.1 {response.status.value} {response.status.phrase}',
+        f'Date: {email.utils.formatdate(usegmt=True)}',
+        *[f'{name}: {value}' for name, value in response.headers],
+        f'Connection: {"keep-alive" if keep_alive else "close"}',
+        '',
+        '',
+    ]
+    return '\r\n'.join(lines).encode('latin-1') + response.body
+
+
+class _Connection:
+    """A client connection."""
+
+    def __init__(
+        self,
+        config: Server,
+        publisher: Publisher,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        self.config = config
+        self.publisher = publisher
+        self.reader = reader
+        self.writer = writer
+        self.idle = True
+        self.closing = False
+
+    async def _read_request(self) -> tuple[str, str, str, object]:
+        """Read a request and return the method, path, version, headers."""
+        try:
+            raw = await asyncio.wait_for(
+                self.reader.readuntil(b'\r\n\r\n'),
+                self.config.keepalive_timeout,
+            )
+        except asyncio.LimitOverrunError:
+            raise _BadRequest(
+                http.HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+            ) from None
+        request_line, _, header_lines = raw.partition(b'\r\n')
+        try:
+            method, path, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise _BadRequest(http.HTTPStatus.BAD_REQUEST) from None
+        if not version.startswith('HTTP/1.'):
+            raise _BadRequest(http.HTTPStatus.HTTP_VERSION_NOT_SUPPORTED)
+        headers = http.client.parse_headers(io.BytesIO(header_lines))
+        try:
+            length = int(headers.get('Content-Length', 0))
+        except ValueError:
+            raise _BadRequest(http.HTTPStatus.BAD_REQUEST) from None
+        if length > _MAX_BODY_BYTES or 'Transfer-Encoding' in headers:
+            raise _BadRequest(http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        if length:
+            await self.reader.readexactly(length)
+        return method, path, version, headers
+
+    def _keep_alive(self, version: str, headers) -> bool:
+        connection = headers.get('Connection', '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    async def serve(self):
+        """Answer requests until the client or the server is done."""
+        pipelined = 0
+        try:
+            while not self.closing:
+                self.idle = True
+                try:
+                    method, path, version, headers = await self._read_request()
+                except _BadRequest as err:
+                    response = Response(
+                        err.status,
+                        [('Content-Length', '0')],
+                    )
+                    self.writer.write(_serialize(response, False))
+                    break
+                self.idle = False
+                keep_alive = (
+                    self._keep_alive(version, headers) and not self.closing
+                )
+                response = respond(self.publisher, method, headers, path)
+                self.writer.write(_serialize(response, keep_alive))
+                if response.file is not None:
+                    await asyncio.get_running_loop().sendfile(
+                        self.writer.transport,
+                        response.file,
+                        response.offset,
+                        response.length,
+                    )
+                if not keep_alive:
+                    break
+                # Responses go out as soon as the socket takes them. Wait for
+                # a client that isn't reading them every `max_pipelined`
+                # responses so at most that many are queued for it.
+                pipelined += 1
+                if pipelined >= self.config.max_pipelined:
+                    await self.writer.drain()
+                    pipelined = 0
+            await self.writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.TimeoutError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            self.writer.close()
+
+
+class AsyncServer:
+    """Asyncio HTTP server for the feed.
+
+    Arguments:
+        address: The (host, port) to listen on.
+        config: The server configuration.
+        publisher: The publisher of the feed.
+        reuse_port: If `True` other processes can listen on the same port
+            and the kernel spreads the connections between them.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        config: Server,
+        publisher: Publisher,
+        reuse_port: bool = False,
+    ):
+        self.address = address
+        self.reuse_port = reuse_port
+        self.config = config
+        self.publisher = publisher
+        self.connections = 0
+        self.server_address = None
+        self._open = {}
+        self._ready = threading.Event()
+
+    async def _handle(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        if self.connections >= self.config.max_connections:
+            log.warning('Refusing connection: too many connections')
+            response = Response(
+                http.HTTPStatus.SERVICE_UNAVAILABLE,
+                [('Retry-After', '1'), ('Content-Length', '0')],
+            )
+            writer.write(_serialize(response, False))
+            writer.close()
+            return
+        self.connections += 1
+        connection = _Connection(self.config, self.publisher, reader, writer)
+        task = asyncio.current_task()
+        self._open[task] = connection
+        try:
+            await connection.serve()
+        finally:
+            self.connections -= 1
+            self._open.pop(task, None)
+
+    async def _drain(self):
+        """Close idle connections and wait for the busy ones to finish."""
+        for task, connection in self._open.items():
+            connection.closing = True
+            if connection.idle:
+                task.cancel()
+        if not self._open:
+            return
+        _, busy = await asyncio.wait(
+            list(self._open),
+            timeout=self.config.drain_timeout,
+        )
+        if busy:
+            log.warning('Abandoned %s busy connections', len(busy))
+        for task in busy:
+            task.cancel()
+        await asyncio.gather(*busy, return_exceptions=True)
+
+    async def _serve(self, stop: threading.Event):
+        server = await asyncio.start_server(
+            self._handle,
+            *self.address,
+            limit=_MAX_HEADER_BYTES,
+            backlog=self.config.max_connections,
+            reuse_address=True,
+            reuse_port=self.reuse_port,
+        )
+        self.server_address = server.sockets[0].getsockname()[:2]
+        self._ready.set()
+        async with server:
+            await self._wait(stop)
+            server.close()
+            await self._drain()
+        log.info('Stopped asyncio server')
+
+    async def _wait(self, stop: threading.Event):
+        """Wait for `stop` without tying up a thread if it's a `StopEvent`."""
+        loop = asyncio.get_running_loop()
+        if not hasattr(stop, 'fileno'):
+            await loop.run_in_executor(None, stop.wait)
+            return
+        stopped = loop.create_future()
+        loop.add_reader(
+            stop.fileno(),
+            lambda: stopped.done() or stopped.set_result(None),
+        )
+        try:
+            if not stop.is_set():
+                await stopped
+        finally:
+            loop.remove_reader(stop.fileno())
+
+    def serve_forever(self, stop: threading.Event):
+        """Serve until `stop` is set."""
+        asyncio.run(self._serve(stop))
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Wait for the server to start listening."""
+        return self._ready.wait(timeout)
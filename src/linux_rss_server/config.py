@@ -5,45 +5,95 @@ import enum
 import os
 import pathlib
 import random
-from dataclasses import dataclass
+import urllib.parse
+from dataclasses import dataclass, field
 from typing import Iterable
 
 import yaml
 
 _APP_PATH = '/linux_rss_server'
+DEFAULT_BACKOFF = 1
+DEFAULT_BURST = 4
 DEFAULT_CHECK_EVERY_MULTIPLIER = 1
 DEFAULT_CHECK_EVERY_UNIT = 'day'
 DEFAULT_CONFIG = f'{_APP_PATH}/config.yml'
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_DRAIN_TIMEOUT = 5
 DEFAULT_FILE_EXTENSION = '.torrent'
+DEFAULT_JITTER = 0.1
+DEFAULT_KEEPALIVE_TIMEOUT = 15
+DEFAULT_MAX_BACKOFF = 4
+DEFAULT_MAX_CONNECTIONS = 1024
+DEFAULT_MAX_DELAY = 300
+DEFAULT_MAX_PIPELINED = 16
+DEFAULT_PAGE_CACHE_SIZE = 1024
+DEFAULT_PER_HOST = 2
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
 DEFAULT_PORT = 56427
+DEFAULT_RATE = 2
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_RECENT = 3
+DEFAULT_RELOAD_INTERVAL = 60
 DEFAULT_RSS_CACHE = f'{_APP_PATH}/cache/rss_cache.rss'
+DEFAULT_SERVER_ENGINE = 'threaded'
+DEFAULT_SERVER_WORKERS = 0
 DEFAULT_START_AT_HOUR = 12
 DEFAULT_START_AT_MINUTE = 0
+DEFAULT_WORKERS = 8
 
 
 class RepoType(enum.StrEnum):
-    """A selection of repo types with scrapers."""
+    """The repo types with built in scrapers.
+
+    Scraper plugins can add more (see `scrapers`).
+    """
 
     debian = enum.auto()
     ubuntu = enum.auto()
+    manifest = enum.auto()
 
 
 @dataclass
 class Repo:
-    """Repo specification."""
+    """Repo specification.
+
+    The repo is checked every `check_every` if it's given instead of the
+    global `Config.check_every` and its hosts are treated with `politeness`
+    if it's given instead of the global `Config.politeness`. The `options`
+    only mean something to the scraper of the repo's `type` (see
+    `scrapers.Scraper.check_options`).
+    """
 
     url_format: str
     arches: list[str]
-    type: RepoType
+    type: str
+    name: str = None
+    check_every: 'CheckEvery' = None
+    politeness: 'Politeness' = None
+    options: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.name:
+            self.name = urllib.parse.urlsplit(self.url_format).netloc
 
     def __iter__(self) -> Iterable[str]:
         """Return an iterable of URLs based on `url_format` and `arches`."""
-        urls = []
-        for arch in self.arches or ['noarches']:
-            url = self.url_format.format(arch=arch)
+        return iter([url for _, url in self.targets()])
+
+    def targets(self) -> list[tuple[str, str]]:
+        """Return a list of (arch, URL) pairs with unique URLs.
+
+        The arch is `None` if the repo has no `arches`.
+        """
+        targets = []
+        urls = set()
+        for arch in self.arches or [None]:
+            url = self.url_format.format(arch=arch or 'noarches')
             if url not in urls:
-                urls.append(url)
-        return iter(urls)
+                urls.add(url)
+                targets.append((arch, url))
+        return targets
 
 
 @dataclass
@@ -94,6 +144,236 @@ class CheckEvery:
         raise ValueError(f'Invalid value for `check_every.unit`: {self.unit}')
 
 
+@dataclass
+class Concurrency:
+    """Scrape concurrency specification."""
+
+    workers: int = DEFAULT_WORKERS
+    per_host: int = DEFAULT_PER_HOST
+
+    def __post_init__(self):
+        if self.workers < 1:
+            raise ValueError(
+                f'Invalid value for `concurrency.workers`: {self.workers}',
+            )
+        if self.per_host < 1:
+            raise ValueError(
+                f'Invalid value for `concurrency.per_host`: {self.per_host}',
+            )
+
+
+@dataclass
+class Http:
+    """HTTP client specification for the scrapers."""
+
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE
+    page_cache_size: int = DEFAULT_PAGE_CACHE_SIZE
+
+    def __post_init__(self):
+        for name in ('connect_timeout', 'read_timeout'):
+            if getattr(self, name) <= 0:
+                raise ValueError(
+                    f'Invalid value for `http.{name}`: {getattr(self, name)}',
+                )
+        for name in ('pool_connections', 'pool_maxsize', 'page_cache_size'):
+            if getattr(self, name) < 1:
+                raise ValueError(
+                    f'Invalid value for `http.{name}`: {getattr(self, name)}',
+                )
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """The (connect, read) timeout tuple for `requests`."""
+        return (self.connect_timeout, self.read_timeout)
+
+
+@dataclass
+class Politeness:
+    """Per host request limits.
+
+    Attributes:
+        rate: The average number of requests per second sent to a host or
+            ``0`` for no limit.
+        burst: The number of requests that can be sent to a host at once
+            before `rate` kicks in.
+        per_host: The maximum number of concurrent requests to a host or
+            `None` to use `Concurrency.per_host`.
+        backoff: The delay in seconds before the first retry of a failed
+            request. It doubles with every retry after that.
+        max_delay: The longest a retry is delayed by in seconds, even if the
+            host asks for longer with ``Retry-After``.
+    """
+
+    rate: float = DEFAULT_RATE
+    burst: int = DEFAULT_BURST
+    per_host: int = None
+    backoff: float = DEFAULT_BACKOFF
+    max_delay: float = DEFAULT_MAX_DELAY
+
+    def __post_init__(self):
+        for name in ('rate', 'backoff'):
+            if getattr(self, name) < 0:
+                raise ValueError(
+                    f'Invalid value for `politeness.{name}`: '
+                    f'{getattr(self, name)}',
+                )
+        if self.burst < 1:
+            raise ValueError(
+                f'Invalid value for `politeness.burst`: {self.burst}',
+            )
+        if self.per_host is not None and self.per_host < 1:
+            raise ValueError(
+                f'Invalid value for `politeness.per_host`: {self.per_host}',
+            )
+        if self.max_delay < self.backoff:
+            raise ValueError(
+                f'Invalid value for `politeness.max_delay`: {self.max_delay}',
+            )
+
+    def stricter(self, other: 'Politeness') -> 'Politeness':
+        """Get the strictest limits of both for a host they share."""
+        per_host = [
+            limit
+            for limit in (self.per_host, other.per_host)
+            if limit is not None
+        ]
+        rates = [rate for rate in (self.rate, other.rate) if rate]
+        return Politeness(
+            rate=min(rates, default=0),
+            burst=min(self.burst, other.burst),
+            per_host=min(per_host, default=None),
+            backoff=max(self.backoff, other.backoff),
+            max_delay=max(self.max_delay, other.max_delay),
+        )
+
+
+@dataclass
+class Retention:
+    """Feed retention specification.
+
+    Every limit is disabled when it's `None`.
+    """
+
+    max_items: int = None
+    max_age_days: float = None
+    per_arch: int = None
+    drop_missing: bool = False
+
+    def __post_init__(self):
+        for name in ('max_items', 'max_age_days', 'per_arch'):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(
+                    f'Invalid value for `retention.{name}`: {value}',
+                )
+
+    @property
+    def max_age(self) -> datetime.timedelta:
+        """The maximum age of an entry or `None`."""
+        if self.max_age_days is None:
+            return None
+        return datetime.timedelta(days=self.max_age_days)
+
+
+@dataclass
+class Recrawl:
+    """Sub-page recrawling specification.
+
+    Scrapers that split a repo into sub-pages (like Ubuntu's version
+    directories) list them oldest first. Sub-pages that were parsed before
+    and aren't among the `recent` newest ones are taken from the page cache
+    without asking the mirror.
+
+    Attributes:
+        recent: The number of newest sub-pages of a repo that are always
+            checked.
+        full: If `True` every sub-page is always checked.
+    """
+
+    recent: int = DEFAULT_RECENT
+    full: bool = False
+
+    def __post_init__(self):
+        if self.recent < 0:
+            raise ValueError(
+                f'Invalid value for `recrawl.recent`: {self.recent}',
+            )
+
+    def refresh(self, index: int, count: int) -> bool:
+        """Check if the sub-page at `index` of `count` has to be checked."""
+        return self.full or index >= count - self.recent
+
+
+@dataclass
+class Schedule:
+    """Scrape scheduling specification.
+
+    Attributes:
+        jitter: The fraction of a repo's interval its checks are randomly
+            moved by so repos with the same interval don't all run at once.
+        adaptive: If `True` repos that had new files are checked more often
+            and repos that didn't are checked less often.
+        max_backoff: How many times longer or shorter than its configured
+            interval an adaptive repo's interval can get.
+    """
+
+    jitter: float = DEFAULT_JITTER
+    adaptive: bool = True
+    max_backoff: float = DEFAULT_MAX_BACKOFF
+
+    def __post_init__(self):
+        if not 0 <= self.jitter < 1:
+            raise ValueError(
+                f'Invalid value for `schedule.jitter`: {self.jitter}',
+            )
+        if self.max_backoff < 1:
+            raise ValueError(
+                f'Invalid value for `schedule.max_backoff`: {self.max_backoff}',
+            )
+
+
+@dataclass
+class Server:
+    """HTTP server specification."""
+
+    engine: str = DEFAULT_SERVER_ENGINE
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    keepalive_timeout: float = DEFAULT_KEEPALIVE_TIMEOUT
+    max_pipelined: int = DEFAULT_MAX_PIPELINED
+    drain_timeout: float = DEFAULT_DRAIN_TIMEOUT
+    workers: int = DEFAULT_SERVER_WORKERS
+    reload_interval: float = DEFAULT_RELOAD_INTERVAL
+    sendfile: bool = False
+
+    def __post_init__(self):
+        if self.engine not in ['threaded', 'asyncio']:
+            raise ValueError(
+                f'Invalid value for `server.engine`: {self.engine}'
+            )
+        for name in ('max_connections', 'keepalive_timeout', 'max_pipelined'):
+            if getattr(self, name) <= 0:
+                raise ValueError(
+                    f'Invalid value for `server.{name}`: {getattr(self, name)}',
+                )
+        if self.workers < 0:
+            raise ValueError(
+                f'Invalid value for `server.workers`: {self.workers}',
+            )
+        if self.reload_interval <= 0:
+            raise ValueError(
+                'Invalid value for `server.reload_interval`: '
+                f'{self.reload_interval}',
+            )
+        if self.drain_timeout < 0:
+            raise ValueError(
+                'Invalid value for `server.drain_timeout`: '
+                f'{self.drain_timeout}',
+            )
+
+
 def _get_check_every(config: dict, overrides: dict) -> CheckEvery:
     unit = overrides.get('check_every')
     multiplier = overrides.get('check_every_multiplier')
@@ -138,6 +418,180 @@ def _get_start_at(config: dict, overrides: dict) -> Time:
     )
 
 
+def _get_concurrency(config: dict, overrides: dict) -> Concurrency:
+    concurrency = config.get('concurrency') or {}
+    workers = overrides.get('workers')
+    if workers is None:
+        workers = concurrency.get('workers', DEFAULT_WORKERS)
+    per_host = overrides.get('per_host')
+    if per_host is None:
+        per_host = concurrency.get('per_host', DEFAULT_PER_HOST)
+    return Concurrency(workers=int(workers), per_host=int(per_host))
+
+
+def _get_http(config: dict, overrides: dict) -> Http:
+    http = config.get('http') or {}
+    connect_timeout = overrides.get('connect_timeout')
+    if connect_timeout is None:
+        connect_timeout = http.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)
+    read_timeout = overrides.get('read_timeout')
+    if read_timeout is None:
+        read_timeout = http.get('read_timeout', DEFAULT_READ_TIMEOUT)
+    return Http(
+        connect_timeout=float(connect_timeout),
+        read_timeout=float(read_timeout),
+        pool_connections=int(
+            http.get('pool_connections', DEFAULT_POOL_CONNECTIONS),
+        ),
+        pool_maxsize=int(http.get('pool_maxsize', DEFAULT_POOL_MAXSIZE)),
+        page_cache_size=int(
+            http.get('page_cache_size', DEFAULT_PAGE_CACHE_SIZE),
+        ),
+    )
+
+
+def _get_retention(config: dict) -> Retention:
+    retention = config.get('retention') or {}
+    max_items = retention.get('max_items')
+    max_age_days = retention.get('max_age_days')
+    per_arch = retention.get('per_arch')
+    return Retention(
+        max_items=None if max_items is None else int(max_items),
+        max_age_days=None if max_age_days is None else float(max_age_days),
+        per_arch=None if per_arch is None else int(per_arch),
+        drop_missing=bool(retention.get('drop_missing', False)),
+    )
+
+
+def _get_politeness(config: dict, default: Politeness) -> Politeness:
+    politeness = config.get('politeness') or {}
+    per_host = politeness.get('per_host', default.per_host)
+    return Politeness(
+        rate=float(politeness.get('rate', default.rate)),
+        burst=int(politeness.get('burst', default.burst)),
+        per_host=None if per_host is None else int(per_host),
+        backoff=float(politeness.get('backoff', default.backoff)),
+        max_delay=float(politeness.get('max_delay', default.max_delay)),
+    )
+
+
+def _get_repo_type(repo: dict) -> str:
+    repo_type = repo.get('type').lower()
+    try:
+        return RepoType(repo_type)
+    except ValueError:
+        pass
+    # The scrapers are only imported when they're needed.
+    from . import scrapers
+
+    if repo_type not in scrapers.types():
+        raise ValueError(f'Invalid value for `repos.type`: {repo_type}')
+    return repo_type
+
+
+def _get_repo_options(repo: dict) -> dict:
+    options = repo.get('options') or {}
+    if not isinstance(options, dict):
+        raise ValueError(f'Invalid value for `repos.options`: {options}')
+    if not options:
+        return {}
+    from . import scrapers
+
+    repo_type = _get_repo_type(repo)
+    try:
+        return scrapers.get(repo_type).check_options(dict(options))
+    except ValueError as err:
+        raise ValueError(
+            f'Invalid value for `repos.options` of a {repo_type} repo: {err}',
+        ) from err
+
+
+def _get_repos(
+    config: dict,
+    default_arches: list[str],
+    politeness: Politeness,
+) -> list[Repo]:
+    repos = []
+    names = set()
+    for repo in config['repos']:
+        repo = Repo(
+            repo['url_format'],
+            repo.get('arches', default_arches),
+            _get_repo_type(repo),
+            repo.get('name'),
+            (
+                _get_check_every(repo, {})
+                if repo.get('check_every') is not None
+                else None
+            ),
+            (
+                _get_politeness(repo, politeness)
+                if repo.get('politeness') is not None
+                else None
+            ),
+            _get_repo_options(repo),
+        )
+        # Repos on the same host get their default names numbered.
+        name = repo.name
+        number = 1
+        while repo.name in names:
+            number += 1
+            repo.name = f'{name}-{number}'
+        names.add(repo.name)
+        repos.append(repo)
+    return repos
+
+
+def _get_recrawl(config: dict, overrides: dict) -> Recrawl:
+    recrawl = config.get('recrawl') or {}
+    full = overrides.get('full_recrawl')
+    if not full:
+        full = bool(recrawl.get('full', False))
+    else:
+        full = full.lower() in ('1', 'true', 'yes', 'on')
+    return Recrawl(
+        recent=int(recrawl.get('recent', DEFAULT_RECENT)),
+        full=full,
+    )
+
+
+def _get_schedule(config: dict) -> Schedule:
+    schedule = config.get('schedule') or {}
+    return Schedule(
+        jitter=float(schedule.get('jitter', DEFAULT_JITTER)),
+        adaptive=bool(schedule.get('adaptive', True)),
+        max_backoff=float(schedule.get('max_backoff', DEFAULT_MAX_BACKOFF)),
+    )
+
+
+def _get_server(config: dict, overrides: dict) -> Server:
+    server = config.get('server') or {}
+    engine = overrides.get('server_engine')
+    if not engine:
+        engine = server.get('engine', DEFAULT_SERVER_ENGINE)
+    return Server(
+        engine=engine.lower(),
+        max_connections=int(
+            server.get('max_connections', DEFAULT_MAX_CONNECTIONS),
+        ),
+        keepalive_timeout=float(
+            server.get('keepalive_timeout', DEFAULT_KEEPALIVE_TIMEOUT),
+        ),
+        max_pipelined=int(server.get('max_pipelined', DEFAULT_MAX_PIPELINED)),
+        drain_timeout=float(
+            server.get('drain_timeout', DEFAULT_DRAIN_TIMEOUT),
+        ),
+        workers=int(
+            overrides.get('server_workers')
+            or server.get('workers', DEFAULT_SERVER_WORKERS),
+        ),
+        reload_interval=float(
+            server.get('reload_interval', DEFAULT_RELOAD_INTERVAL),
+        ),
+        sendfile=bool(server.get('sendfile', False)),
+    )
+
+
 @dataclass
 class Config:
     """RSS feed generator and server configuration."""
@@ -149,6 +603,48 @@ class Config:
     rss_cache: pathlib.Path
     start_at: Time
     file_extension: str = DEFAULT_FILE_EXTENSION
+    concurrency: Concurrency = field(default_factory=Concurrency)
+    http: Http = field(default_factory=Http)
+    politeness: Politeness = field(default_factory=Politeness)
+    recrawl: Recrawl = field(default_factory=Recrawl)
+    retention: Retention = field(default_factory=Retention)
+    schedule: Schedule = field(default_factory=Schedule)
+    server: Server = field(default_factory=Server)
+
+    @property
+    def feed_store(self) -> pathlib.Path:
+        """The feed database kept next to `rss_cache`."""
+        return self.rss_cache.with_suffix('.sqlite3')
+
+    @property
+    def feed_index(self) -> pathlib.Path:
+        """The index of the items in the RSS kept next to `rss_cache`."""
+        return self.rss_cache.with_suffix('.index.json')
+
+    @property
+    def metrics(self) -> pathlib.Path:
+        """The scraper metrics shared with the server workers."""
+        return self.rss_cache.with_suffix('.metrics.prom')
+
+    def worker_metrics(self, number: int) -> pathlib.Path:
+        """Get where server worker `number` shares its metrics."""
+        return self.rss_cache.with_suffix(f'.worker-{number}.metrics.prom')
+
+    @property
+    def page_cache(self) -> pathlib.Path:
+        """The cache of scraped pages kept next to `rss_cache`."""
+        return self.rss_cache.with_suffix('.pages.json')
+
+    @property
+    def spool(self) -> pathlib.Path:
+        """The directory the feed is spooled to if `server.sendfile` is set."""
+        return self.rss_cache.with_suffix('.spool')
+
+    @staticmethod
+    def path_from_env(env: dict = None) -> pathlib.Path:
+        """Get the path of the config file `from_env` loads."""
+        env = env or os.environ
+        return pathlib.Path(env.get('CONFIGFILE', DEFAULT_CONFIG))
 
     @classmethod
     def from_env(cls, env: dict = None) -> 'Config':
@@ -158,23 +654,24 @@ class Config:
         default_arches = None
         if arches_str:
             default_arches = [x.strip() for x in arches_str.split(',')]
-        config_path = pathlib.Path(
-            env.get(
-                'CONFIGFILE',
-                DEFAULT_CONFIG,
-            ),
-        )
         return cls.from_file(
-            path=config_path,
+            path=cls.path_from_env(env),
             check_every=env.get('CHECK_EVERY_UNIT'),
             check_every_multiplier=env.get('CHECK_EVERY_MUL'),
+            connect_timeout=env.get('CONNECT_TIMEOUT'),
+            per_host=env.get('PER_HOST'),
             default_arches=default_arches,
             healthcheck_url=env.get('HEALTHCHECK_URL'),
             file_extension=env.get('FILE_EXTENSION'),
+            full_recrawl=env.get('FULL_RECRAWL'),
             port=env.get('PORT'),
+            read_timeout=env.get('READ_TIMEOUT'),
             rss_cache=env.get('RSS_CACHE'),
+            server_engine=env.get('SERVER_ENGINE'),
+            server_workers=env.get('SERVER_WORKERS'),
             start_at_hour=env.get('START_AT_HOUR'),
             start_at_minute=env.get('START_AT_MINUTE'),
+            workers=env.get('WORKERS'),
         )
 
     @classmethod
@@ -193,15 +690,8 @@ class Config:
         default_arches = overrides.get('default_arches')
         if not default_arches:
             default_arches = config.get('arches', [])
-        repos = []
-        for repo in config['repos']:
-            repos.append(
-                Repo(
-                    repo['url_format'],
-                    repo.get('arches', default_arches),
-                    RepoType(repo.get('type').lower()),
-                ),
-            )
+        politeness = _get_politeness(config, Politeness())
+        repos = _get_repos(config, default_arches, politeness)
         rss_cache_filename = overrides.get('rss_cache')
         if not rss_cache_filename:
             rss_cache_filename = config.get(
@@ -212,10 +702,17 @@ class Config:
         rss_cache.parent.mkdir(exist_ok=True)
         return cls(
             check_every=_get_check_every(config, overrides),
+            concurrency=_get_concurrency(config, overrides),
             file_extension=file_extension,
             healthcheck_url=healthcheck_url,
+            http=_get_http(config, overrides),
+            politeness=politeness,
             port=int(port),
+            recrawl=_get_recrawl(config, overrides),
             repos=repos,
+            retention=_get_retention(config),
             rss_cache=rss_cache,
+            schedule=_get_schedule(config),
+            server=_get_server(config, overrides),
             start_at=_get_start_at(config, overrides),
         )
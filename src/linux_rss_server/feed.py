@@ -1,58 +1,313 @@
 """Linux installer RSS feed generator."""
 
+import os
+import re
+import time
+import urllib.parse
+from typing import Callable, Iterable, Iterator
+from xml.sax.saxutils import escape
+
 import feedparser
 from feedgen.feed import FeedGenerator
 
-from . import log
-from .config import Config
+from . import log, metrics
+from .config import Config, Retention
+from .index import Entry, Index, entity_tag
+from .store import Item, Store
+
+ENTRIES_ADDED = metrics.counter(
+    'linux_rss_feed_entries_added_total',
+    'Entries added to the feed.',
+    ['repo'],
+)
+DUMP_SECONDS = metrics.histogram(
+    'linux_rss_feed_dump_seconds',
+    'Time to write the RSS and its index.',
+)
+_ITEM = '''\
+    <item>
+      <title>{title}</title>
+      <link>{link}</link>
+      <description>{description}</description>
+      <content:encoded>{content}</content:encoded>
+    </item>
+'''
+_CHANNEL_END = '  </channel>\n'
+
+
+def normalize_url(url: str) -> str:
+    """Normalize `url` for comparing feed entries.
+
+    The scheme and host are lowercased, repeated slashes in the path are
+    collapsed, and the fragment is dropped.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    return urllib.parse.urlunsplit(
+        (
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            re.sub('/{2,}', '/', parts.path),
+            parts.query,
+            '',
+        ),
+    )
+
+
+def _render(title: str, link: str, description: str, content: str) -> str:
+    return _ITEM.format(
+        title=escape(title),
+        link=escape(link),
+        description=escape(description),
+        content=escape(content),
+    )
 
 
 class Feed:
-    """Feed parser and generator."""
+    """Feed parser and generator.
+
+    The entries live in a `store.Store` next to the RSS cache, indexed by
+    their normalized link, so a scrape cycle only has to insert the entries
+    it found and the RSS is generated from the stored entries. The first
+    time the store is opened the entries in an existing RSS cache are
+    imported into it. Every time the RSS is written an `index.Index` of it is
+    written next to it for the server.
+    """
 
     def __init__(self, config: Config):
         self.config = config
-        self.entries = []
+        self.store = Store(config.feed_store)
+        self.index = None
+        # Whether the entries changed since the RSS was last written. The
+        # first `dump` always writes it so it matches this version.
+        self.changed = True
         self.feed = FeedGenerator()
         self.feed.title('ISO Release Feed')
         self.feed.description('A feed of Linux installer torrent files.')
         self.feed.link(href='http://localhost')
 
-    def append(self, name: str, url: str):
-        """Populate a feed entry given the filename and source URL."""
-        if url in self.entries:
-            return
-        log.debug('Added %s: %s', name, url)
-        entry = self.feed.add_entry()
-        entry.title(name)
-        entry.content(url)
-        entry.description(name)
-        entry.link(href=url)
-        self.entries.append(url)
+    def __contains__(self, url: str) -> bool:
+        """Check if there is an entry linking to `url`."""
+        return normalize_url(url) in self.store
+
+    def __len__(self) -> int:
+        """Get the number of entries."""
+        return len(self.store)
+
+    def get(self, url: str) -> Item:
+        """Get the entry linking to `url` or `None` if there isn't one."""
+        return self.store.get(normalize_url(url))
+
+    def items(self) -> Iterator[Item]:
+        """Iterate over the entries newest first."""
+        return self.store.items()
+
+    def known(self, repo: str) -> Callable[[str, str], bool]:
+        """Get a check of whether `append`-ing a file from `repo` is a no-op.
+
+        That's the case if there's an entry linking to the file from `repo`
+        with the same arch, or if the entry was pruned. The check takes the
+        URL and arch of the file.
+        """
+        stored = self.store.tags(repo)
+        pruned = set(self.store.pruned(repo))
+
+        def known(url: str, arch: str) -> bool:
+            key = normalize_url(url)
+            return (key, arch) in stored or key in pruned
+
+        return known
+
+    def remove(self, url: str):
+        """Remove the entry linking to `url` if there is one."""
+        if self.store.remove(normalize_url(url)):
+            self.changed = True
+
+    def append(
+        self,
+        name: str,
+        url: str,
+        repo: str = None,
+        arch: str = None,
+        checksum: str = None,
+        size: int = None,
+    ) -> bool:
+        """Populate a feed entry given the filename and source URL.
 
-    def load(self) -> list[str]:
-        """Load the previously generated RSS file.
+        Arguments:
+            name: The filename.
+            url: The source URL.
+            repo: The name of the repo the file was found in.
+            arch: The architecture the file was found for.
+            checksum: The checksum of the file, if known, for the
+                description.
+            size: The size of the file in bytes, if known, for the
+                description.
 
         Returns:
-            A tuple of the populated FeedGenerator and a list of the entry
-            links.
+            `True` if the entry is new.
         """
+        details = [checksum] if checksum else []
+        if size is not None:
+            details.append(f'{size} bytes')
+        description = f'{name} ({", ".join(details)})' if details else name
+        if self._add(name, url, description, url, repo=repo, arch=arch):
+            log.debug('Added %s: %s', name, url)
+            ENTRIES_ADDED.inc(repo=repo or '')
+            return True
+        return False
+
+    def _add(
+        self,
+        title: str,
+        link: str,
+        description: str,
+        content: str,
+        added: float = None,
+        repo: str = None,
+        arch: str = None,
+    ) -> bool:
+        added = self.store.add(
+            normalize_url(link),
+            title,
+            link,
+            description,
+            content,
+            _render(title, link, description, content),
+            added,
+            repo,
+            arch,
+        )
+        if added.tagged:
+            log.debug('Tagged %s with %s %s', link, repo, arch)
+        self.changed = self.changed or added.new or added.tagged
+        return added.new
+
+    def prune(
+        self,
+        retention: Retention,
+        found: dict[str, Iterable[str]] = None,
+    ) -> int:
+        """Remove the entries `retention` says shouldn't be kept.
+
+        Entries removed by the age and count limits aren't added back
+        while they're still upstream. Once `drop_missing` sees one has gone
+        from upstream it can be added again if it comes back.
+
+        Arguments:
+            retention: The retention policy.
+            found: The URLs found upstream by repo name. Only the repos in
+                `found` are checked for entries that have gone missing
+                upstream so it should only have the repos that were
+                completely scraped.
+
+        Returns:
+            The number of entries removed.
+        """
+        removed = 0
+        if retention.drop_missing and found:
+            for repo, urls in found.items():
+                keep = {normalize_url(url) for url in urls}
+                for key in self.store.keys(repo):
+                    if key not in keep:
+                        log.debug('Dropping %s: missing upstream', key)
+                        removed += self.store.remove(key)
+                for key in self.store.pruned(repo):
+                    if key not in keep:
+                        self.store.forget(key)
+        if retention.max_age is not None:
+            removed += self.store.prune_older(
+                time.time() - retention.max_age.total_seconds(),
+            )
+        if retention.per_arch is not None:
+            removed += self.store.prune_all_but_newest(
+                retention.per_arch,
+                per_arch=True,
+            )
+        if retention.max_items is not None:
+            removed += self.store.prune_all_but_newest(retention.max_items)
+        if removed:
+            log.info('Removed %s entries from the feed', removed)
+            self.changed = True
+        return removed
+
+    def load(self):
+        """Open the feed store.
+
+        If the store is new and there is an RSS cache from before the store
+        existed the entries are imported from it.
+        """
+        self.store.open()
+        if not self.store.created:
+            return
         if not self.config.rss_cache.exists():
             log.debug('No RSS cache at %s', self.config.rss_cache)
             return
-        log.debug(
-            'Loading entries from existing cache at %s',
+        log.info(
+            'Importing entries from existing cache at %s',
             self.config.rss_cache,
         )
         parsed = feedparser.parse(self.config.rss_cache)
-        for item in parsed.entries:
-            entry = self.feed.add_entry()
-            entry.title(item.title)
-            entry.description(item.description)
-            entry.content(item.content[0]['value'])
-            entry.link(href=item.link)
-            self.entries.append(item.link)
-
-    def dump(self):
-        """Save the feed to disk."""
-        self.feed.rss_file(self.config.rss_cache, pretty=True)
+        added = self.config.rss_cache.stat().st_mtime
+        # The RSS is newest first and the store is oldest first.
+        for item in reversed(parsed.entries):
+            self._add(
+                item.title,
+                item.link,
+                item.description,
+                item.content[0]['value'],
+                added,
+            )
+        self.store.commit()
+
+    def dump(self) -> bytes:
+        """Save the pending changes and write the RSS and its index to disk.
+
+        Nothing is written if no entries were added or removed since the
+        last time. The index of the RSS is kept in `index`.
+
+        Returns:
+            The RSS that was written or `None` if nothing changed.
+        """
+        self.store.commit()
+        if not self.changed:
+            log.debug('The feed is unchanged, not writing it')
+            return None
+        started = time.perf_counter()
+        header = self.feed.rss_str(pretty=True).decode()
+        head, _, tail = header.rpartition(_CHANNEL_END)
+        parts = [head.encode()]
+        entries = []
+        offset = len(parts[0])
+        for item in self.store.items():
+            xml = item.xml.encode()
+            entries.append(
+                Entry(
+                    item.repo,
+                    item.arch,
+                    item.added,
+                    item.title,
+                    offset,
+                    offset + len(xml),
+                ),
+            )
+            parts.append(xml)
+            offset += len(xml)
+        parts.append(f'{_CHANNEL_END}{tail}'.encode())
+        body = b''.join(parts)
+        self.index = Index(entity_tag(body), len(parts[0]), offset, entries)
+        # The index goes first so the server workers watching the RSS find
+        # the index that goes with it, and each file is replaced in one go
+        # so they never see a partial one.
+        self.index.save(self.config.feed_index)
+        tmp = self.config.rss_cache.with_name(
+            f'.{self.config.rss_cache.name}.tmp',
+        )
+        tmp.write_bytes(body)
+        os.replace(tmp, self.config.rss_cache)
+        self.changed = False
+        DUMP_SECONDS.observe(time.perf_counter() - started)
+        return body
+
+    def close(self):
+        """Close the feed store."""
+        self.store.close()
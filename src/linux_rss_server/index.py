@@ -0,0 +1,144 @@
+"""Index of the items in a published feed.
+
+`feed.Feed` writes an `Index` next to the RSS every time it writes the RSS.
+It records where each item is in the serialized feed along with its repo,
+arch, title and the time it was added, grouped by repo and by repo and arch,
+so the server can answer a request for part of the feed by copying just
+those items out of the published feed.
+"""
+
+import collections
+import fnmatch
+import hashlib
+import json
+import os
+import pathlib
+from dataclasses import astuple, dataclass
+from typing import Iterable
+
+
+def entity_tag(body: bytes) -> str:
+    """Get the (strong) entity tag of `body`."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+@dataclass(frozen=True)
+class Entry:
+    """Where an item is in the serialized feed.
+
+    Attributes:
+        repo: The name of the repo the item is from.
+        arch: The arch the item is for.
+        added: When the item was added as a UNIX timestamp.
+        title: The title of the item (the file name).
+        start: The offset of the first byte of the ``<item>`` element.
+        stop: The offset of the byte after the ``<item>`` element.
+    """
+
+    repo: str
+    arch: str
+    added: float
+    title: str
+    start: int
+    stop: int
+
+
+class Index:
+    """Index of the items in a serialized feed.
+
+    Arguments:
+        etag: The entity tag of the serialized feed.
+        head: The length of the channel header that comes before the items.
+        tail: The offset of the end of the channel after the items.
+        entries: The items newest first.
+    """
+
+    def __init__(
+        self,
+        etag: str,
+        head: int,
+        tail: int,
+        entries: Iterable[Entry],
+    ):
+        self.etag = etag
+        self.head = head
+        self.tail = tail
+        self.entries = list(entries)
+        self._by_repo = collections.defaultdict(list)
+        self._by_arch = collections.defaultdict(list)
+        for entry in self.entries:
+            self._by_repo[entry.repo].append(entry)
+            self._by_arch[entry.repo, entry.arch].append(entry)
+
+    def __len__(self) -> int:
+        """Get the number of indexed items."""
+        return len(self.entries)
+
+    def select(
+        self,
+        repo: str,
+        arch: str = None,
+        since: float = None,
+        limit: int = None,
+        match: str = None,
+    ) -> list[Entry]:
+        """Get the items from `repo` newest first.
+
+        Arguments:
+            repo: The repo name.
+            arch: Only get the items for this arch.
+            since: Only get the items added at or after this UNIX timestamp.
+            limit: The maximum number of items to get.
+            match: A shell style pattern the titles have to match.
+
+        Returns:
+            The matching items or `None` if there are no items from `repo`
+            (and `arch`) at all.
+        """
+        if arch is None:
+            entries = self._by_repo.get(repo)
+        else:
+            entries = self._by_arch.get((repo, arch))
+        if entries is None:
+            return None
+        selected = []
+        for entry in entries:
+            if limit is not None and len(selected) >= limit:
+                break
+            if since is not None and entry.added < since:
+                continue
+            if match is not None and not fnmatch.fnmatchcase(
+                entry.title,
+                match,
+            ):
+                continue
+            selected.append(entry)
+        return selected
+
+    def save(self, path: pathlib.Path):
+        """Write the index to `path` replacing it atomically."""
+        data = json.dumps(
+            {
+                'etag': self.etag,
+                'head': self.head,
+                'tail': self.tail,
+                'entries': [astuple(entry) for entry in self.entries],
+            },
+        )
+        tmp = path.with_name(f'.{path.name}.tmp')
+        tmp.write_text(data)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: pathlib.Path) -> 'Index':
+        """Read the index written to `path` or `None` if there isn't one."""
+        try:
+            data = json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        return cls(
+            data['etag'],
+            data['head'],
+            data['tail'],
+            (Entry(*entry) for entry in data['entries']),
+        )
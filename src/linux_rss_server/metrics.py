@@ -0,0 +1,371 @@
+"""Metrics of the scrapers and the server in the Prometheus text format.
+
+The metrics are module level objects registered with `REGISTRY` by the
+modules that record them, the same way ``prometheus_client`` works, and the
+server renders them all at ``/metrics``.
+
+With `config.Server.workers` the scrapers and the server run in different
+processes. The scraper process writes its metrics to a file after every
+scrape with `Registry.save` and the worker processes add the contents of
+that file (see `Registry.include`) to their own metrics when they render
+them. The workers share their own metrics with each other the same way,
+each under its own ``worker`` label (see `Registry.label` and
+`Registry.share`), so whichever worker answers a scrape every series is
+there and never goes backwards.
+"""
+
+import bisect
+import contextlib
+import math
+import os
+import pathlib
+import threading
+import time
+from typing import Iterable, Iterator
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _merge(texts: Iterable[str]) -> str:
+    """Merge rendered metrics so every metric has one ``HELP`` and ``TYPE``.
+
+    The samples of a metric rendered by more than one process are put
+    together under the first ``HELP`` and ``TYPE`` lines seen for it.
+    """
+    families = {}
+    samples = None
+    for text in texts:
+        for line in text.splitlines():
+            if line.startswith('# HELP '):
+                name = line.split(' ', 3)[2]
+                if name not in families:
+                    families[name] = ([line], [])
+                samples = families[name][1]
+            elif line.startswith('# TYPE '):
+                header = families[line.split(' ', 3)[2]][0]
+                if len(header) == 1:
+                    header.append(line)
+            elif line and samples is not None:
+                samples.append(line)
+    return ''.join(
+        '\n'.join([*header, *lines, '']) for header, lines in families.values()
+    )
+
+
+def _join(labels: str, extra: str) -> str:
+    """Add the `extra` labels to the rendered `labels`."""
+    if not extra:
+        return labels
+    if not labels:
+        return f'{{{extra}}}'
+    return f'{{{extra},{labels[1:]}'
+
+
+class _Metric:
+    """A metric with a value for every combination of its labels.
+
+    Arguments:
+        name: The metric name.
+        documentation: The help text of the metric.
+        labels: The names of the labels of the metric.
+    """
+
+    kind = 'untyped'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labels):
+            raise ValueError(
+                f'{self.name} takes the labels {self.labels} not '
+                f'{tuple(labels)}',
+            )
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def clear(self):
+        """Forget every value."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Get the (name, labels, value) of every sample."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, _labels(self.labels, key), value
+
+    def render(self, labels: str = '') -> str:
+        """Render the metric or an empty string if it has no samples.
+
+        Arguments:
+            labels: Labels added to every sample, like ``a="b"``.
+        """
+        lines = [
+            f'{name}{_join(sample_labels, labels)} {_number(value)}'
+            for name, sample_labels, value in self.samples()
+        ]
+        if not lines:
+            return ''
+        return '\n'.join(
+            [
+                f'# HELP {self.name} {self.documentation}',
+                f'# TYPE {self.name} {self.kind}',
+                *lines,
+                '',
+            ],
+        )
+
+
+class Counter(_Metric):
+    """A count that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        """Add `amount` to the count for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """Get the count for `labels`."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        """Set the value for `labels`."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def get(self, **labels) -> float:
+        """Get the value for `labels` or `None` if it was never set."""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    """The distribution of observed values, usually durations in seconds.
+
+    Arguments:
+        name: The metric name.
+        documentation: The help text of the metric.
+        labels: The names of the labels of the metric.
+        buckets: The upper bounds of the buckets in ascending order.
+    """
+
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        """Add `value` to the distribution for `labels`."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe how long the ``with`` block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        """Get the number of observations for `labels`."""
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ((), 0))
+            return sum(counts)
+
+    def samples(self) -> Iterator[tuple[str, str, float]]:
+        """Get the bucket, sum and count samples of every label set."""
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            )
+        names = self.labels + ('le',)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket',
+                    _labels(names, key + (_number(bound),)),
+                    cumulative,
+                )
+            labels = _labels(self.labels, key)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._includes = []
+        self._labels = ''
+        self._shared = None
+        self._save_lock = threading.Lock()
+
+    def label(self, **labels):
+        """Add `labels` to every sample of the registered metrics."""
+        with self._lock:
+            self._labels = _labels(labels, labels.values())[1:-1]
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add `metric` to the registry and return it."""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Duplicate metric: {metric.name}')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def include(self, path: pathlib.Path):
+        """Add the metrics saved to `path` by another process."""
+        with self._lock:
+            self._includes.append(path)
+
+    def share(self, path: pathlib.Path):
+        """Save the registered metrics to `path` whenever they're rendered.
+
+        Other processes including `path` then never serve older values than
+        this one has.
+        """
+        with self._lock:
+            self._shared = path
+
+    def render(self) -> bytes:
+        """Render every metric with samples in the text format.
+
+        The metrics of the included files are merged with the registered
+        ones.
+        """
+        with self._lock:
+            includes = list(self._includes)
+            shared = self._shared
+        texts = [self.save(shared) if shared else self._render()]
+        for path in includes:
+            try:
+                texts.append(path.read_text())
+            except FileNotFoundError:
+                pass
+        if len(texts) == 1:
+            return texts[0].encode()
+        return _merge(texts).encode()
+
+    def _render(self) -> str:
+        """Render the registered metrics without the included files."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            labels = self._labels
+        return ''.join(metric.render(labels) for metric in metrics)
+
+    def save(self, path: pathlib.Path) -> str:
+        """Write the registered metrics to `path` replacing it atomically.
+
+        The included files aren't written, so processes can include each
+        other's metrics.
+
+        Returns:
+            The metrics that were written.
+        """
+        tmp = path.with_name(f'.{path.name}.tmp')
+        # Rendering and writing together keeps newer values from being
+        # overwritten by older ones.
+        with self._save_lock:
+            text = self._render()
+            tmp.write_text(text)
+            os.replace(tmp, path)
+        return text
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labels=()) -> Counter:
+    """Make a `Counter` registered with `REGISTRY`."""
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+
+def gauge(name: str, documentation: str, labels=()) -> Gauge:
+    """Make a `Gauge` registered with `REGISTRY`."""
+    return REGISTRY.register(Gauge(name, documentation, labels))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labels=(),
+    buckets: Iterable[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    """Make a `Histogram` registered with `REGISTRY`."""
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
@@ -0,0 +1,401 @@
+"""The published version of the feed served to clients.
+
+The scraper publishes the serialized feed once per cycle and the server
+answers every request from the current `Publication` in memory. Publishing
+swaps in a new immutable `Publication` so requests in flight keep using the
+one they started with.
+
+Every publication is compressed when it's published, with gzip and, if the
+``brotli`` and ``zstandard`` packages are installed, with brotli and zstd,
+so no compression happens while serving. A `Publisher` given a directory
+writes every variant to a file named after its entity tag and serves it from
+there so large feeds are sent with ``sendfile`` and never held in memory.
+
+The feed loaded when the server starts is published uncompressed right away
+and compressed in the background, so it's served without waiting for the
+(slow) brotli compression of a large feed.
+
+Server worker processes don't share memory with the scraper so they
+`Publisher.watch` the RSS file it writes instead.
+"""
+
+import dataclasses
+import gzip
+import os
+import pathlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Callable
+
+from . import log
+from .index import Index, entity_tag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+IDENTITY = 'identity'
+
+
+def _compressors() -> dict:
+    """Get the available compressors by content coding, best first."""
+    compressors = {}
+    if brotli is not None:
+        compressors['br'] = lambda body: brotli.compress(body, quality=11)
+    if zstandard is not None:
+        compressors['zstd'] = zstandard.ZstdCompressor(level=19).compress
+    compressors['gzip'] = lambda body: gzip.compress(body, 9, mtime=0)
+    return compressors
+
+
+@dataclass(frozen=True)
+class Variant:
+    """The feed in one content coding.
+
+    Attributes:
+        encoding: The content coding (eg ``gzip``) or ``identity``.
+        body: The encoded feed or `None` if it's in `file`.
+        etag: The (strong) entity tag of this variant.
+        file: The encoded feed in an open file if it was spooled.
+    """
+
+    encoding: str
+    body: bytes
+    etag: str
+    file: BinaryIO = None
+
+    @property
+    def size(self) -> int:
+        """The size of the encoded feed in bytes."""
+        if self.body is not None:
+            return len(self.body)
+        return os.fstat(self.file.fileno()).st_size
+
+    def spool(self, path: pathlib.Path) -> 'Variant':
+        """Write the variant to `path` and keep only the open file.
+
+        `path` is only ever written once and replaced atomically so the file
+        can be sent straight from the page cache.
+        """
+        try:
+            # Another process may have spooled the same version already.
+            file = path.open('rb')
+        except FileNotFoundError:
+            tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+            tmp.write_bytes(self.body)
+            os.replace(tmp, path)
+            file = path.open('rb')
+        return dataclasses.replace(self, body=None, file=file)
+
+
+@dataclass(frozen=True)
+class Publication:
+    """An immutable version of the feed.
+
+    Attributes:
+        body: The serialized feed.
+        etag: The (strong) entity tag of `body`.
+        modified: The time `body` was published as a UNIX timestamp.
+        variants: The variants of the feed by content coding in order of
+            preference. This always includes ``identity``.
+        index: The index of the items in `body` if there is one.
+    """
+
+    body: bytes
+    etag: str
+    modified: float = field(default_factory=time.time)
+    variants: dict[str, Variant] = field(default_factory=dict)
+    index: Index = None
+
+    def read(self, start: int, stop: int) -> bytes:
+        """Get the bytes from `start` to `stop` of the serialized feed."""
+        if self.body is not None:
+            return self.body[start:stop]
+        file = self.variants[IDENTITY].file
+        return os.pread(file.fileno(), stop - start, start)
+
+    def spool(self, directory: pathlib.Path) -> 'Publication':
+        """Move the variants into versioned files in `directory`.
+
+        Returns:
+            A copy of the publication that keeps none of the feed in memory.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        return dataclasses.replace(
+            self,
+            body=None,
+            variants={
+                encoding: variant.spool(directory / self._filename(encoding))
+                for encoding, variant in self.variants.items()
+            },
+        )
+
+    def unlink(self, directory: pathlib.Path):
+        """Remove the files `spool` wrote to `directory`.
+
+        Requests in progress keep reading the files they have open.
+        """
+        for encoding in self.variants:
+            (directory / self._filename(encoding)).unlink(missing_ok=True)
+
+    def _filename(self, encoding: str) -> str:
+        digest = self.etag.strip('"')
+        return f'{digest}.{encoding}'
+
+    @classmethod
+    def from_body(
+        cls,
+        body: bytes,
+        modified: float = None,
+        compress: bool = True,
+    ) -> 'Publication':
+        """Make a publication of `body`.
+
+        Arguments:
+            body: The serialized feed.
+            modified: When `body` was last changed. Defaults to now.
+            compress: Set to `False` to make only the ``identity`` variant.
+        """
+        etag = entity_tag(body)
+        digest = etag.strip('"')
+        variants = {}
+        compressors = _compressors() if compress else {}
+        for encoding, encode in compressors.items():
+            encoded = encode(body)
+            if len(encoded) < len(body):
+                variants[encoding] = Variant(
+                    encoding,
+                    encoded,
+                    f'"{digest}-{encoding}"',
+                )
+        variants[IDENTITY] = Variant(IDENTITY, body, etag)
+        if modified is None:
+            modified = time.time()
+        return cls(body, etag, modified, variants)
+
+    @property
+    def etags(self) -> set[str]:
+        """The entity tags of all the variants."""
+        return {variant.etag for variant in self.variants.values()}
+
+    def negotiate(self, accept_encoding: str) -> Variant:
+        """Pick the variant to send given an ``Accept-Encoding`` header.
+
+        The variant with the highest quality value wins. Ties go to the
+        better compression. If the client won't accept anything the feed is
+        sent uncompressed anyway.
+        """
+        if not accept_encoding:
+            return self.variants[IDENTITY]
+        qualities = {}
+        for coding in accept_encoding.split(','):
+            name, *params = [part.strip() for part in coding.split(';')]
+            quality = 1.0
+            for param in params:
+                key, _, value = param.partition('=')
+                if key.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[name.lower()] = quality
+        default = qualities.get('*', 0.0)
+        best = None
+        best_quality = 0.0
+        for encoding, variant in self.variants.items():
+            if encoding == IDENTITY:
+                quality = qualities.get(IDENTITY, qualities.get('*', 0.001))
+            else:
+                quality = qualities.get(encoding, default)
+            if quality > best_quality:
+                best, best_quality = variant, quality
+        return best or self.variants[IDENTITY]
+
+
+class Publisher:
+    """Keeper of the current `Publication`.
+
+    Arguments:
+        directory: If given every publication is spooled to versioned files
+            in `directory` instead of being kept in memory.
+        compress: Set to `False` to only publish the feed uncompressed, for
+            a publisher that doesn't serve it.
+    """
+
+    def __init__(self, directory: pathlib.Path = None, compress: bool = True):
+        self.directory = directory
+        self.compress = compress
+        self._current = None
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def subscribe(self, callback: Callable[[Publication], None]):
+        """Call `callback` with every new publication once it's current."""
+        self._subscribers.append(callback)
+
+    @property
+    def current(self) -> Publication:
+        """The current publication or `None` if nothing was published."""
+        return self._current
+
+    def publish(
+        self,
+        body: bytes,
+        modified: float = None,
+        index: Index = None,
+        defer: bool = False,
+    ) -> Publication:
+        """Make `body` the current version of the feed.
+
+        If `body` is the same as the current version the current version is
+        kept so it keeps its modification time.
+
+        Arguments:
+            body: The serialized feed.
+            modified: When `body` was last changed. Defaults to now.
+            index: The index of the items in `body`. It's ignored if it
+                isn't the index of `body`.
+            defer: Set to publish `body` uncompressed right away and swap in
+                the compressed variants once they're made in the background.
+        """
+        etag = entity_tag(body)
+        if index is not None and index.etag != etag:
+            log.warning('Ignoring the index of another version of the feed')
+            index = None
+        with self._lock:
+            current = self._current
+            if current is not None and current.etag == etag:
+                if index is not None and current.index is None:
+                    self._current = dataclasses.replace(current, index=index)
+                return self._current
+        compress = self.compress and not defer
+        publication = self._make(body, modified, index, compress)
+        with self._lock:
+            current, self._current = self._current, publication
+        if self.directory is not None and current is not None:
+            current.unlink(self.directory)
+        log.info('Published feed %s', publication.etag)
+        for callback in self._subscribers:
+            callback(publication)
+        if defer and self.compress:
+            threading.Thread(
+                target=self._compress,
+                args=(publication, body),
+                daemon=True,
+            ).start()
+        return publication
+
+    def _make(
+        self,
+        body: bytes,
+        modified: float,
+        index: Index,
+        compress: bool = True,
+    ) -> Publication:
+        publication = Publication.from_body(body, modified, compress)
+        publication = dataclasses.replace(publication, index=index)
+        if self.directory is not None:
+            publication = publication.spool(self.directory)
+        return publication
+
+    def _compress(self, publication: Publication, body: bytes):
+        """Swap in a copy of `publication` with all the variants.
+
+        Nothing is swapped in if another version was published meanwhile.
+        """
+        compressed = self._make(body, publication.modified, publication.index)
+        with self._lock:
+            current = self._current
+            if current is not None and current.etag == publication.etag:
+                self._current = dataclasses.replace(
+                    compressed,
+                    index=current.index,
+                )
+                log.debug('Compressed feed %s', publication.etag)
+                return
+        if self.directory is not None:
+            compressed.unlink(self.directory)
+
+    def load(
+        self,
+        path: pathlib.Path,
+        index_path: pathlib.Path = None,
+        defer: bool = False,
+    ) -> Publication:
+        """Publish the feed previously written to `path` if there is one.
+
+        The index of the feed is read from `index_path` if it's given. If
+        `defer` is set the feed is compressed in the background (see
+        `publish`).
+        """
+        if not path.exists():
+            return None
+        return self.publish(
+            path.read_bytes(),
+            path.stat().st_mtime,
+            Index.load(index_path) if index_path is not None else None,
+            defer,
+        )
+
+    def clean(self):
+        """Remove the files of publications other than the current one."""
+        if self.directory is None or not self.directory.exists():
+            return
+        keep = set()
+        if self._current is not None:
+            keep = {
+                pathlib.Path(variant.file.name).name
+                for variant in self._current.variants.values()
+            }
+        for path in self.directory.iterdir():
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+
+    def watch(
+        self,
+        path: pathlib.Path,
+        stop: threading.Event,
+        interval: float,
+        index_path: pathlib.Path = None,
+        wake: threading.Event = None,
+    ):
+        """Publish the feed at `path` every time it changes.
+
+        The file (and the index at `index_path` if it's given) is checked
+        every `interval` seconds until `stop` is set, and right away whenever
+        `wake` is set. The writer is expected to replace the files
+        atomically.
+        """
+        seen = None
+        if self._current is not None:
+            seen = _signature(path), _signature(index_path)
+        while True:
+            signature = _signature(path), _signature(index_path)
+            if signature[0] is not None and signature != seen:
+                log.debug('Reloading %s', path)
+                self.load(path, index_path)
+            seen = signature
+            if wake is None:
+                stop.wait(interval)
+            else:
+                wake.wait(interval)
+                wake.clear()
+            if stop.is_set():
+                return
+
+
+def _signature(path: pathlib.Path) -> tuple[int, int, int]:
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,211 @@
+"""Reload the config when its file changes.
+
+`ConfigWatcher` waits for the config file to change with inotify (through
+`ctypes` so there's nothing to install) or, where that isn't available, by
+checking the file every few seconds. The parent directory is watched rather
+than the file itself so files that are replaced (by editors, or by
+Kubernetes swapping the symlinks of a ConfigMap) are noticed too.
+
+A new config only replaces the running one if it loads without errors. The
+settings the server was started with (`RESTART_FIELDS`) are kept until the
+daemon is restarted. `diff_repos` finds the repos that were added or changed
+so only those have to be scraped right away.
+"""
+
+import ctypes
+import ctypes.util
+import dataclasses
+import errno
+import os
+import pathlib
+import select
+from typing import Callable
+
+import yaml
+
+from . import log
+from .config import Config, Repo
+from .server import StopEvent
+
+POLL_INTERVAL = 5
+RESTART_FIELDS = ('port', 'rss_cache', 'server')
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+
+
+def _inotify(directory: pathlib.Path) -> int:
+    """Get an inotify file descriptor watching `directory` or `None`."""
+    name = ctypes.util.find_library('c')
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        init = libc.inotify_init1
+        add_watch = libc.inotify_add_watch
+    except (AttributeError, OSError):
+        return None
+    fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        log.debug('inotify_init1: %s', os.strerror(ctypes.get_errno()))
+        return None
+    if add_watch(fd, os.fsencode(directory), _MASK) < 0:
+        log.debug('inotify_add_watch: %s', os.strerror(ctypes.get_errno()))
+        os.close(fd)
+        return None
+    return fd
+
+
+def _signature(path: pathlib.Path) -> tuple:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class ConfigWatcher:
+    """Watch the config file at `path` for changes.
+
+    Arguments:
+        path: The config file.
+        interval: How often to check the file in seconds without inotify.
+        inotify: Set to `False` to always check the file every `interval`.
+    """
+
+    def __init__(
+        self,
+        path: pathlib.Path,
+        interval: float = POLL_INTERVAL,
+        inotify: bool = True,
+    ):
+        self.path = path
+        self.interval = interval
+        self._fd = _inotify(path.parent) if inotify else None
+        if self._fd is None:
+            log.debug('Checking %s every %ss', path, interval)
+        self._signature = _signature(path)
+
+    @property
+    def inotify(self) -> bool:
+        """`True` if inotify is being used."""
+        return self._fd is not None
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self._fd, 4096):
+                    return
+            except BlockingIOError:
+                return
+            except OSError as err:
+                if err.errno != errno.EINTR:
+                    raise
+
+    def wait(self, stop: StopEvent) -> bool:
+        """Wait for the file to change.
+
+        Returns:
+            `True` if it changed or `False` if `stop` was set first.
+        """
+        while not stop.is_set():
+            if self._fd is None:
+                stop.wait(self.interval)
+            else:
+                ready, _, _ = select.select([self._fd, stop], [], [])
+                if self._fd not in ready:
+                    continue
+                self._drain()
+            signature = _signature(self.path)
+            if signature != self._signature:
+                self._signature = signature
+                # A file that's gone is waited for to come back.
+                if signature is not None:
+                    return True
+        return False
+
+    def close(self):
+        """Stop watching the file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def diff_repos(old: list[Repo], new: list[Repo]) -> tuple[list[Repo], list]:
+    """Compare the repos of two configs.
+
+    Returns:
+        The repos in `new` that aren't in `old` or that changed, in the
+        order of `new`, and the names of the repos that were removed.
+    """
+    before = {repo.name: repo for repo in old}
+    names = {repo.name for repo in new}
+    changed = [repo for repo in new if before.get(repo.name) != repo]
+    removed = [repo.name for repo in old if repo.name not in names]
+    return changed, removed
+
+
+def merge(old: Config, new: Config) -> Config:
+    """Get `new` with the settings that need a restart kept from `old`."""
+    kept = {}
+    for name in RESTART_FIELDS:
+        if getattr(old, name) != getattr(new, name):
+            log.warning(
+                'Restart the server to apply the new `%s` setting.',
+                name,
+            )
+            kept[name] = getattr(old, name)
+    return dataclasses.replace(new, **kept)
+
+
+def watch(
+    path: pathlib.Path,
+    load: Callable[[], Config],
+    apply: Callable[[Config], None],
+    stop: StopEvent,
+    interval: float = POLL_INTERVAL,
+):
+    """Call `apply` with the new config every time the file changes.
+
+    Changes that don't load are logged and otherwise ignored.
+
+    Arguments:
+        path: The config file.
+        load: Loads the config from the file.
+        apply: Applies a new config.
+        stop: Stops watching when it's set.
+        interval: How often to check the file without inotify.
+    """
+    watcher = ConfigWatcher(path, interval)
+    try:
+        while watcher.wait(stop):
+            try:
+                config = load()
+            except (
+                AttributeError,
+                KeyError,
+                OSError,
+                TypeError,
+                ValueError,
+                yaml.YAMLError,
+            ) as err:
+                log.error('Not reloading the invalid config %s: %s', path, err)
+                continue
+            log.info('Reloading the config from %s', path)
+            apply(config)
+    finally:
+        watcher.close()
@@ -0,0 +1,167 @@
+"""Decide when each repo is scraped.
+
+Every repo has its own interval (its `check_every` or the global one) and
+its own next due time, kept in a heap so the scraper only ever has to look
+at the repo that's due soonest. The first checks after the initial scrape
+are lined up with `Config.start_at` and every check after that is moved by
+a random jitter so repos with the same interval spread out over time.
+
+With `config.Schedule.adaptive` set a repo that had new files is checked
+twice as often and one that didn't is checked a bit less often, within
+`config.Schedule.max_backoff` times its configured interval and never more
+often than every 15 minutes.
+"""
+
+import datetime
+import heapq
+import random
+
+from . import log
+from .config import Config, Repo
+
+MIN_INTERVAL = 15 * 60
+_SPEED_UP = 0.5
+_BACK_OFF = 1.5
+
+
+class Scheduler:
+    """Per repo scrape scheduler.
+
+    Every repo is due right away.
+
+    Arguments:
+        config: The application configuration.
+        now: The current UNIX timestamp.
+        rng: The source of the jitter.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        now: float,
+        rng: random.Random = None,
+    ):
+        self.config = config
+        self._rng = rng or random.Random()
+        self.intervals = {
+            repo.name: self.base_interval(repo) for repo in config.repos
+        }
+        self._checked = set()
+        self._heap = [(now, repo.name) for repo in config.repos]
+        heapq.heapify(self._heap)
+
+    def base_interval(self, repo: Repo) -> float:
+        """Get the configured interval of `repo` in seconds."""
+        check_every = repo.check_every or self.config.check_every
+        return check_every.timedelta.total_seconds()
+
+    def next_due(self) -> float:
+        """Get the UNIX timestamp the next repo is due at or `None`."""
+        return self._heap[0][0] if self._heap else None
+
+    def due(self, now: float) -> list[Repo]:
+        """Take the repos that are due at `now` in the configured order.
+
+        Every repo taken has to be given back with `done`.
+        """
+        names = set()
+        while self._heap and self._heap[0][0] <= now:
+            names.add(heapq.heappop(self._heap)[1])
+        return [repo for repo in self.config.repos if repo.name in names]
+
+    def done(self, repo: Repo, changed: bool, now: float) -> float:
+        """Schedule the next check of `repo`.
+
+        Arguments:
+            repo: A repo that was returned by `due`.
+            changed: Whether the check found new files.
+            now: The current UNIX timestamp.
+
+        Returns:
+            The UNIX timestamp `repo` is due at next.
+        """
+        base = self.base_interval(repo)
+        interval = self.intervals[repo.name]
+        if repo.name not in self._checked:
+            self._checked.add(repo.name)
+            due = self._first_due(base, now)
+        else:
+            if self.config.schedule.adaptive:
+                interval *= _SPEED_UP if changed else _BACK_OFF
+                backoff = self.config.schedule.max_backoff
+                interval = min(
+                    max(interval, base / backoff, MIN_INTERVAL),
+                    base * backoff,
+                )
+                self.intervals[repo.name] = interval
+            due = now + interval
+        jitter = self.config.schedule.jitter * interval
+        due = max(due + self._rng.uniform(-jitter, jitter), now + MIN_INTERVAL)
+        heapq.heappush(self._heap, (due, repo.name))
+        log.debug(
+            'Next check of %s at %s',
+            repo.name,
+            datetime.datetime.fromtimestamp(due).isoformat(' ', 'seconds'),
+        )
+        return due
+
+    def update(self, config: Config, changed: list[Repo], now: float):
+        """Switch to a reloaded config.
+
+        Repos that were removed aren't checked again, repos in `changed`
+        (added or changed) are due right away and the others keep their
+        schedules.
+
+        Arguments:
+            config: The new configuration.
+            changed: The repos in `config` that were added or changed.
+            now: The current UNIX timestamp.
+        """
+        names = {repo.name for repo in config.repos}
+        # Repos the scheduler doesn't know are new whatever `changed` says.
+        changed = {repo.name for repo in changed} | (
+            names - set(self.intervals)
+        )
+        self.config = config
+        for repo in config.repos:
+            base = self.base_interval(repo)
+            interval = self.intervals.get(repo.name)
+            if repo.name in changed:
+                self.intervals[repo.name] = base
+                self._checked.discard(repo.name)
+            elif config.schedule.adaptive:
+                # Keep the adapted interval within the new limits.
+                backoff = config.schedule.max_backoff
+                self.intervals[repo.name] = min(
+                    max(interval, base / backoff, MIN_INTERVAL),
+                    base * backoff,
+                )
+            else:
+                self.intervals[repo.name] = base
+        self.intervals = {
+            name: interval
+            for name, interval in self.intervals.items()
+            if name in names
+        }
+        self._checked &= names
+        self._heap = [
+            (due, name)
+            for due, name in self._heap
+            if name in names and name not in changed
+        ]
+        self._heap.extend((now, name) for name in changed)
+        heapq.heapify(self._heap)
+
+    def _first_due(self, interval: float, now: float) -> float:
+        """Get the first time after `now` that lines up with `start_at`."""
+        start = (
+            datetime.datetime.fromtimestamp(now)
+            .replace(
+                hour=self.config.start_at.hour,
+                minute=self.config.start_at.minute,
+                second=0,
+                microsecond=0,
+            )
+            .timestamp()
+        )
+        return now + ((start - now) % interval or interval)
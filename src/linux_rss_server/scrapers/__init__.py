@@ -1,13 +1,89 @@
-"""Linux installer repo scraper runner."""
+"""Linux installer repo scraper registry.
 
-from . import debian, ubuntu
+Each repo type (`config.Repo.type`) has a `Scraper` that knows the layout of
+that kind of mirror. The ``debian``, ``ubuntu`` and ``manifest`` scrapers are
+built in. Other packages can add scrapers for more layouts with an entry
+point in the ``linux_rss_server.scrapers`` group naming a `Scraper`
+subclass. The name of the entry point is the repo type. For example in
+``setup.cfg``::
 
-_SCRAPERS = {
-    'debian': debian,
-    'ubuntu': ubuntu,
+    [options.entry_points]
+    linux_rss_server.scrapers =
+        fedora = linux_rss_fedora:Fedora
+
+Scrapers are only imported when a repo of their type is first scraped.
+"""
+
+import importlib.metadata
+import threading
+
+from .. import log
+from .base import Scraper
+
+ENTRY_POINT_GROUP = 'linux_rss_server.scrapers'
+_BUILTIN = {
+    'debian': 'linux_rss_server.scrapers.debian:Debian',
+    'ubuntu': 'linux_rss_server.scrapers.ubuntu:Ubuntu',
+    'manifest': 'linux_rss_server.scrapers.manifest:Manifest',
 }
+_SCRAPERS = {}
+_lock = threading.Lock()
+
+
+def _entry_points() -> dict[str, importlib.metadata.EntryPoint]:
+    """Get the entry points of every scraper by repo type."""
+    entry_points = {}
+    for entry_point in importlib.metadata.entry_points(
+        group=ENTRY_POINT_GROUP,
+    ):
+        if entry_point.name in _BUILTIN:
+            log.warning(
+                'Ignoring the %s scraper from %s: %s is built in',
+                entry_point.name,
+                entry_point.value,
+                entry_point.name,
+            )
+            continue
+        entry_points[entry_point.name] = entry_point
+    for name, value in _BUILTIN.items():
+        entry_points[name] = importlib.metadata.EntryPoint(
+            name,
+            value,
+            ENTRY_POINT_GROUP,
+        )
+    return entry_points
+
+
+def types() -> set[str]:
+    """Get the repo types there are scrapers for."""
+    with _lock:
+        return set(_SCRAPERS) | set(_entry_points())
+
 
+def get(repo_type: str) -> Scraper:
+    """Get the scraper that corresponds to `repo_type`.
 
-def get(repo_type: str):
-    """Get the scraper that corresponds to `repo_type`."""
-    return _SCRAPERS[repo_type]
+    Raises:
+        KeyError: If there's no scraper for `repo_type`.
+        TypeError: If the entry point of `repo_type` isn't a `Scraper`.
+    """
+    with _lock:
+        scraper = _SCRAPERS.get(repo_type)
+        if scraper is not None:
+            return scraper
+        entry_point = _entry_points()[repo_type]
+        scraper = entry_point.load()
+        if isinstance(scraper, type):
+            scraper = scraper()
+        if not isinstance(scraper, Scraper):
+            raise TypeError(
+                f'The {repo_type} scraper from {entry_point.value} is not a '
+                'Scraper',
+            )
+        log.debug(
+            'Loaded the %s scraper from %s',
+            repo_type,
+            entry_point.value,
+        )
+        _SCRAPERS[repo_type] = scraper
+        return scraper
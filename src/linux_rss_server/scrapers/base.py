@@ -0,0 +1,117 @@
+"""The interface every scraper implements.
+
+Scrapers don't fetch anything themselves. They say which pages to fetch for
+a repo and turn the content of those pages into the files they list. The
+fetching is done by `engine` for every scraper alike, so a new scraper gets
+the connection pooling, concurrency and politeness limits, retries and page
+cache without doing anything.
+"""
+
+import abc
+import copy
+from typing import Iterable
+
+from ..config import Config
+
+
+class Scraper(abc.ABC):
+    """A scraper for one mirror layout.
+
+    Every URL of a repo is turned into the pages to fetch by `urls`. If
+    `subpages` is set each of those pages is an index of sub-pages (eg one
+    directory per release) that's parsed with `parse_subpages`, and then
+    every sub-page is fetched and parsed with `parse`. Otherwise the pages
+    are parsed with `parse` directly.
+
+    The parse methods get the content of the page as it's downloaded and
+    are only called when the page changed since it was last parsed. Their
+    results have to be JSON serializable since they're cached.
+
+    Every scraper has to implement `parse`, and `parse_subpages` too if it
+    sets `subpages`, or it can't be loaded.
+
+    Repos can have options only their type understands (`config.Repo.options`)
+    that are checked by `check_options`. Each repo is scraped by its own copy
+    of the scraper made by `configure`, which has them in `options`.
+
+    Attributes:
+        subpages: `True` if the repo's pages are indexes of sub-pages.
+        options: The options of the repo the scraper is for.
+    """
+
+    subpages = False
+    options = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.subpages and cls.parse_subpages is Scraper.parse_subpages:
+            raise TypeError(
+                f'{cls.__qualname__} sets subpages but has no parse_subpages',
+            )
+
+    def check_options(self, options: dict) -> dict:
+        """Check the options of a repo of this type.
+
+        Defaults to not allowing any.
+
+        Returns:
+            The options as the scraper wants them in `options`.
+
+        Raises:
+            ValueError: If the options aren't valid.
+        """
+        if options:
+            raise ValueError(f'Unknown options: {", ".join(options)}')
+        return {}
+
+    def configure(self, options: dict) -> 'Scraper':
+        """Get a copy of the scraper for a repo with `options`."""
+        scraper = copy.copy(self)
+        scraper.options = options
+        return scraper
+
+    def urls(self, config: Config, url: str) -> list[str]:
+        """Get the pages to fetch for the repo URL `url`.
+
+        Defaults to just `url`.
+        """
+        return [url]
+
+    def parse_subpages(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> list[str]:
+        """Find the sub-pages listed on the index page at `url`.
+
+        Arguments:
+            config: The application configuration.
+            url: The URL of the page.
+            chunks: The content of the page in chunks.
+
+        Returns:
+            The URLs of the sub-pages ordered oldest first. Sub-pages that
+            were parsed before and aren't among the newest
+            `config.Recrawl.recent` aren't fetched again.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def parse(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> Iterable[tuple[str, str]]:
+        """Find the files listed on the page at `url`.
+
+        Arguments:
+            config: The application configuration.
+            url: The URL of the page.
+            chunks: The content of the page in chunks.
+
+        Returns:
+            The file name and URL of every file with
+            `config.Config.file_extension`.
+        """
@@ -1,25 +1,29 @@
 """Debian installer RSS feed generator."""
 
 import os
-from typing import Generator
-
-import bs4
+from typing import Generator, Iterable
 
 from ..config import Config
-from . import page
+from . import links
+from .base import Scraper
+
+
+class Debian(Scraper):
+    """Scraper of Debian style directory listings.
 
+    The files are the links heading the rows of the listing's table.
+    """
 
-def scrape(config: Config, url: str) -> Generator[str, None, None]:
-    """Find all the target files on the page at `url`."""
-    content = page.get(url)
-    if not content:
-        return
-    soup = bs4.BeautifulSoup(content, features='lxml')
-    for tr in soup.find_all('tr'):
-        try:
-            _, ext = os.path.splitext(tr.td.a.attrs.get('href', ''))
-        except AttributeError:
-            continue
-        if ext.strip('.') == config.file_extension.strip('.'):
-            filename = tr.td.a.attrs['href']
-            yield filename, f'{url}/{filename}'
+    def parse(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> Generator[tuple[str, str], None, None]:
+        """Find all the target files on the page at `url`."""
+        for link in links.iter_links(chunks):
+            if not link.row_head:
+                continue
+            _, ext = os.path.splitext(link.href)
+            if ext.strip('.') == config.file_extension.strip('.'):
+                yield link.href, f'{url}/{link.href}'
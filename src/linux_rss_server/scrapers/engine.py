@@ -0,0 +1,290 @@
+"""Concurrent scraping of every configured repo.
+
+Every page of every repo is fetched as an independent job on a thread pool
+and parsed by the repo's `Scraper`. The pages a scraper lists as sub-pages
+are scheduled as jobs of their own, and sub-pages outside the
+`Config.recrawl` window are only fetched if they were never harvested
+before. Jobs are dispatched so that no more than the host's
+`Politeness.per_host` (by default `Concurrency.per_host`) of them talk to
+the same host at once and the results are merged in configuration order
+regardless of the order they finished in. The requests themselves are
+spaced out, retried and cached according to the `Politeness` of their host
+by `page`.
+"""
+
+import collections
+import concurrent.futures
+import dataclasses
+import json
+import time
+import urllib.parse
+from dataclasses import dataclass
+from typing import Iterable, NamedTuple
+
+from .. import log, metrics
+from ..config import Config, Politeness, Repo
+from . import get, page
+from .base import Scraper
+
+CACHE_HIT_RATIO = metrics.gauge(
+    'linux_rss_page_cache_hit_ratio',
+    'The fraction of the pages of the last scrape that were unchanged.',
+)
+
+
+class Found(NamedTuple):
+    """A file found by a scraper.
+
+    Attributes:
+        checksum: The checksum of the file as ``<algorithm>:<hex digest>``
+            if the scraper knows it.
+        size: The size of the file in bytes if the scraper knows it.
+    """
+
+    filename: str
+    url: str
+    repo: str
+    arch: str
+    checksum: str = None
+    size: int = None
+
+
+@dataclass
+class _Job:
+    """A single page to scrape.
+
+    Attributes:
+        key: Where the results go in the merged results.
+        repo: The repo the page belongs to.
+        arch: The arch of the repo URL the page belongs to.
+        url: The URL of the page.
+        scraper: The scraper of the repo.
+        index: `True` if the page lists sub-pages rather than files.
+        refresh: `False` if the page doesn't have to be fetched again if it
+            was parsed before.
+    """
+
+    key: tuple[int, ...]
+    repo: Repo
+    arch: str
+    url: str
+    scraper: Scraper
+    index: bool = False
+    refresh: bool = True
+
+    @property
+    def host(self) -> str:
+        """The host the job talks to."""
+        return urllib.parse.urlsplit(self.url).netloc
+
+    def run(self, config: Config) -> list:
+        """Fetch and parse the page."""
+        if self.index:
+            return page.parse(
+                self.url,
+                lambda chunks: self.scraper.parse_subpages(
+                    config,
+                    self.url,
+                    chunks,
+                ),
+                scraper=self.repo.type,
+            )
+        # The results depend on the repo's options as well.
+        variant = config.file_extension
+        if self.scraper.options:
+            options = json.dumps(self.scraper.options, sort_keys=True)
+            variant = f'{variant} {options}'
+        return page.parse(
+            self.url,
+            lambda chunks: self.scraper.parse(config, self.url, chunks),
+            variant=variant,
+            refresh=self.refresh,
+            scraper=self.repo.type,
+        )
+
+
+class Engine:
+    """Scrape repos concurrently.
+
+    Arguments:
+        config: The application configuration.
+
+    Attributes:
+        incomplete: The names of the repos with pages that couldn't be
+            scraped during the last `scrape`.
+        unchanged: The names of the repos whose pages were all the same as
+            the last time they were scraped (see `page.unchanged`) during
+            the last `scrape`.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.incomplete = set()
+        self.unchanged = set()
+        self._changed = set()
+        self._queues = collections.defaultdict(collections.deque)
+        self._in_flight = collections.Counter()
+        self._results = {}
+
+    def _jobs(self, repos: Iterable[Repo]) -> Iterable[_Job]:
+        for repo_index, repo in enumerate(repos):
+            try:
+                scraper = get(repo.type).configure(repo.options)
+                targets = [
+                    (arch, list(scraper.urls(self.config, url)))
+                    for arch, url in repo.targets()
+                ]
+            except Exception:
+                self._fail(repo, repo.url_format)
+                continue
+            for url_index, (arch, urls) in enumerate(targets):
+                for page_index, page_url in enumerate(urls):
+                    yield _Job(
+                        (repo_index, url_index, page_index),
+                        repo,
+                        arch,
+                        page_url,
+                        scraper,
+                        index=scraper.subpages,
+                    )
+
+    def _politeness(self, repos: list[Repo]) -> dict[str, Politeness]:
+        """Get the request limits of every host `repos` are on.
+
+        Repos sharing a host get the strictest of their limits.
+        """
+        hosts = {}
+        for repo in repos:
+            politeness = repo.politeness or self.config.politeness
+            for url in repo:
+                host = urllib.parse.urlsplit(url).netloc
+                if host in hosts:
+                    hosts[host] = hosts[host].stricter(politeness)
+                else:
+                    hosts[host] = politeness
+        return {
+            host: self._resolve(politeness)
+            for host, politeness in hosts.items()
+        }
+
+    def _resolve(self, politeness: Politeness) -> Politeness:
+        if politeness.per_host is not None:
+            return politeness
+        return dataclasses.replace(
+            politeness,
+            per_host=self.config.concurrency.per_host,
+        )
+
+    def _fail(self, repo: Repo, url: str):
+        """Mark `repo` incomplete after its scraper raised on `url`."""
+        log.error(
+            'The %s scraper failed on %s of %s',
+            repo.type,
+            url,
+            repo.name,
+            exc_info=True,
+        )
+        self.incomplete.add(repo.name)
+
+    def _queue(self, job: _Job):
+        self._queues[job.host].append(job)
+
+    def _dispatch(self, executor: concurrent.futures.Executor) -> dict:
+        futures = {}
+        for host, queue in self._queues.items():
+            per_host = page.politeness(queue[0].url).per_host if queue else 0
+            while queue and self._in_flight[host] < per_host:
+                job = queue.popleft()
+                self._in_flight[host] += 1
+                futures[executor.submit(job.run, self.config)] = job
+        return futures
+
+    def _finish(self, job: _Job, result: list):
+        self._in_flight[job.host] -= 1
+        if page.failed(job.url):
+            self.incomplete.add(job.repo.name)
+        if not page.unchanged(job.url):
+            self._changed.add(job.repo.name)
+        if not job.index:
+            self._results[job.key] = [
+                Found(filename, url, job.repo.name, job.arch, *meta)
+                for filename, url, *meta in result
+            ]
+            return
+        for index, url in enumerate(result):
+            self._queue(
+                dataclasses.replace(
+                    job,
+                    key=job.key + (index,),
+                    url=url,
+                    index=False,
+                    refresh=self.config.recrawl.refresh(index, len(result)),
+                ),
+            )
+
+    def scrape(self, repos: Iterable[Repo]) -> list[Found]:
+        """Scrape `repos` and return every file found.
+
+        The files are ordered by repo, then by URL within the repo, then by
+        sub-page, exactly as a sequential scrape would have returned them.
+        """
+        started = time.monotonic()
+        repos = list(repos)
+        page.set_politeness(
+            self._resolve(self.config.politeness),
+            self._politeness(list(self.config.repos or []) + repos),
+        )
+        page.reset_stats()
+        self.incomplete = set()
+        self._changed = set()
+        self._results = {}
+        for job in self._jobs(repos):
+            self._queue(job)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.config.concurrency.workers,
+            thread_name_prefix='scraper',
+        ) as executor:
+            running = self._dispatch(executor)
+            while running:
+                done, _ = concurrent.futures.wait(
+                    running,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        # Scrapers can come from plugins so one that breaks
+                        # only loses its own repo.
+                        self._fail(job.repo, job.url)
+                        result = []
+                    self._finish(job, result)
+                running.update(self._dispatch(executor))
+        self.unchanged = {
+            repo.name for repo in repos if repo.name not in self._changed
+        } - self.incomplete
+        stats = page.stats()
+        parsed = stats['fetched'] + stats['unchanged']
+        if parsed:
+            CACHE_HIT_RATIO.set(stats['unchanged'] / parsed)
+        log.info(
+            'Scraped in %.1fs: %s pages fetched, %s unchanged, %s skipped, '
+            '%s failed, %s throttled',
+            time.monotonic() - started,
+            stats['fetched'],
+            stats['unchanged'],
+            stats['skipped'],
+            stats['failed'],
+            stats['throttled'],
+        )
+        return [
+            found
+            for key in sorted(self._results)
+            for found in self._results[key]
+        ]
+
+
+def scrape(config: Config, repos: Iterable[Repo]) -> list[Found]:
+    """Scrape `repos` concurrently. See `Engine.scrape`."""
+    return Engine(config).scrape(repos)
@@ -0,0 +1,87 @@
+"""Streaming link extraction from HTML pages.
+
+The pages are fed to lxml's HTML parser in chunks with a parser target that
+only keeps track of the anchors it has seen so no document tree is ever
+built.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from lxml import etree
+
+
+@dataclass
+class Link:
+    """An anchor in a page.
+
+    Attributes:
+        href: The value of the ``href`` attribute.
+        text: The text content of the anchor.
+        row_head: `True` if this is the first anchor in the first cell of a
+            table row (where directory listings keep the file links).
+    """
+
+    href: str
+    text: str
+    row_head: bool
+
+
+class _Target:
+    """An lxml parser target that collects anchors."""
+
+    def __init__(self):
+        self.links = []
+        self._cells = None
+        self._row_linked = False
+        self._href = None
+        self._row_head = False
+        self._text = []
+
+    def start(self, tag: str, attrib: dict):
+        if tag == 'tr':
+            self._cells = 0
+            self._row_linked = False
+        elif tag == 'td' and self._cells is not None:
+            self._cells += 1
+        elif tag == 'a':
+            self._href = attrib.get('href')
+            self._text = []
+            self._row_head = self._cells == 1 and not self._row_linked
+            if self._cells == 1:
+                self._row_linked = True
+
+    def end(self, tag: str):
+        if tag == 'a' and self._href is not None:
+            self.links.append(
+                Link(self._href, ''.join(self._text), self._row_head),
+            )
+            self._href = None
+        elif tag == 'tr':
+            self._cells = None
+
+    def data(self, data: str):
+        if self._href is not None:
+            self._text.append(data)
+
+    def close(self):
+        pass
+
+    def pop(self) -> list[Link]:
+        """Remove and return the links collected so far."""
+        links, self.links = self.links, []
+        return links
+
+
+def iter_links(chunks: Iterable[bytes]) -> Iterator[Link]:
+    """Yield the anchors with an ``href`` in the HTML in `chunks`.
+
+    Anchors are yielded as soon as the chunk that closes them is parsed.
+    """
+    target = _Target()
+    parser = etree.HTMLParser(target=target, encoding='utf-8')
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from target.pop()
+    parser.close()
+    yield from target.pop()
@@ -0,0 +1,198 @@
+"""Scraper of machine readable mirror manifests.
+
+Some mirrors list their files in a checksum file (``SHA256SUMS`` and the
+like, as written by ``sha256sum`` or ``sha256sum --tag``) or in JSON release
+metadata (like Fedora's ``releases.json``). Reading those is much cheaper
+and less brittle than scraping HTML listings, and the checksums and sizes
+they have go into the feed entries.
+"""
+
+import itertools
+import json
+import os
+import re
+import urllib.parse
+from typing import Iterable, Iterator
+
+from .. import log
+from ..config import Config
+from .base import Scraper
+
+# Algorithms by the length of their hex digests.
+_ALGORITHMS = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}
+# ``<digest>  <name>`` or ``<digest> *<name>`` as written by ``sha256sum``.
+_GNU_LINE = re.compile(r'^([0-9a-fA-F]+) [ *](.+)$')
+# ``SHA256 (<name>) = <digest>`` as written by ``sha256sum --tag``.
+_BSD_LINE = re.compile(r'^([\w-]+) \((.+)\) = ([0-9a-fA-F]+)$')
+# The keys JSON manifests keep the list of files under.
+_JSON_LISTS = ('files', 'releases', 'images', 'items')
+
+
+# ``(filename, url, checksum, size)`` of a listed file.
+File = tuple[str, str, str, int]
+
+
+def _checksum(digest: str, algorithm: str = None) -> str:
+    """Format a checksum as ``<algorithm>:<hex digest>``."""
+    algorithm = algorithm or _ALGORITHMS.get(len(digest))
+    if algorithm is None:
+        return None
+    return f'{algorithm.lower().replace("-", "")}:{digest.lower()}'
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Split the content of a page into lines as it's downloaded."""
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield line.decode('utf-8', 'replace').rstrip('\r')
+    if rest:
+        yield rest.decode('utf-8', 'replace').rstrip('\r')
+
+
+def parse_sums(url: str, lines: Iterable[str]) -> Iterator[File]:
+    """Parse the lines of a checksum file at `url`."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if match := _GNU_LINE.match(line):
+            digest, name = match.groups()
+            checksum = _checksum(digest)
+        elif match := _BSD_LINE.match(line):
+            algorithm, name, digest = match.groups()
+            checksum = _checksum(digest, algorithm)
+        else:
+            log.debug('Ignoring a line of %s: %s', url, line)
+            continue
+        name = name.removeprefix('./')
+        yield (
+            os.path.basename(name),
+            urllib.parse.urljoin(url, name),
+            checksum,
+            None,
+        )
+
+
+def _json_files(data) -> list:
+    if isinstance(data, dict):
+        for key in _JSON_LISTS:
+            if isinstance(data.get(key), list):
+                return data[key]
+        return []
+    return data if isinstance(data, list) else []
+
+
+def _json_checksum(entry: dict) -> str:
+    for algorithm in ('sha512', 'sha256', 'sha1', 'md5'):
+        if entry.get(algorithm):
+            return _checksum(str(entry[algorithm]), algorithm)
+    checksum = entry.get('checksum')
+    if not checksum:
+        return None
+    algorithm, _, digest = str(checksum).rpartition(':')
+    return _checksum(digest, algorithm or None)
+
+
+def parse_json(url: str, data) -> Iterator[File]:
+    """Parse a JSON manifest at `url`.
+
+    The manifest is a list of objects, or an object with such a list under
+    one of ``files``, ``releases``, ``images`` or ``items``. Every object
+    has the URL of the file (relative to `url`) under ``link``, ``url`` or
+    ``path``, and optionally its ``name``, its ``size`` in bytes, and its
+    checksum under the name of the algorithm (eg ``sha256``) or under
+    ``checksum`` as ``<algorithm>:<hex digest>``.
+    """
+    for entry in _json_files(data):
+        if not isinstance(entry, dict):
+            continue
+        link = entry.get('link') or entry.get('url') or entry.get('path')
+        if not link:
+            continue
+        link = urllib.parse.urljoin(url, str(link))
+        name = entry.get('name') or os.path.basename(
+            urllib.parse.urlsplit(link).path,
+        )
+        size = entry.get('size')
+        try:
+            size = None if size is None else int(size)
+        except (TypeError, ValueError):
+            size = None
+        yield str(name), link, _json_checksum(entry), size
+
+
+class Manifest(Scraper):
+    """Scraper of checksum files and JSON manifests.
+
+    The format is told from the content so the repo URL can point at
+    either. Every listed file with `config.Config.file_extension` becomes
+    an entry. With the ``companions`` option the other listed files are
+    taken to have a file with the extension next to them unless that's
+    listed too (like the images in Debian's ``bt-cd`` directories, whose
+    ``SHA256SUMS`` only lists the images and not their torrents). The
+    checksum and size of the listed file aren't those of its companion so
+    the entries for companions don't get any.
+    """
+
+    def parse(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> Iterator[File]:
+        """Find the files listed in the manifest at `url`."""
+        chunks = iter(chunks)
+        start = b''
+        for chunk in chunks:
+            start += chunk
+            if start.strip():
+                break
+        chunks = itertools.chain([start], chunks)
+        if start.lstrip()[:1] in (b'{', b'['):
+            try:
+                data = json.loads(b''.join(chunks))
+            except ValueError as err:
+                log.error('Invalid JSON manifest %s: %s', url, err)
+                return
+            files = parse_json(url, data)
+        else:
+            files = parse_sums(url, iter_lines(chunks))
+        yield from _entries(
+            config.file_extension,
+            files,
+            self.options.get('companions', False),
+        )
+
+    def check_options(self, options: dict) -> dict:
+        """Check the options of a manifest repo.
+
+        The only one is ``companions``, ``true`` or ``false``.
+        """
+        companions = options.pop('companions', False)
+        if options:
+            raise ValueError(f'Unknown options: {", ".join(options)}')
+        if not isinstance(companions, bool):
+            raise ValueError(f'`companions` is not true or false: {companions}')
+        return {'companions': companions}
+
+
+def _entries(
+    extension: str,
+    files: Iterable[File],
+    companions: bool = False,
+) -> Iterator[File]:
+    """Get the files with `extension`, or next to the others `companions`."""
+    listed = set()
+    others = []
+    for file in files:
+        if file[0].endswith(extension):
+            listed.add(file[1])
+            yield file
+        elif companions:
+            others.append(file)
+    for name, url, *_ in others:
+        if url + extension not in listed:
+            yield name + extension, url + extension, None, None
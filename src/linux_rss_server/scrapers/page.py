@@ -1,34 +1,565 @@
-"""Debian installer RSS feed generator."""
+"""Fetching and caching the pages the scrapers parse.
 
+Every request goes through one pooled keep-alive session and is spaced out
+and capped per host. New pages are streamed into the scraper's parser as
+they are downloaded, and their validators, digest and parse results are
+cached so an unchanged page can be replayed without being parsed again.
+"""
+
+import collections
+import email.utils
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import threading
 import time
+import urllib.parse
+from typing import Callable, Iterable, Iterator
 
 import requests
+import requests.adapters
+
+from .. import log, metrics
+from ..config import DEFAULT_PER_HOST, Http, Politeness
+
+_CHUNK_SIZE = 64 * 1024
+# Bodies spooled to check their digest stay in memory up to this size.
+_SPOOL_SIZE = 1024 * 1024
+# Statuses a server sends when it wants to be left alone for a while.
+_THROTTLED = (
+    requests.codes.too_many_requests,
+    requests.codes.service_unavailable,
+)
+FETCH_SECONDS = metrics.histogram(
+    'linux_rss_page_fetch_seconds',
+    'Time to get the response headers of a page.',
+    ['url'],
+)
+PARSE_SECONDS = metrics.histogram(
+    'linux_rss_page_parse_seconds',
+    'Time to parse a page.',
+    ['scraper'],
+)
+PAGES = metrics.counter(
+    'linux_rss_pages_total',
+    'Pages scraped by result (fetched, unchanged, skipped, failed or '
+    'throttled).',
+    ['result'],
+)
+_lock = threading.Lock()
+_http = Http()
+_session = None
+
+
+class _Cache:
+    """HTTP validators and parse results of previously fetched pages.
+
+    The cache is bounded by evicting the least recently used pages so pages
+    of repos and arches that are no longer configured eventually fall out.
+    """
+
+    def __init__(self):
+        self.path = None
+        self.max_entries = Http().page_cache_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, path: pathlib.Path):
+        """Load the cache from `path` if it exists."""
+        with self._lock:
+            self.path = path
+            self._entries = {}
+            if not path.exists():
+                return
+            try:
+                self._entries = json.loads(path.read_text())
+            except ValueError as err:
+                log.warning('Ignoring corrupt page cache %s: %s', path, err)
+
+    def save(self):
+        """Save the cache to disk if it has a path."""
+        if self.path is None:
+            return
+        with self._lock:
+            data = json.dumps(self._entries)
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+        tmp.write_text(data)
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> dict:
+        """Get the cache entry for `key` and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def put(self, key: str, entry: dict):
+        """Set the cache entry for `key` evicting old entries if needed."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+
+    def __len__(self) -> int:
+        """Get the number of cached pages."""
+        with self._lock:
+            return len(self._entries)
+
+
+class _Host:
+    """The request limits and state of one host.
+
+    Requests are spaced out with a token bucket that holds up to
+    `Politeness.burst` tokens and refills at `Politeness.rate` tokens per
+    second. Every request takes a token or, if there are none left, reserves
+    the next one and waits for it. A host that asked to be left alone with
+    ``Retry-After`` gets no requests at all until then.
+
+    Attributes:
+        name: The host name (``host[:port]``).
+        politeness: The limits of the host.
+        slots: Held by each request to cap the concurrent requests.
+    """
+
+    def __init__(self, name: str, politeness: Politeness):
+        self.name = name
+        self.politeness = politeness
+        self.slots = threading.BoundedSemaphore(
+            politeness.per_host or DEFAULT_PER_HOST,
+        )
+        self._lock = threading.Lock()
+        self._tokens = politeness.burst
+        self._stamp = time.monotonic()
+        self._blocked_until = 0
+
+    def wait(self):
+        """Wait for the host's turn to get another request."""
+        rate = self.politeness.rate
+        with self._lock:
+            now = time.monotonic()
+            delay = self._blocked_until - now
+            if rate:
+                self._tokens = min(
+                    self.politeness.burst,
+                    self._tokens + (now - self._stamp) * rate,
+                )
+                self._stamp = now
+                self._tokens -= 1
+                delay = max(delay, -self._tokens / rate)
+        if delay > 0:
+            log.debug('Waiting %.2fs for %s', delay, self.name)
+            time.sleep(delay)
+
+    def block(self, delay: float):
+        """Send the host no requests for the next `delay` seconds."""
+        with self._lock:
+            self._blocked_until = max(
+                self._blocked_until,
+                time.monotonic() + delay,
+            )
+
+
+_cache = _Cache()
+_stats = collections.Counter()
+_failed = set()
+_unchanged = set()
+_politeness = Politeness()
+_limits = {}
+_hosts = {}
+
+
+def configure(http: Http):
+    """Set the HTTP client settings shared by all the scrapers.
+
+    The connection pools are only rebuilt if the settings changed.
+    """
+    global _http, _session
+    _cache.max_entries = http.page_cache_size
+    with _lock:
+        if http == _http and _session is not None:
+            return
+        old_session = _session
+        _http = http
+        _session = None
+    if old_session is not None:
+        old_session.close()
+
+
+def set_politeness(default: Politeness, hosts: dict = None):
+    """Set the request limits of every host.
+
+    Hosts whose limits didn't change keep their state so pending waits and
+    ``Retry-After`` blocks carry over.
+
+    Arguments:
+        default: The limits of hosts that aren't in `hosts`.
+        hosts: A mapping of host names (``host[:port]``) to their limits.
+    """
+    global _politeness, _limits
+    with _lock:
+        _politeness = default
+        _limits = dict(hosts or {})
+        for name, host in list(_hosts.items()):
+            if host.politeness != _limits.get(name, default):
+                del _hosts[name]
+
+
+def politeness(url: str) -> Politeness:
+    """Get the request limits of the host of `url`."""
+    return _host(url).politeness
+
+
+def _host(url: str) -> _Host:
+    name = urllib.parse.urlsplit(url).netloc
+    with _lock:
+        host = _hosts.get(name)
+        if host is None:
+            politeness = _limits.get(name, _politeness)
+            host = _hosts[name] = _Host(name, politeness)
+        return host
+
+
+def session() -> requests.Session:
+    """Get the shared, keep-alive HTTP session."""
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=_http.pool_connections,
+                pool_maxsize=_http.pool_maxsize,
+            )
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+        return _session
+
+
+def load_cache(path: pathlib.Path):
+    """Load the page cache from `path`.
+
+    The cache holds the ``ETag`` and ``Last-Modified`` validators of every
+    page parsed with `parse` along with the parse results.
+    """
+    _cache.load(path)
+
+
+def save_cache():
+    """Save the page cache to the path it was loaded from."""
+    _cache.save()
+
 
-from .. import log
+def stats() -> collections.Counter:
+    """Get the page counts since the last call to `reset_stats`.
 
+    Counts:
+        fetched: The number of pages that were downloaded and parsed.
+        unchanged: The number of pages the server reported as unchanged.
+        skipped: The number of pages taken from the cache without a request
+            (see `parse`).
+        failed: The number of pages that couldn't be fetched.
+        throttled: The number of requests answered with 429 or 503.
+    """
+    with _lock:
+        return _stats.copy()
 
-def _get(url: str) -> requests.Response:
+
+def failed(url: str) -> bool:
+    """Check if `url` couldn't be parsed since the last `reset_stats`."""
+    with _lock:
+        return url in _failed
+
+
+def unchanged(url: str) -> bool:
+    """Check if `url` was the same as last time since the last `reset_stats`.
+
+    A page is the same if the server said so, if its content has the same
+    digest, or if it wasn't fetched at all (see `parse`).
+    """
+    with _lock:
+        return url in _unchanged
+
+
+def reset_stats():
+    """Reset the page counts and failures."""
+    with _lock:
+        _stats.clear()
+        _failed.clear()
+        _unchanged.clear()
+
+
+def _fail(url: str):
+    PAGES.inc(result='failed')
+    with _lock:
+        _stats['failed'] += 1
+        _failed.add(url)
+
+
+def _count(name: str, url: str = None):
+    PAGES.inc(result=name)
+    with _lock:
+        _stats[name] += 1
+        if name in ('unchanged', 'skipped'):
+            _unchanged.add(url)
+
+
+def _retry_after(page: requests.Response) -> float:
+    """Get the delay a throttled server asked for in seconds or `None`."""
+    value = page.headers.get('Retry-After')
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        log.debug('Ignoring bad Retry-After from %s: %s', page.url, value)
+        return None
+    return max(0, when.timestamp() - time.time())
+
+
+def _get(
+    url: str,
+    headers: dict = None,
+    stream: bool = False,
+) -> tuple[requests.Response, float]:
+    """Get `url` once.
+
+    Returns:
+        The response, or `None` if there isn't a usable one, and the delay
+        the server asked for before trying again or `None`.
+    """
     log.debug('Getting %s', url)
     try:
-        page = requests.get(url)
+        with FETCH_SECONDS.time(url=url):
+            page = session().get(
+                url,
+                headers=headers,
+                stream=stream,
+                timeout=_http.timeout,
+            )
     except requests.exceptions.ConnectionError as err:
         # Warning since it's not fatal to the workflow unless it happens again.
         log.warning('Error Connectiong to the server "%s": %s', url, err)
-        return None
+        return None, None
+    except requests.exceptions.Timeout as err:
+        log.warning('Timed out getting "%s": %s', url, err)
+        return None, None
+    if page.status_code in _THROTTLED:
+        _count('throttled')
+        retry_after = _retry_after(page)
+        log.warning(
+            'Throttled by the server for "%s": %s (Retry-After: %s)',
+            url,
+            page.reason,
+            retry_after,
+        )
+        page.close()
+        return None, retry_after
     if not page or not page.ok:
         log.error('Could not get "%s" for this reason: %s', url, page.reason)
-        return None
+        page.close()
+        return None, None
     log.debug('Got: %s %s', url, page.reason)
-    return page
+    return page, None
+
+
+def _fetch(
+    url,
+    headers: dict = None,
+    attempts: int = 2,
+    stream: bool = False,
+) -> requests.Response:
+    """Get `url` retrying failures with exponential backoff.
+
+    The caller has to hold one of the host's `_Host.slots`.
+    """
+    host = _host(url)
+    politeness = host.politeness
+    delay = politeness.backoff
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(delay)
+            delay = min(delay * 2, politeness.max_delay)
+        host.wait()
+        page, retry_after = _get(url, headers, stream)
+        if page:
+            return page
+        if retry_after is not None:
+            # Every request to the host waits, not just the retry.
+            retry_after = min(retry_after, politeness.max_delay)
+            host.block(retry_after)
+            delay = max(delay, retry_after)
+    # Too many errors, skip to the next url
+    log.error('Failed to get "%s" after %s attempts.', url, attempts)
+    return None
 
 
 def get(url, attempts: int = 2) -> str:
     """Attempt to fetch a webpage."""
-    tries = 0
-    while tries < attempts and not (page := _get(url)):
-        tries += 1
-        time.sleep(1)
-    if not page:  # Too many errors, skip to the next url
-        log.error('Failed to connect to the server for "%s" twice.', url)
-        return ''
-    return page.content
+    with _host(url).slots:
+        page = _fetch(url, attempts=attempts)
+        if page is None:
+            return ''
+        return page.content
+
+
+class _Body:
+    """The body of a response read in chunks as it's iterated over.
+
+    Every chunk goes into the digest as it's handed on, so the body is only
+    ever held one chunk at a time. A body that's `spool`ed is read whole
+    into a temporary file first and iterated from there.
+
+    Attributes:
+        digest: The SHA-256 of the chunks read so far.
+        waited: The number of seconds spent waiting for chunks.
+    """
+
+    def __init__(self, page: requests.Response):
+        self.digest = hashlib.sha256()
+        self.waited = 0
+        self._chunks = page.iter_content(_CHUNK_SIZE)
+        self._spool = None
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._spool is not None:
+            self._spool.seek(0)
+            while chunk := self._spool.read(_CHUNK_SIZE):
+                yield chunk
+            return
+        while True:
+            started = time.monotonic()
+            chunk = next(self._chunks, None)
+            self.waited += time.monotonic() - started
+            if chunk is None:
+                return
+            self.digest.update(chunk)
+            yield chunk
+
+    def spool(self):
+        """Read the whole body (for the digest) before it's parsed."""
+        spool = tempfile.SpooledTemporaryFile(_SPOOL_SIZE)
+        for chunk in self:
+            spool.write(chunk)
+        self._spool = spool
+
+    def drain(self):
+        """Read the rest of the body (for the digest)."""
+        if self._spool is None:
+            for _ in self:
+                pass
+
+    def close(self):
+        """Drop the spooled body."""
+        if self._spool is not None:
+            self._spool.close()
+
+
+def parse(
+    url: str,
+    parser: Callable[[Iterable[bytes]], Iterable],
+    variant: str = '',
+    attempts: int = 2,
+    refresh: bool = True,
+    scraper: str = None,
+) -> list:
+    """Fetch the page at `url` and return the results of `parser`.
+
+    The request is made conditional on the validators the server sent the
+    last time the page was parsed. If the server reports the page is
+    unchanged, or the content is byte for byte the same as last time, the
+    results of the last parse are returned without parsing anything (see
+    `unchanged`). To tell, a page that was parsed before is downloaded
+    before it's parsed. Other pages are fed to `parser` as they're
+    downloaded. Without `refresh` the results of the last parse are
+    returned without even asking the server.
+
+    Arguments:
+        url: The URL of the page.
+        parser: A callable that takes the content of the page as an iterable
+            of chunks of bytes and returns an iterable of JSON serializable
+            results.
+        variant: Anything else the results depend on (eg the file
+            extension). A cached result for a different variant is ignored.
+        attempts: The number of times to try fetching the page.
+        refresh: Set to `False` to skip the request if the page was parsed
+            before, for pages that are known not to change.
+        scraper: The name of the scraper the parse time is reported under.
+            Defaults to the name of the module `parser` is from.
+
+    Returns:
+        A list of the results of `parser` or an empty list if the page
+        couldn't be fetched (see `failed`).
+    """
+    cached = _cache.get(url)
+    if cached and cached.get('variant') != variant:
+        cached = None
+    if cached and not refresh:
+        log.debug('Skipping harvested page: %s', url)
+        _count('skipped', url)
+        return [_restore(result) for result in cached['results']]
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    with _host(url).slots:
+        page = _fetch(url, headers, attempts, stream=True)
+        if page is None:
+            _fail(url)
+            return []
+        if page.status_code == requests.codes.not_modified and cached:
+            page.close()
+            log.debug('Unchanged: %s', url)
+            _count('unchanged', url)
+            return [_restore(result) for result in cached['results']]
+        body = _Body(page)
+        results = None
+        try:
+            if cached and cached.get('digest'):
+                body.spool()
+                if body.digest.hexdigest() == cached['digest']:
+                    results = [_restore(result) for result in cached['results']]
+            if results is None:
+                waited = body.waited
+                started = time.monotonic()
+                results = list(parser(body))
+                body.drain()
+                parsed = time.monotonic() - started - (body.waited - waited)
+        except requests.exceptions.RequestException as err:
+            log.warning('Error reading "%s": %s', url, err)
+            _fail(url)
+            return []
+        finally:
+            body.close()
+            page.close()
+    digest = body.digest.hexdigest()
+    if cached and cached.get('digest') == digest:
+        log.debug('Unchanged content: %s', url)
+        _count('unchanged', url)
+    else:
+        if scraper is None:
+            scraper = getattr(parser, '__module__', None) or 'unknown'
+            scraper = scraper.rpartition('.')[2]
+        PARSE_SECONDS.observe(parsed, scraper=scraper)
+        _count('fetched')
+    _cache.put(
+        url,
+        {
+            'digest': digest,
+            'etag': page.headers.get('ETag'),
+            'last_modified': page.headers.get('Last-Modified'),
+            'results': results,
+            'variant': variant,
+        },
+    )
+    return results
+
+
+def _restore(result):
+    # JSON turns tuples into lists
+    return tuple(result) if isinstance(result, list) else result
@@ -2,38 +2,52 @@
 """Debian installer RSS feed generator."""
 
 import re
-from typing import Generator
-
-import bs4
+from typing import Generator, Iterable
 
 from ..config import Config
-from . import page
-
-
-def _by_version(
-    config: Config,
-    source: str,
-    path: str,
-) -> Generator[tuple[str, str], None, None]:
-    """Scrape an individual Ubuntu version's page."""
-    page_url = f'{source}/{path}'
-    content = page.get(page_url)
-    if not content:
-        return
-    soup = bs4.BeautifulSoup(content, features='lxml')
-    for a in soup.findAll('a'):
-        if a.attrs.get('href', '').endswith(config.file_extension):
-            yield a.attrs['href'], f'{page_url}/{a.attrs["href"]}'
-
-
-def scrape(config: Config, url: str):
-    """Scrape the Ubuntu image repository for files."""
-    content = page.get(url)
-    if not content:
-        return
-    soup = bs4.BeautifulSoup(content, features='lxml')
-    for a in soup.findAll('a'):
-        href = a.attrs.get('href')
-        matches_extension = re.match(r'\d+\.\d+(\.\d+)?/', a.text)
-        if href == a.text and matches_extension:
-            yield from _by_version(config, url, a.attrs['href'])
+from . import links
+from .base import Scraper
+
+
+def _version(page_url: str) -> tuple[int, ...]:
+    version = page_url.rstrip('/').rpartition('/')[2]
+    return tuple(int(part) for part in version.split('.'))
+
+
+class Ubuntu(Scraper):
+    """Scraper of Ubuntu style release trees.
+
+    The root of the repo lists a directory for every version and the files
+    are the links in those directories.
+    """
+
+    subpages = True
+
+    def parse_subpages(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> list[str]:
+        """Find the URLs of the Ubuntu version pages in the repository.
+
+        Returns:
+            The URLs ordered by version, oldest first.
+        """
+        versions = []
+        for link in links.iter_links(chunks):
+            matches_extension = re.match(r'\d+\.\d+(\.\d+)?/', link.text)
+            if link.href == link.text and matches_extension:
+                versions.append(f'{url}/{link.href}')
+        return sorted(versions, key=_version)
+
+    def parse(
+        self,
+        config: Config,
+        url: str,
+        chunks: Iterable[bytes],
+    ) -> Generator[tuple[str, str], None, None]:
+        """Scrape an individual Ubuntu version's page."""
+        for link in links.iter_links(chunks):
+            if link.href.endswith(config.file_extension):
+                yield link.href, f'{url}/{link.href}'
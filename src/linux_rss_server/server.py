@@ -0,0 +1,532 @@
+"""Serve the published RSS feed over HTTP."""
+
+import datetime
+import email.utils
+import http
+import os
+import selectors
+import socket
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn, _ServerSelector
+from typing import BinaryIO
+
+from . import log, metrics
+from .config import DEFAULT_DRAIN_TIMEOUT
+from .index import entity_tag
+from .publisher import IDENTITY, Publication, Publisher, Variant
+
+CONTENT_TYPE = 'application/rss+xml'
+FEEDS_PATH = '/feeds/'
+METRICS_PATH = '/metrics'
+REQUESTS = metrics.counter(
+    'linux_rss_http_requests_total',
+    'HTTP requests answered by status.',
+    ['status'],
+)
+REQUEST_SECONDS = metrics.histogram(
+    'linux_rss_http_request_seconds',
+    'Time to make the response to an HTTP request by status.',
+    ['status'],
+)
+RESPONSE_BYTES = metrics.counter(
+    'linux_rss_http_response_bytes_total',
+    'Bytes of response bodies served.',
+)
+
+
+@dataclass
+class Response:
+    """An HTTP response independent of the server sending it.
+
+    Attributes:
+        status: The status code.
+        headers: The response headers.
+        body: The body if it's in memory.
+        file: The open file to send `length` bytes of the body from starting
+            at `offset` if it isn't in memory.
+        offset: The offset in `file` of the body.
+        length: The length of the body in `file`.
+    """
+
+    status: http.HTTPStatus
+    headers: list[tuple[str, str]] = field(default_factory=list)
+    body: bytes = b''
+    file: BinaryIO = None
+    offset: int = 0
+    length: int = 0
+
+
+def _etags(header: str) -> list[str]:
+    return [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def _not_modified(etags: set[str], modified: float, headers) -> bool:
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return '*' in tags or not etags.isdisjoint(tags)
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return int(modified) <= since.timestamp()
+
+
+def _range(header: str, size: int) -> tuple[int, int]:
+    """Get the (start, stop) of the bytes a ``Range`` header asks for.
+
+    Returns:
+        `None` if the header should be ignored because it's malformed or asks
+        for more than one range, and an empty range if it can't be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    first, dash, last = spec.strip().partition('-')
+    if unit.strip().lower() != 'bytes' or ',' in spec or not dash:
+        return None
+    try:
+        if not first:
+            start, stop = size - int(last), size
+            if start > size:
+                return None
+            # A suffix of no bytes can't be satisfied.
+            return (max(start, 0), stop) if start < size else (size, size)
+        start = int(first)
+        stop = int(last) + 1 if last else None
+    except ValueError:
+        return None
+    if start < 0 or (stop is not None and stop <= start):
+        return None
+    if start >= size:
+        return size, size
+    return start, size if stop is None else min(stop, size)
+
+
+def _if_range(headers, variant: Variant, last_modified: str) -> bool:
+    """Check if the ``Range`` header applies to `variant`."""
+    if_range = headers.get('If-Range')
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == variant.etag
+    return if_range == last_modified
+
+
+def _since(value: str) -> float:
+    """Parse a UNIX timestamp or an ISO 8601 date (UTC unless given)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    since = datetime.datetime.fromisoformat(value)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return since.timestamp()
+
+
+def _filters(query: str) -> dict:
+    """Get the `index.Index.select` arguments from a query string.
+
+    Raises:
+        ValueError: If a filter has an invalid value.
+    """
+    filters = {}
+    for name, value in urllib.parse.parse_qsl(query):
+        if name == 'since':
+            filters['since'] = _since(value)
+        elif name == 'limit':
+            filters['limit'] = int(value)
+            if filters['limit'] < 0:
+                raise ValueError(f'Invalid limit: {value}')
+        elif name == 'match':
+            filters['match'] = value
+    return filters
+
+
+def _respond_selection(
+    publication: Publication,
+    method: str,
+    headers,
+    selector: list[str],
+    query: str,
+) -> Response:
+    """Make the response to a request for the items of a repo (and arch)."""
+    index = publication.index
+    if index is None:
+        return Response(
+            http.HTTPStatus.SERVICE_UNAVAILABLE,
+            [('Retry-After', '60'), ('Content-Length', '0')],
+        )
+    try:
+        filters = _filters(query)
+    except ValueError:
+        return Response(
+            http.HTTPStatus.BAD_REQUEST,
+            [('Content-Length', '0')],
+        )
+    entries = index.select(*selector, **filters)
+    if entries is None:
+        return Response(http.HTTPStatus.NOT_FOUND, [('Content-Length', '0')])
+    size = publication.variants[IDENTITY].size
+    body = b''.join(
+        [
+            publication.read(0, index.head),
+            *(publication.read(entry.start, entry.stop) for entry in entries),
+            publication.read(index.tail, size),
+        ],
+    )
+    etag = entity_tag(body)
+    cache_headers = [
+        ('ETag', etag),
+        (
+            'Last-Modified',
+            email.utils.formatdate(publication.modified, usegmt=True),
+        ),
+        ('Cache-Control', 'no-cache'),
+    ]
+    if _not_modified({etag}, publication.modified, headers):
+        return Response(http.HTTPStatus.NOT_MODIFIED, cache_headers)
+    return Response(
+        http.HTTPStatus.OK,
+        [
+            ('Content-Type', CONTENT_TYPE),
+            ('Content-Length', str(len(body))),
+            *cache_headers,
+        ],
+        body if method == 'GET' else b'',
+    )
+
+
+def _respond_metrics(method: str) -> Response:
+    body = metrics.REGISTRY.render()
+    return Response(
+        http.HTTPStatus.OK,
+        [
+            ('Content-Type', metrics.CONTENT_TYPE),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', 'no-store'),
+        ],
+        body if method == 'GET' else b'',
+    )
+
+
+def respond(
+    publisher: Publisher,
+    method: str,
+    headers,
+    path: str = '/',
+) -> Response:
+    """Make the response to a request for the feed.
+
+    ``/feeds/<repo>`` and ``/feeds/<repo>/<arch>`` get just the items of
+    that repo (and arch), filtered by the ``since``, ``limit`` and ``match``
+    query parameters (see `index.Index.select`). ``/metrics`` gets the
+    `metrics` of the application. Any other path gets the whole feed.
+
+    Arguments:
+        publisher: The publisher of the feed.
+        method: The request method.
+        headers: The request headers (any case insensitive mapping).
+        path: The request target.
+    """
+    started = time.perf_counter()
+    response = _respond(publisher, method, headers, path)
+    status = int(response.status)
+    REQUESTS.inc(status=status)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, status=status)
+    RESPONSE_BYTES.inc(len(response.body) + response.length)
+    return response
+
+
+def _respond(
+    publisher: Publisher,
+    method: str,
+    headers,
+    path: str,
+) -> Response:
+    if method not in ('GET', 'HEAD'):
+        return Response(
+            http.HTTPStatus.METHOD_NOT_ALLOWED,
+            [('Allow', 'GET, HEAD'), ('Content-Length', '0')],
+        )
+    target = urllib.parse.urlsplit(path)
+    if target.path == METRICS_PATH:
+        return _respond_metrics(method)
+    publication = publisher.current
+    if publication is None:
+        return Response(
+            http.HTTPStatus.SERVICE_UNAVAILABLE,
+            [('Retry-After', '60'), ('Content-Length', '0')],
+        )
+    if target.path.startswith(FEEDS_PATH):
+        selector = [
+            urllib.parse.unquote(part)
+            for part in target.path[len(FEEDS_PATH) :].strip('/').split('/')
+        ]
+        if len(selector) > 2 or not all(selector):
+            return Response(
+                http.HTTPStatus.NOT_FOUND,
+                [('Content-Length', '0')],
+            )
+        return _respond_selection(
+            publication,
+            method,
+            headers,
+            selector,
+            target.query,
+        )
+    variant = publication.negotiate(headers.get('Accept-Encoding'))
+    last_modified = email.utils.formatdate(publication.modified, usegmt=True)
+    cache_headers = [
+        ('ETag', variant.etag),
+        ('Last-Modified', last_modified),
+        ('Cache-Control', 'no-cache'),
+        ('Vary', 'Accept-Encoding'),
+    ]
+    if _not_modified(publication.etags, publication.modified, headers):
+        return Response(http.HTTPStatus.NOT_MODIFIED, cache_headers)
+    size = variant.size
+    start, stop = 0, size
+    status = http.HTTPStatus.OK
+    range_headers = [('Accept-Ranges', 'bytes')]
+    if 'Range' in headers and _if_range(headers, variant, last_modified):
+        byte_range = _range(headers['Range'], size)
+        if byte_range is not None:
+            start, stop = byte_range
+            if start == stop:
+                return Response(
+                    http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    [
+                        ('Content-Range', f'bytes */{size}'),
+                        ('Content-Length', '0'),
+                        *cache_headers,
+                    ],
+                )
+            status = http.HTTPStatus.PARTIAL_CONTENT
+            range_headers.append(
+                ('Content-Range', f'bytes {start}-{stop - 1}/{size}'),
+            )
+    content_headers = [
+        ('Content-Type', CONTENT_TYPE),
+        ('Content-Length', str(stop - start)),
+    ]
+    if variant.encoding != IDENTITY:
+        content_headers.append(('Content-Encoding', variant.encoding))
+    response = Response(
+        status,
+        [*content_headers, *range_headers, *cache_headers],
+    )
+    if method != 'GET':
+        return response
+    if variant.file is not None:
+        response.file = variant.file
+        response.offset = start
+        response.length = stop - start
+    elif (start, stop) == (0, size):
+        response.body = variant.body
+    else:
+        response.body = variant.body[start:stop]
+    return response
+
+
+def request_handler_factory(publisher: Publisher) -> BaseHTTPRequestHandler:
+    """Make a request handler class serving the feed from `publisher`."""
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        _publisher = publisher
+
+        def _respond(self):
+            response = respond(
+                self._publisher,
+                self.command,
+                self.headers,
+                self.path,
+            )
+            self.send_response(response.status)
+            for name, value in response.headers:
+                self.send_header(name, value)
+            self.end_headers()
+            if response.file is not None:
+                self.wfile.flush()
+                self.connection.sendfile(
+                    response.file,
+                    response.offset,
+                    response.length,
+                )
+            elif response.body:
+                self.wfile.write(response.body)
+            self.wfile.flush()
+
+        def do_GET(self):
+            self._respond()
+
+        def do_HEAD(self):
+            self._respond()
+
+    return RequestHandler
+
+
+class StopEvent(threading.Event):
+    """A `threading.Event` that can wake up a selector.
+
+    The event has a `fileno` that becomes readable once it's set so it can be
+    registered with a selector next to the sockets being waited on.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._read, self._write = os.pipe()
+        os.set_blocking(self._read, False)
+        os.set_blocking(self._write, False)
+
+    def fileno(self) -> int:
+        """Get the file descriptor that is readable while the event is set."""
+        return self._read
+
+    def set(self):
+        """Set the event and wake up anything selecting on it."""
+        super().set()
+        try:
+            os.write(self._write, b'\0')
+        except BlockingIOError:
+            pass
+
+    def clear(self):
+        """Clear the event."""
+        super().clear()
+        try:
+            while os.read(self._read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        """Close the pipe."""
+        os.close(self._read)
+        os.close(self._write)
+
+
+class ThreadedServer(ThreadingMixIn, HTTPServer):
+    """Thread per connection HTTP server.
+
+    Arguments:
+        server_address: The (host, port) to listen on.
+        RequestHandlerClass: The request handler class.
+        drain_timeout: The number of seconds to wait for requests in progress
+            to finish once the server is stopped.
+        reuse_port: If `True` other processes can listen on the same port
+            and the kernel spreads the connections between them.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        RequestHandlerClass: type,  # noqa: N803
+        drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+        reuse_port: bool = False,
+    ):
+        self.allow_reuse_port = reuse_port
+        super().__init__(server_address, RequestHandlerClass)
+        self.drain_timeout = drain_timeout
+        self._shutdown = StopEvent()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request: socket.socket, client_address):
+        """Handle `request` in a new thread."""
+        thread = threading.Thread(
+            target=self.process_request_thread,
+            args=(request, client_address),
+            daemon=self.daemon_threads,
+        )
+        with self._connections_lock:
+            self._connections[thread] = request
+        thread.start()
+
+    def process_request_thread(self, request: socket.socket, client_address):
+        """Handle `request` and forget about it once it's closed."""
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.pop(threading.current_thread(), None)
+
+    def drain(self, timeout: float) -> int:
+        """Wait up to `timeout` seconds for open connections to finish.
+
+        Connections stop reading new requests. Requests that have already
+        been read are answered unless that takes longer than `timeout`.
+
+        Returns:
+            The number of connections that were still busy at the deadline.
+        """
+        with self._connections_lock:
+            connections = dict(self._connections)
+        for request in connections.values():
+            try:
+                # Idle keep-alive connections see the end of the stream and
+                # the ones in the middle of a request still get to answer.
+                request.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for thread in connections:
+            thread.join(max(deadline - time.monotonic(), 0))
+        busy = sum(thread.is_alive() for thread in connections)
+        if busy:
+            log.warning('Abandoned %s busy connections', busy)
+        return busy
+
+    def serve_forever(
+        self,
+        poll_interval: float = 0.5,
+        stop: threading.Event = None,
+    ):
+        """Handle requests until shutdown or until `stop` is set.
+
+        The server sleeps until a client connects, `shutdown` is called, or
+        `stop` is set. A plain `threading.Event` can't wake it up so it's
+        polled every `poll_interval` seconds. Use a `StopEvent` to avoid
+        polling. Connections still open when the server stops are given
+        `drain_timeout` seconds to finish.
+        """
+        stop = stop or self._shutdown
+        timeout = poll_interval if not hasattr(stop, 'fileno') else None
+        self._BaseServer__is_shut_down.clear()
+        try:
+            with _ServerSelector() as selector:
+                selector.register(self, selectors.EVENT_READ)
+                selector.register(self._shutdown, selectors.EVENT_READ)
+                if stop is not self._shutdown and timeout is None:
+                    selector.register(stop, selectors.EVENT_READ)
+                while not (self._shutdown.is_set() or stop.is_set()):
+                    ready = selector.select(timeout)
+                    if self._shutdown.is_set() or stop.is_set():
+                        break
+                    if any(key.fileobj is self for key, _ in ready):
+                        self._handle_request_noblock()
+                    self.service_actions()
+            self.drain(self.drain_timeout)
+        finally:
+            self._shutdown.clear()
+            self._BaseServer__is_shut_down.set()
+
+    def shutdown(self):
+        """Stop `serve_forever` and wait for it to return."""
+        self._shutdown.set()
+        self._BaseServer__is_shut_down.wait()
+
+    def server_close(self):
+        """Close the listening socket."""
+        super().server_close()
+        self._shutdown.close()
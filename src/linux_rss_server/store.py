@@ -0,0 +1,280 @@
+"""Persistent feed state.
+
+The canonical state of the feed is kept in an SQLite database next to the
+RSS cache. Every item is stored with its ``<item>`` element already
+rendered so publishing the feed is a matter of concatenating rows. The keys
+of the items removed by the retention limits are kept as well so the files
+they link to, which are still upstream, aren't added back as new items.
+"""
+
+import pathlib
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Iterator, NamedTuple
+
+from . import log
+
+# Each migration brings the schema up by one version (see ``user_version``).
+_MIGRATIONS = (
+    '''
+    CREATE TABLE items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL UNIQUE,
+        title TEXT NOT NULL,
+        link TEXT NOT NULL,
+        description TEXT NOT NULL,
+        content TEXT NOT NULL,
+        added REAL NOT NULL,
+        xml TEXT NOT NULL
+    )
+    ''',
+    'ALTER TABLE items ADD COLUMN repo TEXT',
+    'ALTER TABLE items ADD COLUMN arch TEXT',
+    'CREATE INDEX items_repo_arch ON items (repo, arch)',
+    'CREATE TABLE pruned (key TEXT PRIMARY KEY, repo TEXT)',
+)
+_COLUMNS = 'id, key, title, link, description, content, added, xml, repo, arch'
+
+
+@dataclass
+class Item:
+    """A stored feed item."""
+
+    id: int
+    key: str
+    title: str
+    link: str
+    description: str
+    content: str
+    added: float
+    xml: str
+    repo: str = None
+    arch: str = None
+
+
+class Added(NamedTuple):
+    """What `Store.add` did.
+
+    Attributes:
+        new: `True` if the item was stored.
+        tagged: `True` if an item already stored under the key got the repo
+            and arch it was added with.
+    """
+
+    new: bool
+    tagged: bool
+
+
+class Store:
+    """SQLite backed feed item store.
+
+    Arguments:
+        path: The location of the database.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self._db = None
+        self.created = False
+
+    def open(self):
+        """Open the database creating or upgrading it as needed."""
+        if self._db is not None:
+            return
+        self._db = sqlite3.connect(self.path)
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        self.created = version == 0
+        for number, migration in enumerate(_MIGRATIONS[version:], version):
+            log.debug('Upgrading %s to version %s', self.path, number + 1)
+            with self._db:
+                self._db.execute(migration)
+                self._db.execute(f'PRAGMA user_version = {number + 1}')
+
+    def close(self):
+        """Commit any pending changes and close the database."""
+        if self._db is None:
+            return
+        self._db.commit()
+        self._db.close()
+        self._db = None
+
+    def commit(self):
+        """Commit pending changes."""
+        self._db.commit()
+
+    def __contains__(self, key: str) -> bool:
+        """Check if there is an item stored under `key`."""
+        return (
+            self._db.execute(
+                'SELECT 1 FROM items WHERE key = ?',
+                (key,),
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self) -> int:
+        """Get the number of stored items."""
+        return self._db.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def get(self, key: str) -> Item:
+        """Get the item stored under `key` or `None`."""
+        row = self._db.execute(
+            f'SELECT {_COLUMNS} FROM items WHERE key = ?',
+            (key,),
+        ).fetchone()
+        return Item(*row) if row else None
+
+    def add(
+        self,
+        key: str,
+        title: str,
+        link: str,
+        description: str,
+        content: str,
+        xml: str,
+        added: float = None,
+        repo: str = None,
+        arch: str = None,
+    ) -> Added:
+        """Store an item unless one is or was stored under `key`.
+
+        Items removed with `prune_older` or `prune_all_but_newest` aren't
+        stored again until they're `forget`-ed. If there already is an item
+        under `key` and `repo` is given, the item is tagged with `repo` and
+        `arch` instead, since items imported or stored before they had tags,
+        or found by a repo that was renamed, have other ones.
+        """
+        existed = key in self
+        cursor = self._db.execute(
+            'INSERT INTO items '
+            '(key, title, link, description, content, added, xml, repo, arch) '
+            'SELECT ?, ?, ?, ?, ?, ?, ?, ?, ? '
+            'WHERE NOT EXISTS (SELECT 1 FROM pruned WHERE key = ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'repo = excluded.repo, arch = excluded.arch '
+            'WHERE excluded.repo IS NOT NULL AND ('
+            'items.repo IS NOT excluded.repo OR items.arch IS NOT excluded.arch'
+            ')',
+            (
+                key,
+                title,
+                link,
+                description,
+                content,
+                time.time() if added is None else added,
+                xml,
+                repo,
+                arch,
+                key,
+            ),
+        )
+        if not existed and not cursor.rowcount and repo is not None:
+            # Pruned, keep its tag up to date for `pruned` too.
+            self._db.execute(
+                'UPDATE pruned SET repo = ? WHERE key = ? AND repo IS NOT ?',
+                (repo, key, repo),
+            )
+        return Added(
+            new=cursor.rowcount > 0 and not existed,
+            tagged=cursor.rowcount > 0 and existed,
+        )
+
+    def remove(self, key: str) -> bool:
+        """Remove the item stored under `key`.
+
+        Returns:
+            `True` if there was an item to remove.
+        """
+        cursor = self._db.execute('DELETE FROM items WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def tags(self, repo: str) -> set[tuple[str, str]]:
+        """Get the key and arch of the items from `repo`."""
+        return set(
+            self._db.execute(
+                'SELECT key, arch FROM items WHERE repo = ?',
+                (repo,),
+            ),
+        )
+
+    def keys(self, repo: str) -> list[str]:
+        """Get the keys of the items from `repo`."""
+        return [
+            key
+            for (key,) in self._db.execute(
+                'SELECT key FROM items WHERE repo = ?',
+                (repo,),
+            )
+        ]
+
+    def pruned(self, repo: str) -> list[str]:
+        """Get the keys of the pruned items from `repo`."""
+        return [
+            key
+            for (key,) in self._db.execute(
+                'SELECT key FROM pruned WHERE repo = ?',
+                (repo,),
+            )
+        ]
+
+    def forget(self, key: str) -> bool:
+        """Let an item be stored under `key` again after it was pruned.
+
+        Returns:
+            `True` if an item under `key` was pruned.
+        """
+        cursor = self._db.execute('DELETE FROM pruned WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def _prune(self, ids: str, parameters: tuple) -> int:
+        """Remove the items whose ``id`` is in the `ids` query for good."""
+        self._db.execute(
+            'INSERT OR IGNORE INTO pruned (key, repo) '
+            f'SELECT key, repo FROM items WHERE id IN ({ids})',
+            parameters,
+        )
+        return self._db.execute(
+            f'DELETE FROM items WHERE id IN ({ids})',
+            parameters,
+        ).rowcount
+
+    def prune_older(self, added: float) -> int:
+        """Remove the items added before `added` for good.
+
+        Returns:
+            The number of items removed.
+        """
+        return self._prune('SELECT id FROM items WHERE added < ?', (added,))
+
+    def prune_all_but_newest(self, count: int, per_arch: bool = False) -> int:
+        """Remove all but the newest `count` items for good.
+
+        Arguments:
+            count: The number of items to keep.
+            per_arch: If `True` keep `count` items for each repo and arch
+                instead of `count` items overall.
+
+        Returns:
+            The number of items removed.
+        """
+        if not per_arch:
+            return self._prune(
+                'SELECT id FROM items ORDER BY id DESC LIMIT -1 OFFSET ?',
+                (count,),
+            )
+        return self._prune(
+            'SELECT id FROM ('
+            ' SELECT id, ROW_NUMBER() OVER ('
+            '  PARTITION BY repo, arch ORDER BY id DESC'
+            ' ) AS position FROM items'
+            ') WHERE position > ?',
+            (count,),
+        )
+
+    def items(self) -> Iterator[Item]:
+        """Iterate over the stored items newest first."""
+        for row in self._db.execute(
+            f'SELECT {_COLUMNS} FROM items ORDER BY id DESC',
+        ):
+            yield Item(*row)
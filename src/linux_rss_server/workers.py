@@ -0,0 +1,198 @@
+"""Serve the feed from several processes.
+
+With `config.Server.workers` set the scraper keeps the main process to
+itself and the feed is served by that many worker processes. The workers all
+listen on the same port with ``SO_REUSEPORT`` so the kernel spreads the
+connections between them, and each one reloads the feed when the scraper
+tells it that it replaced the RSS file (see `Workers.notify`). Each worker
+saves its metrics whenever it serves them, and at least every
+`METRICS_INTERVAL` seconds, for the others to serve along with their own.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import pathlib
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from . import log, metrics
+from .config import Config
+from .publisher import Publisher
+from .server import StopEvent, ThreadedServer, request_handler_factory
+
+if TYPE_CHECKING:
+    from .aioserver import AsyncServer
+
+# A worker that dies sooner than this after starting is assumed to be unable
+# to start at all (eg the port is taken) and isn't restarted.
+_MIN_UPTIME = 5
+# How often a worker saves its metrics for the other workers.
+METRICS_INTERVAL = 5
+
+
+def make_server(
+    conf: Config,
+    publisher: Publisher,
+    reuse_port: bool = False,
+) -> 'ThreadedServer | AsyncServer':
+    """Make the server configured by `conf.server`.
+
+    `asyncio` is only imported if the asyncio engine is picked.
+    """
+    if conf.server.engine == 'asyncio':
+        from .aioserver import AsyncServer
+
+        return AsyncServer(
+            ('0.0.0.0', conf.port),
+            conf.server,
+            publisher,
+            reuse_port=reuse_port,
+        )
+    return ThreadedServer(
+        ('0.0.0.0', conf.port),
+        request_handler_factory(publisher),
+        drain_timeout=conf.server.drain_timeout,
+        reuse_port=reuse_port,
+    )
+
+
+def _share_metrics(path: pathlib.Path, stop: StopEvent):
+    """Save the worker's metrics to `path` until `stop` is set."""
+    metrics.REGISTRY.share(path)
+    while not stop.wait(METRICS_INTERVAL):
+        metrics.REGISTRY.save(path)
+    metrics.REGISTRY.save(path)
+
+
+def _serve(
+    conf: Config,
+    number: int,
+    log_level: int,
+    wake: multiprocessing.Event,
+):
+    """Serve the feed in worker process `number` until it's terminated.
+
+    The feed is reloaded when `wake` is set, or every
+    `config.Server.reload_interval` seconds if it changed. The metrics of
+    the worker are labelled with its number and served along with the
+    metrics the scraper saves to `config.Config.metrics` and the ones the
+    other workers save to `config.Config.worker_metrics`.
+    """
+    stop = StopEvent()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    # Interrupts are handled by the main process.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    log.setLevel(log_level)
+    metrics.REGISTRY.label(worker=number)
+    metrics.REGISTRY.include(conf.metrics)
+    for other in range(conf.server.workers):
+        if other != number:
+            metrics.REGISTRY.include(conf.worker_metrics(other))
+    publisher = Publisher(conf.spool if conf.server.sendfile else None)
+    publisher.load(conf.rss_cache, conf.feed_index, defer=True)
+    threading.Thread(
+        target=publisher.watch,
+        args=(
+            conf.rss_cache,
+            stop,
+            conf.server.reload_interval,
+            conf.feed_index,
+            wake,
+        ),
+        daemon=True,
+    ).start()
+    sharer = threading.Thread(
+        target=_share_metrics,
+        args=(conf.worker_metrics(number), stop),
+        daemon=True,
+    )
+    sharer.start()
+    server = make_server(conf, publisher, reuse_port=True)
+    server.serve_forever(stop=stop)
+    sharer.join()
+
+
+class Workers:
+    """The server worker processes.
+
+    Arguments:
+        conf: The application configuration.
+    """
+
+    def __init__(self, conf: Config):
+        self.config = conf
+        self.processes = {}
+        self.exitcode = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._wake = {}
+
+    def _start(self, number: int):
+        wake = self._context.Event()
+        process = self._context.Process(
+            target=_serve,
+            args=(self.config, number, log.getEffectiveLevel(), wake),
+            name=f'server-{number}',
+            daemon=True,
+        )
+        process.start()
+        self.processes[number] = (process, time.monotonic())
+        self._wake[number] = wake
+
+    def start(self):
+        """Start `config.server.workers` processes."""
+        for number in range(self.config.server.workers):
+            self._start(number)
+        log.info('Started %s server workers', len(self.processes))
+
+    def notify(self, *_):
+        """Tell the workers to reload the feed now."""
+        for wake in self._wake.values():
+            wake.set()
+
+    def watch(self, stop: StopEvent):
+        """Restart workers that die until `stop` is set.
+
+        If a worker dies right after starting `stop` is set and `exitcode` is
+        set to the worker's exit code.
+        """
+        while not stop.is_set():
+            sentinels = {
+                process.sentinel: number
+                for number, (process, _) in self.processes.items()
+            }
+            ready = multiprocessing.connection.wait([*sentinels, stop])
+            for sentinel in ready:
+                if sentinel is stop:
+                    return
+                number = sentinels[sentinel]
+                process, started = self.processes[number]
+                process.join()
+                if time.monotonic() - started < _MIN_UPTIME:
+                    log.error(
+                        'Server worker %s failed to start: exit code %s',
+                        number,
+                        process.exitcode,
+                    )
+                    self.exitcode = process.exitcode or 1
+                    stop.set()
+                    return
+                log.warning(
+                    'Restarting server worker %s: exit code %s',
+                    number,
+                    process.exitcode,
+                )
+                self._start(number)
+
+    def stop(self, timeout: float):
+        """Terminate the workers giving them `timeout` seconds to finish."""
+        for process, _ in self.processes.values():
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process, _ in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                log.warning('Killing server worker %s', process.name)
+                process.kill()
+                process.join()
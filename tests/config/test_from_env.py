@@ -33,6 +33,7 @@ def test_loads_from_env_with_no_defaults(tmp_path: pathlib.Path):
         START_AT_HOUR='13',
         START_AT_MINUTE='57',
         FILE_EXTENSION='.test-extension',
+        FULL_RECRAWL='true',
         CONFIGFILE=str(config_file.absolute()),
     )
     config = Config.from_env(env)
@@ -48,3 +49,4 @@ def test_loads_from_env_with_no_defaults(tmp_path: pathlib.Path):
     assert config.start_at.hour == 13
     assert config.start_at.minute == 57
     assert config.file_extension == '.test-extension'
+    assert config.recrawl.full
@@ -21,6 +21,9 @@ start_at:
   hour: 13
   minute: 57
 file_extension: .test-extension
+recrawl:
+  recent: 5
+  full: true
 '''
 
 SOME_DEFAULTS_CONFIG = '''\
@@ -58,6 +61,8 @@ def test_loads_from_file_no_defaults(tmp_path: pathlib.Path):
     assert config.start_at.hour == 13
     assert config.start_at.minute == 57
     assert config.file_extension == '.test-extension'
+    assert config.recrawl.recent == 5
+    assert config.recrawl.full
 
 
 def test_loads_from_file_some_defaults(tmp_path: pathlib.Path):
@@ -83,3 +88,5 @@ def test_loads_from_file_some_defaults(tmp_path: pathlib.Path):
     assert config.start_at.hour == 12
     assert config.start_at.minute == 0
     assert config.file_extension == '.torrent'
+    assert config.recrawl.recent == 3
+    assert not config.recrawl.full
@@ -0,0 +1,73 @@
+"""Tests for writing the RSS cache."""
+
+import pathlib
+
+from linux_rss_server.config import Config, Retention
+from linux_rss_server.feed import Feed
+from linux_rss_server.publisher import Publisher
+
+
+def _feed(tmp_path: pathlib.Path) -> Feed:
+    feed = Feed(
+        Config(
+            check_every=None,
+            healthcheck_url=None,
+            port=None,
+            repos=None,
+            rss_cache=tmp_path.joinpath('feed.rss'),
+            start_at=None,
+            file_extension=None,
+        ),
+    )
+    feed.load()
+    return feed
+
+
+def test_unchanged_feed_is_not_written(tmp_path: pathlib.Path):
+    """Verify a cycle that finds nothing new doesn't rewrite the RSS."""
+    feed = _feed(tmp_path)
+    feed.append('a.torrent', 'http://example.com/a.torrent')
+    assert feed.dump() is not None
+    written = feed.config.rss_cache.stat()
+    feed.append('a.torrent', 'http://example.com/a.torrent')
+    feed.prune(Retention())
+    assert feed.dump() is None
+    assert feed.config.rss_cache.stat().st_mtime_ns == written.st_mtime_ns
+    feed.append('b.torrent', 'http://example.com/b.torrent')
+    assert b'b.torrent' in feed.dump()
+    feed.close()
+
+
+def test_removals_are_written(tmp_path: pathlib.Path):
+    """Verify removing entries rewrites the RSS."""
+    feed = _feed(tmp_path)
+    feed.append('a.torrent', 'http://example.com/a.torrent')
+    feed.append('b.torrent', 'http://example.com/b.torrent')
+    feed.dump()
+    assert feed.prune(Retention(max_items=1)) == 1
+    assert b'a.torrent' not in feed.dump()
+    feed.remove('http://example.com/nothing.torrent')
+    assert feed.dump() is None
+    feed.remove('http://example.com/b.torrent')
+    assert b'b.torrent' not in feed.dump()
+    feed.close()
+
+
+def test_no_partial_files(tmp_path: pathlib.Path):
+    """Verify the RSS is swapped in without leaving temporary files."""
+    feed = _feed(tmp_path)
+    feed.append('a.torrent', 'http://example.com/a.torrent')
+    feed.dump()
+    feed.close()
+    assert not [path for path in tmp_path.iterdir() if path.suffix == '.tmp']
+
+
+def test_subscribers_are_notified():
+    """Verify subscribers hear about new publications only."""
+    publisher = Publisher()
+    published = []
+    publisher.subscribe(published.append)
+    first = publisher.publish(b'<rss>one</rss>')
+    publisher.publish(b'<rss>one</rss>')
+    second = publisher.publish(b'<rss>two</rss>')
+    assert published == [first, second]
@@ -2,8 +2,12 @@
 
 import pathlib
 
-from linux_rss_server.config import Config
+import feedparser
+
+from linux_rss_server.config import Config, Retention
 from linux_rss_server.feed import Feed
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import respond
 
 MOCK_RSS_FEED = '''\
 <?xml version="1.0" encoding="UTF-8" ?>
@@ -61,37 +65,83 @@ def test_appends_to_existing_feed(tmp_path: pathlib.Path):
     feed.dump()
     assert rss_cache.exists()
     # Appended entry
-    entries = feed.feed.entry()
-    assert entries[0].content()['content'] == 'test append new name'
-    assert entries[0].description() == 'test append new name'
-    assert entries[0].link()[0]['href'] == (
-        'http://test.example.com/test_append_new_url'  # nofmt
-    )
-    assert entries[0].title() == 'test append new name'
-    # Existing entries
-    assert entries[3].content()['content'] == (
+    entries = list(feed.items())
+    assert len(entries) == 4
+    assert entries[0].content == 'http://test.example.com/test_append_new_url'
+    assert entries[0].description == 'test append new name'
+    assert entries[0].link == 'http://test.example.com/test_append_new_url'
+    assert entries[0].title == 'test append new name'
+    # Existing entries keep their order
+    for number, entry in enumerate(entries[1:], 1):
+        link = f'http://test.example.com/test_item_link_{number}'
+        assert entry.content == link
+        assert entry.description == f'test item description {number}'
+        assert entry.link == link
+        assert entry.title == f'test item title {number}'
+    # The regenerated RSS has the same entries
+    parsed = feedparser.parse(rss_cache)
+    assert [item.link for item in parsed.entries] == [
+        entry.link for entry in entries
+    ]
+    assert parsed.entries[1].content[0]['value'] == (
         'http://test.example.com/test_item_link_1'  # nofmt
     )
-    assert entries[3].description() == 'test item description 1'
-    assert entries[3].link()[0]['href'] == (
-        'http://test.example.com/test_item_link_1'  # nofmt
-    )
-    assert entries[3].title() == 'test item title 1'
 
-    assert entries[2].content()['content'] == (
-        'http://test.example.com/test_item_link_2'  # nofmt
-    )
-    assert entries[2].description() == 'test item description 2'
-    assert entries[2].link()[0]['href'] == (
-        'http://test.example.com/test_item_link_2'  # nofmt
-    )
-    assert entries[2].title() == 'test item title 2'
 
-    assert entries[1].content()['content'] == (
-        'http://test.example.com/test_item_link_3'  # nofmt
+def test_imports_existing_feed_once(tmp_path: pathlib.Path):
+    """Test the RSS cache is only imported into a new feed store."""
+    rss_cache = tmp_path.joinpath('feed.rss')
+    rss_cache.write_text(MOCK_RSS_FEED)
+    config = Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=rss_cache,
+        start_at=None,
+        file_extension=None,
     )
-    assert entries[1].description() == 'test item description 3'
-    assert entries[1].link()[0]['href'] == (
-        'http://test.example.com/test_item_link_3'  # nofmt
+    feed = Feed(config)
+    feed.load()
+    feed.remove('http://test.example.com/test_item_link_2')
+    feed.dump()
+    feed.close()
+    feed = Feed(config)
+    feed.load()
+    assert [entry.title for entry in feed.items()] == [
+        'test item title 1',
+        'test item title 3',
+    ]
+
+
+def test_imported_entries_get_tagged(tmp_path: pathlib.Path):
+    """Test entries imported without a repo get one when they're found."""
+    rss_cache = tmp_path.joinpath('feed.rss')
+    rss_cache.write_text(MOCK_RSS_FEED)
+    config = Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=rss_cache,
+        start_at=None,
+        file_extension=None,
     )
-    assert entries[1].title() == 'test item title 3'
+    feed = Feed(config)
+    feed.load()
+    feed.dump()
+    link = 'http://test.example.com/test_item_link_1'
+    assert feed.get(link).repo is None
+    assert not feed.append('test item title 1', link, 'h', 'amd64')
+    assert (feed.get(link).repo, feed.get(link).arch) == ('h', 'amd64')
+    assert not feed.append('test item title 1', link)
+    assert feed.get(link).repo == 'h'
+    publisher = Publisher()
+    publisher.publish(feed.dump(), index=feed.index)
+    response = respond(publisher, 'GET', {}, '/feeds/h/amd64')
+    assert [item.link for item in feedparser.parse(response.body).entries] == [
+        link,
+    ]
+    assert feed.prune(Retention(drop_missing=True), {'h': []}) == 1
+    assert link not in feed
+    assert len(feed) == 2
@@ -0,0 +1,64 @@
+"""Tests for the feed's entry index."""
+
+import pathlib
+
+import feedparser
+
+from linux_rss_server.config import Config
+from linux_rss_server.feed import Feed, normalize_url
+
+
+def _feed(tmp_path: pathlib.Path) -> Feed:
+    feed = Feed(
+        Config(
+            check_every=None,
+            healthcheck_url=None,
+            port=None,
+            repos=None,
+            rss_cache=tmp_path.joinpath('feed.rss'),
+            start_at=None,
+            file_extension=None,
+        ),
+    )
+    feed.load()
+    return feed
+
+
+def test_normalize_url():
+    """Verify equivalent URLs normalize to the same key."""
+    assert normalize_url('HTTPS://CD.Example.com/a//b.torrent#x') == (
+        'https://cd.example.com/a/b.torrent'
+    )
+
+
+def test_dedup_normalized(tmp_path: pathlib.Path):
+    """Verify equivalent URLs are only added once."""
+    feed = _feed(tmp_path)
+    feed.append('b.torrent', 'https://cd.example.com/a//b.torrent')
+    feed.append('b.torrent', 'https://CD.example.com/a/b.torrent')
+    assert len(feed) == 1
+    assert 'https://cd.example.com/a/b.torrent' in feed
+    assert 'https://cd.example.com/a/c.torrent' not in feed
+
+
+def test_get_and_remove(tmp_path: pathlib.Path):
+    """Verify entries can be looked up and removed by URL."""
+    feed = _feed(tmp_path)
+    feed.append('b.torrent', 'https://cd.example.com/a/b.torrent')
+    feed.append('c.torrent', 'https://cd.example.com/a/c.torrent')
+    assert feed.get('https://cd.example.com/a/b.torrent').title == ('b.torrent')
+    assert feed.get('https://cd.example.com/a/d.torrent') is None
+    feed.remove('https://cd.example.com/a//b.torrent')
+    assert 'https://cd.example.com/a/b.torrent' not in feed
+    assert [entry.title for entry in feed.items()] == ['c.torrent']
+
+
+def test_dump_newest_first(tmp_path: pathlib.Path):
+    """Verify entries are written newest first."""
+    feed = _feed(tmp_path)
+    for name in ('a', 'b', 'c'):
+        feed.append(name, f'https://cd.example.com/{name}')
+    feed.dump()
+    assert [entry.title for entry in feed.items()] == ['c', 'b', 'a']
+    parsed = feedparser.parse(feed.config.rss_cache)
+    assert [entry.title for entry in parsed.entries] == ['c', 'b', 'a']
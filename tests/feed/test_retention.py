@@ -0,0 +1,122 @@
+"""Tests for the feed retention policies."""
+
+import pathlib
+import time
+
+from linux_rss_server.config import Config, Retention
+from linux_rss_server.feed import Feed
+
+
+def _feed(tmp_path: pathlib.Path) -> Feed:
+    feed = Feed(
+        Config(
+            check_every=None,
+            healthcheck_url=None,
+            port=None,
+            repos=None,
+            rss_cache=tmp_path.joinpath('feed.rss'),
+            start_at=None,
+            file_extension=None,
+        ),
+    )
+    feed.load()
+    for repo in ('debian', 'tails'):
+        for arch in ('amd64', 'arm64'):
+            for number in range(3):
+                name = f'{repo}-{number}-{arch}.torrent'
+                feed.append(name, f'http://{repo}/{arch}/{name}', repo, arch)
+    return feed
+
+
+def _titles(feed: Feed) -> list[str]:
+    return [item.title for item in feed.items()]
+
+
+def test_no_retention(tmp_path: pathlib.Path):
+    """Verify nothing is removed by default."""
+    feed = _feed(tmp_path)
+    assert feed.prune(Retention()) == 0
+    assert len(feed) == 12
+
+
+def test_max_items(tmp_path: pathlib.Path):
+    """Verify only the newest entries are kept."""
+    feed = _feed(tmp_path)
+    assert feed.prune(Retention(max_items=2)) == 10
+    assert _titles(feed) == [
+        'tails-2-arm64.torrent',
+        'tails-1-arm64.torrent',
+    ]
+
+
+def test_per_arch(tmp_path: pathlib.Path):
+    """Verify the newest entries are kept for each repo and arch."""
+    feed = _feed(tmp_path)
+    assert feed.prune(Retention(per_arch=1)) == 8
+    assert _titles(feed) == [
+        'tails-2-arm64.torrent',
+        'tails-2-amd64.torrent',
+        'debian-2-arm64.torrent',
+        'debian-2-amd64.torrent',
+    ]
+
+
+def test_max_age(tmp_path: pathlib.Path):
+    """Verify old entries are removed."""
+    feed = _feed(tmp_path)
+    feed.store._db.execute(
+        'UPDATE items SET added = ? WHERE repo = ?',
+        (time.time() - 3 * 86400, 'debian'),
+    )
+    assert feed.prune(Retention(max_age_days=2)) == 6
+    assert all(title.startswith('tails') for title in _titles(feed))
+
+
+def test_drop_missing(tmp_path: pathlib.Path):
+    """Verify entries missing upstream are only dropped for given repos."""
+    feed = _feed(tmp_path)
+    found = {
+        'debian': [
+            'http://debian/amd64/debian-2-amd64.torrent',
+            'http://debian//arm64/debian-2-arm64.torrent',
+        ],
+    }
+    assert feed.prune(Retention(drop_missing=True), found) == 4
+    assert feed.prune(Retention(), {'debian': []}) == 0
+    titles = _titles(feed)
+    assert len(titles) == 8
+    assert 'debian-2-arm64.torrent' in titles
+    assert 'debian-1-arm64.torrent' not in titles
+
+
+def test_pruned_entries_stay_pruned(tmp_path: pathlib.Path):
+    """Verify entries still upstream aren't added back after being pruned."""
+    feed = _feed(tmp_path)
+    retention = Retention(max_items=2, per_arch=1, drop_missing=True)
+    names = ('a.torrent', 'b.torrent', 'c.torrent')
+    found = {'debian': [f'http://debian/amd64/{name}' for name in names]}
+    kept = None
+    for cycle in range(4):
+        added = [
+            feed.append(name, f'http://debian/amd64/{name}', 'debian', 'amd64')
+            for name in names
+        ]
+        feed.prune(retention, found)
+        if cycle == 0:
+            kept = _titles(feed)
+            assert feed.dump() is not None
+        else:
+            assert added == [False, False, False]
+            assert _titles(feed) == kept
+            assert feed.dump() is None
+    assert kept == ['c.torrent', 'tails-2-arm64.torrent']
+
+
+def test_pruned_entries_return_after_missing(tmp_path: pathlib.Path):
+    """Verify a pruned entry is added again once it was gone upstream."""
+    feed = _feed(tmp_path)
+    url = 'http://debian/amd64/debian-0-amd64.torrent'
+    feed.prune(Retention(per_arch=2))
+    assert not feed.append('debian-0-amd64.torrent', url, 'debian', 'amd64')
+    feed.prune(Retention(drop_missing=True), {'debian': []})
+    assert feed.append('debian-0-amd64.torrent', url, 'debian', 'amd64')
@@ -0,0 +1,143 @@
+"""Tests for the metrics and their text format."""
+
+import pathlib
+
+import pytest
+
+from linux_rss_server.metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_counter():
+    """Verify counters count by label."""
+    registry = Registry()
+    requests = registry.register(
+        Counter('requests_total', 'Requests.', ['status']),
+    )
+    assert registry.render() == b''
+    requests.inc(status=200)
+    requests.inc(2, status=200)
+    requests.inc(status=404)
+    assert requests.get(status=200) == 3
+    assert registry.render().decode() == (
+        '# HELP requests_total Requests.\n'
+        '# TYPE requests_total counter\n'
+        'requests_total{status="200"} 3\n'
+        'requests_total{status="404"} 1\n'
+    )
+
+
+def test_gauge():
+    """Verify gauges keep the last value."""
+    registry = Registry()
+    ratio = registry.register(Gauge('ratio', 'A ratio.'))
+    ratio.set(0.5)
+    ratio.set(0.25)
+    assert ratio.get() == 0.25
+    assert registry.render().decode().endswith('\nratio 0.25\n')
+
+
+def test_histogram():
+    """Verify histograms have cumulative buckets, a sum and a count."""
+    registry = Registry()
+    latency = registry.register(
+        Histogram('latency_seconds', 'Latency.', ['url'], buckets=(0.1, 1)),
+    )
+    for value in (0.05, 0.1, 0.5, 2):
+        latency.observe(value, url='http://x/')
+    assert latency.count(url='http://x/') == 4
+    assert registry.render().decode() == (
+        '# HELP latency_seconds Latency.\n'
+        '# TYPE latency_seconds histogram\n'
+        'latency_seconds_bucket{url="http://x/",le="0.1"} 2\n'
+        'latency_seconds_bucket{url="http://x/",le="1"} 3\n'
+        'latency_seconds_bucket{url="http://x/",le="+Inf"} 4\n'
+        'latency_seconds_sum{url="http://x/"} 2.65\n'
+        'latency_seconds_count{url="http://x/"} 4\n'
+    )
+
+
+def test_histogram_time():
+    """Verify the time of a block is observed even if it raises."""
+    latency = Histogram('latency_seconds', 'Latency.')
+    with latency.time():
+        pass
+    with pytest.raises(RuntimeError):
+        with latency.time():
+            raise RuntimeError()
+    assert latency.count() == 2
+
+
+def test_escaping():
+    """Verify label values are escaped."""
+    registry = Registry()
+    counter = registry.register(Counter('things', 'Things.', ['name']))
+    counter.inc(name='a "b"\\\n')
+    assert b'things{name="a \\"b\\"\\\\\\n"} 1' in registry.render()
+
+
+def test_bad_labels():
+    """Verify metrics refuse labels they don't have."""
+    counter = Counter('things', 'Things.', ['name'])
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(name='a', other='b')
+
+
+def test_duplicate():
+    """Verify a metric name can only be registered once."""
+    registry = Registry()
+    registry.register(Counter('things', 'Things.'))
+    with pytest.raises(ValueError):
+        registry.register(Gauge('things', 'Other things.'))
+
+
+def test_save_include(tmp_path: pathlib.Path):
+    """Verify metrics saved by one process are rendered by another."""
+    path = tmp_path / 'scraper.prom'
+    scraper = Registry()
+    scraper.register(Gauge('added', 'Added.')).set(3)
+    server = Registry()
+    server.register(Counter('served', 'Served.')).inc()
+    server.include(path)
+    assert b'added' not in server.render()
+    scraper.save(path)
+    text = server.render().decode()
+    assert 'served 1\n' in text
+    assert 'added 3\n' in text
+
+
+def test_label_merge(tmp_path: pathlib.Path):
+    """Verify processes sharing metrics each render under their label."""
+    registries = [Registry(), Registry()]
+    for number, registry in enumerate(registries):
+        registry.register(Counter('served', 'Served.', ['status']))
+        registry.register(Gauge('ratio', 'A ratio.'))
+        registry.label(worker=number)
+        registry.include(tmp_path / f'{1 - number}.prom')
+    registries[0]._metrics['served'].inc(status=200)
+    registries[0]._metrics['ratio'].set(0.5)
+    registries[1]._metrics['served'].inc(2, status=200)
+    registries[1].save(tmp_path / '1.prom')
+    assert registries[0].render().decode() == (
+        '# HELP served Served.\n'
+        '# TYPE served counter\n'
+        'served{worker="0",status="200"} 1\n'
+        'served{worker="1",status="200"} 2\n'
+        '# HELP ratio A ratio.\n'
+        '# TYPE ratio gauge\n'
+        'ratio{worker="0"} 0.5\n'
+    )
+    registries[0].save(tmp_path / '0.prom')
+    assert registries[1].render().decode().count('# TYPE served') == 1
+
+
+def test_share(tmp_path: pathlib.Path):
+    """Verify shared metrics are saved every time they're rendered."""
+    path = tmp_path / 'worker.prom'
+    registry = Registry()
+    served = registry.register(Counter('served', 'Served.'))
+    registry.share(path)
+    served.inc()
+    assert registry.render() == path.read_bytes()
+    assert path.read_text().endswith('served 1\n')
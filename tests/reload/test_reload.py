@@ -0,0 +1,191 @@
+"""Tests for reloading the config."""
+
+import os
+import pathlib
+import threading
+import time
+
+import pytest
+
+from linux_rss_server import reload
+from linux_rss_server.__main__ import ScraperThread
+from linux_rss_server.config import (
+    CheckEvery,
+    Config,
+    Repo,
+    RepoType,
+    Server,
+    Time,
+)
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.schedule import Scheduler
+from linux_rss_server.server import StopEvent
+
+CONFIG = '''\
+---
+rss_cache: {tmp}/feed.rss
+port: 8080
+repos:
+  - url_format: http://one.example.com/{{arch}}
+    arches: [amd64]
+    type: debian
+    name: one
+  - url_format: http://two.example.com/
+    type: debian
+    name: two
+'''
+
+
+@pytest.fixture(params=[True, False], ids=['inotify', 'polling'])
+def watcher(request, tmp_path: pathlib.Path) -> reload.ConfigWatcher:
+    """Watch a config file with inotify and by polling."""
+    path = tmp_path / 'config.yml'
+    path.write_text('---\n')
+    watcher = reload.ConfigWatcher(path, 0.05, inotify=request.param)
+    if request.param and not watcher.inotify:
+        pytest.skip('inotify is not available')
+    yield watcher
+    watcher.close()
+
+
+def _wait_in_thread(watcher: reload.ConfigWatcher, stop: StopEvent):
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(watcher.wait(stop)),
+    )
+    thread.start()
+    time.sleep(0.1)
+    return thread, results
+
+
+def test_watch_modified(watcher: reload.ConfigWatcher):
+    """Verify a file written in place is noticed."""
+    thread, results = _wait_in_thread(watcher, StopEvent())
+    watcher.path.write_text('---\nport: 1\n')
+    thread.join(5)
+    assert results == [True]
+
+
+def test_watch_replaced(watcher: reload.ConfigWatcher):
+    """Verify a file that's replaced is noticed."""
+    thread, results = _wait_in_thread(watcher, StopEvent())
+    tmp = watcher.path.with_name('.config.yml.tmp')
+    tmp.write_text('---\nport: 2\n')
+    os.replace(tmp, watcher.path)
+    thread.join(5)
+    assert results == [True]
+
+
+def test_watch_ignores_other_files(watcher: reload.ConfigWatcher):
+    """Verify changes to other files in the directory are ignored."""
+    stop = StopEvent()
+    thread, results = _wait_in_thread(watcher, stop)
+    watcher.path.with_name('other.yml').write_text('---\n')
+    time.sleep(0.2)
+    assert results == []
+    stop.set()
+    thread.join(5)
+    assert results == [False]
+
+
+def test_watch_stops_right_away(watcher: reload.ConfigWatcher):
+    """Verify setting `stop` wakes the watcher without a timeout."""
+    stop = StopEvent()
+    thread, results = _wait_in_thread(watcher, stop)
+    started = time.monotonic()
+    stop.set()
+    thread.join(5)
+    assert results == [False]
+    if watcher.inotify:
+        assert time.monotonic() - started < 0.5
+
+
+def test_diff_repos():
+    """Verify added and changed repos are found along with removed ones."""
+    old = [
+        Repo('http://a/', None, RepoType.debian, 'a'),
+        Repo('http://b/', None, RepoType.debian, 'b'),
+        Repo('http://c/', None, RepoType.debian, 'c'),
+    ]
+    new = [
+        Repo('http://d/', None, RepoType.debian, 'd'),
+        Repo('http://a/', None, RepoType.debian, 'a'),
+        Repo('http://b/', ['amd64'], RepoType.debian, 'b'),
+    ]
+    changed, removed = reload.diff_repos(old, new)
+    assert [repo.name for repo in changed] == ['d', 'b']
+    assert removed == ['c']
+
+
+def test_merge_keeps_restart_settings(tmp_path: pathlib.Path):
+    """Verify settings that need a restart aren't changed by a reload."""
+    old = _config(tmp_path)
+    new = _config(tmp_path)
+    new.port = 1
+    new.server = Server(engine='asyncio')
+    new.file_extension = '.iso'
+    merged = reload.merge(old, new)
+    assert merged.port == old.port
+    assert merged.server == old.server
+    assert merged.file_extension == '.iso'
+
+
+def test_watch_applies_valid_configs(tmp_path: pathlib.Path):
+    """Verify only configs that load are applied."""
+    path = tmp_path / 'config.yml'
+    path.write_text(CONFIG.format(tmp=tmp_path))
+    applied = []
+    stop = StopEvent()
+    thread = threading.Thread(
+        target=reload.watch,
+        args=(path, lambda: Config.from_file(path), applied.append, stop),
+        kwargs={'interval': 0.05},
+    )
+    thread.start()
+    time.sleep(0.1)
+    path.write_text('---\nrepos: [{type: nosuch, url_format: x}]\n')
+    time.sleep(0.3)
+    assert applied == []
+    path.write_text(CONFIG.format(tmp=tmp_path).replace('8080', '8081'))
+    deadline = time.monotonic() + 5
+    while not applied and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stop.set()
+    thread.join(5)
+    assert [config.port for config in applied] == [8081]
+
+
+def _config(tmp_path: pathlib.Path, *repos: Repo) -> Config:
+    return Config(
+        check_every=CheckEvery('day', 1),
+        healthcheck_url=None,
+        port=8080,
+        repos=list(repos),
+        rss_cache=tmp_path / 'feed.rss',
+        start_at=Time(12, 0),
+    )
+
+
+def test_scraper_applies_reload(tmp_path: pathlib.Path):
+    """Verify the scraper only rescrapes repos that were added or changed."""
+    one = Repo('http://one/', None, RepoType.debian, 'one')
+    two = Repo('http://two/', None, RepoType.debian, 'two')
+    conf = _config(tmp_path, one, two)
+    scraper = ScraperThread(conf, threading.Event(), Publisher())
+    now = time.time()
+    scheduler = Scheduler(conf, now)
+    for repo in scheduler.due(now):
+        scheduler.done(repo, False, now)
+    three = Repo('http://three/', None, RepoType.debian, 'three')
+    changed = Repo('http://two/', ['amd64'], RepoType.debian, 'two')
+    scraper.reload(_config(tmp_path, three, changed))
+    scraper._apply(scheduler)
+    assert scraper.config.repos == [three, changed]
+    assert [repo.name for repo in scheduler.due(time.time())] == [
+        'three',
+        'two',
+    ]
+    assert scheduler.next_due() is None
+    scraper.reload(_config(tmp_path, three, changed))
+    scraper._apply(scheduler)
+    assert scheduler.due(time.time()) == []
@@ -0,0 +1,228 @@
+"""Tests for scheduling repo scrapes."""
+
+import datetime
+import pathlib
+import random
+
+import pytest
+
+from linux_rss_server.config import (
+    CheckEvery,
+    Config,
+    Repo,
+    RepoType,
+    Schedule,
+    Time,
+)
+from linux_rss_server.schedule import MIN_INTERVAL, Scheduler
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+NOW = datetime.datetime(2024, 1, 1, 10, 0).timestamp()
+
+
+def _config(
+    schedule: Schedule = None,
+    check_every: CheckEvery = None,
+    **repo_check_every,
+) -> Config:
+    return Config(
+        check_every=check_every or CheckEvery('day', 1),
+        healthcheck_url=None,
+        port=None,
+        repos=[
+            Repo(
+                f'http://{name}/{{arch}}/',
+                None,
+                RepoType.debian,
+                name,
+                repo_check_every.get(name),
+            )
+            for name in ('first', 'second', 'third')
+        ],
+        rss_cache=pathlib.Path('feed.rss'),
+        start_at=Time(hour=12, minute=0),
+        schedule=schedule or Schedule(jitter=0),
+    )
+
+
+def _names(repos: list[Repo]) -> list[str]:
+    return [repo.name for repo in repos]
+
+
+def test_everything_due_at_start():
+    """Verify every repo is scraped right away in the configured order."""
+    scheduler = Scheduler(_config(), NOW)
+    assert scheduler.next_due() == NOW
+    assert _names(scheduler.due(NOW)) == ['first', 'second', 'third']
+    assert scheduler.due(NOW) == []
+    assert scheduler.next_due() is None
+
+
+@pytest.mark.parametrize(
+    'now,check_every,expected',
+    [
+        (NOW, CheckEvery('day', 1), datetime.datetime(2024, 1, 1, 12, 0)),
+        (
+            NOW + 4 * HOUR,
+            CheckEvery('day', 1),
+            datetime.datetime(2024, 1, 2, 12, 0),
+        ),
+        (
+            NOW + 4 * HOUR,
+            CheckEvery('week', 1),
+            datetime.datetime(2024, 1, 8, 12, 0),
+        ),
+        (
+            NOW,
+            CheckEvery('hour', 6),
+            datetime.datetime(2024, 1, 1, 12, 0),
+        ),
+        (
+            NOW + 3 * HOUR,
+            CheckEvery('hour', 6),
+            datetime.datetime(2024, 1, 1, 18, 0),
+        ),
+        (
+            NOW - 5 * HOUR,
+            CheckEvery('hour', 3),
+            datetime.datetime(2024, 1, 1, 6, 0),
+        ),
+    ],
+)
+def test_first_check_lines_up_with_start_at(now, check_every, expected):
+    """Verify the check after the first one lines up with `start_at`."""
+    config = _config(check_every=check_every)
+    scheduler = Scheduler(config, now)
+    repo = scheduler.due(now)[0]
+    assert scheduler.done(repo, False, now) == expected.timestamp()
+
+
+def test_repo_intervals():
+    """Verify repos are checked at their own intervals."""
+    config = _config(second=CheckEvery('hour', 1))
+    scheduler = Scheduler(config, NOW)
+    for repo in scheduler.due(NOW):
+        scheduler.done(repo, False, NOW)
+    now = datetime.datetime(2024, 1, 1, 12, 0).timestamp()
+    assert scheduler.next_due() == NOW + HOUR
+    assert _names(scheduler.due(NOW + HOUR)) == ['second']
+    assert _names(scheduler.due(now)) == ['first', 'third']
+
+
+def test_adapts_interval():
+    """Verify quiet repos back off and busy repos speed up within limits."""
+    scheduler = Scheduler(_config(Schedule(jitter=0, max_backoff=4)), NOW)
+    repo = scheduler.due(NOW)[0]
+    now = scheduler.done(repo, True, NOW)
+    intervals = []
+    for changed in [False] * 6 + [True] * 6:
+        scheduler.due(now)
+        due = scheduler.done(repo, changed, now)
+        intervals.append(due - now)
+        now = due
+    assert intervals[:4] == [1.5 * DAY, 2.25 * DAY, 3.375 * DAY, 4 * DAY]
+    assert intervals[5] == 4 * DAY
+    assert intervals[6:9] == [2 * DAY, DAY, DAY / 2]
+    assert intervals[-1] == DAY / 4
+
+
+def test_speed_up_floor():
+    """Verify repos are never checked more often than every 15 minutes."""
+    config = _config(
+        Schedule(jitter=0, max_backoff=100),
+        check_every=CheckEvery('minute', 30),
+    )
+    scheduler = Scheduler(config, NOW)
+    repo = scheduler.due(NOW)[0]
+    now = scheduler.done(repo, True, NOW)
+    for _ in range(3):
+        scheduler.due(now)
+        due = scheduler.done(repo, True, now)
+        assert due - now == MIN_INTERVAL
+        now = due
+
+
+def test_not_adaptive():
+    """Verify intervals stay put when adapting is turned off."""
+    scheduler = Scheduler(_config(Schedule(jitter=0, adaptive=False)), NOW)
+    repo = scheduler.due(NOW)[0]
+    now = scheduler.done(repo, False, NOW)
+    for changed in (False, True, False):
+        scheduler.due(now)
+        due = scheduler.done(repo, changed, now)
+        assert due - now == DAY
+        now = due
+
+
+def test_jitter():
+    """Verify checks are spread out by the jitter."""
+    scheduler = Scheduler(
+        _config(Schedule(jitter=0.1, adaptive=False)),
+        NOW,
+        random.Random(1),
+    )
+    repos = scheduler.due(NOW)
+    for repo in repos:
+        scheduler.done(repo, False, NOW)
+    now = datetime.datetime(2024, 1, 1, 12, 0).timestamp()
+    due = set()
+    while scheduler.next_due() is not None:
+        when = scheduler.next_due()
+        assert abs(when - now) <= 0.1 * DAY
+        due.add(when)
+        scheduler.due(when)
+    assert len(due) == len(repos)
+
+
+def test_invalid_schedule():
+    """Verify bad schedule settings are refused."""
+    with pytest.raises(ValueError):
+        Schedule(jitter=1)
+    with pytest.raises(ValueError):
+        Schedule(max_backoff=0.5)
+
+
+def test_from_file(tmp_path: pathlib.Path):
+    """Verify the schedule and repo intervals are read from the config."""
+    config_file = tmp_path.joinpath('config.yml')
+    config_file.write_text(
+        '---\n'
+        f'rss_cache: {tmp_path}/feed.rss\n'
+        'repos:\n'
+        '  - url_format: http://one.example.com/\n'
+        '    type: debian\n'
+        '    check_every:\n'
+        '      unit: hour\n'
+        '      multiplier: 6\n'
+        '  - url_format: http://two.example.com/\n'
+        '    type: debian\n'
+        'schedule:\n'
+        '  jitter: 0.2\n'
+        '  adaptive: false\n'
+        '  max_backoff: 2\n',
+    )
+    config = Config.from_file(config_file)
+    assert config.schedule == Schedule(0.2, False, 2)
+    assert config.repos[0].check_every == CheckEvery('hour', 6)
+    assert config.repos[1].check_every is None
+
+
+def test_update():
+    """Verify a reloaded config keeps the schedules of unchanged repos."""
+    config = _config(Schedule(jitter=0, max_backoff=2))
+    scheduler = Scheduler(config, NOW)
+    for repo in scheduler.due(NOW):
+        scheduler.done(repo, False, NOW)
+    scheduler.intervals['first'] = 2 * DAY
+    new = _config(
+        Schedule(jitter=0, max_backoff=1.5),
+        second=CheckEvery('hour', 6),
+    )
+    new.repos = [new.repos[0], new.repos[1]]
+    scheduler.update(new, [new.repos[1]], NOW + HOUR)
+    assert scheduler.intervals == {'first': 1.5 * DAY, 'second': 6 * HOUR}
+    assert _names(scheduler.due(NOW + HOUR)) == ['second']
+    noon = datetime.datetime(2024, 1, 1, 12, 0).timestamp()
+    assert _names(scheduler.due(noon)) == ['first']
+    assert scheduler.next_due() is None
@@ -0,0 +1,90 @@
+"""Fixtures for the scraper tests."""
+
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from linux_rss_server.config import Http, Politeness
+from linux_rss_server.scrapers import page
+
+
+class _Mirror(ThreadingHTTPServer):
+    """A local stand-in for a mirror serving `pages`."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _MirrorHandler)
+        self.pages = {}
+        self.requests = []
+        self.peers = set()
+
+    @property
+    def url(self) -> str:
+        """The base URL of the mirror."""
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        self.server.peers.add(self.client_address)
+        handler = self.server.pages.get(self.path)
+        if handler is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if callable(handler):
+            handler = handler(self)
+            if handler is None:
+                return
+        headers = {}
+        if isinstance(handler, tuple):
+            handler, headers = handler
+        body = handler.encode() if isinstance(handler, str) else handler
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mirror():
+    """Run a local mirror for the duration of a test."""
+    server = _Mirror()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_session(monkeypatch):
+    """Give every test its own HTTP session and skip retry delays."""
+    monkeypatch.setattr(
+        page,
+        'time',
+        types.SimpleNamespace(
+            sleep=lambda _: None,
+            monotonic=time.monotonic,
+            time=time.time,
+        ),
+    )
+    page.configure(Http(connect_timeout=1, read_timeout=1))
+    page.set_politeness(Politeness(rate=0))
+    page.reset_stats()
+    yield
+    page.configure(Http())
+    page.set_politeness(Politeness())
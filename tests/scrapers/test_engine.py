@@ -0,0 +1,180 @@
+"""Tests for the concurrent scrape engine."""
+
+import random
+import threading
+import time
+
+import pytest
+
+from linux_rss_server import scrapers
+from linux_rss_server.config import (
+    Concurrency,
+    Config,
+    Recrawl,
+    Repo,
+    RepoType,
+)
+from linux_rss_server.scrapers import Scraper, engine
+
+
+def _config(workers: int = 4, per_host: int = 2) -> Config:
+    return Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=None,
+        start_at=None,
+        file_extension='.torrent',
+        concurrency=Concurrency(workers=workers, per_host=per_host),
+    )
+
+
+def _sleep():
+    time.sleep(random.uniform(0, 0.01))
+
+
+class _Flat(Scraper):
+    def parse(self, config, url, chunks):
+        yield 'a.torrent', f'{url}/a.torrent'
+        yield 'b.torrent', f'{url}/b.torrent'
+
+
+class _Nested(Scraper):
+    subpages = True
+
+    def parse_subpages(self, config, url, chunks):
+        return [f'{url}/{version}' for version in ('1.0', '2.0', '3.0')]
+
+    def parse(self, config, url, chunks):
+        yield 'c.torrent', f'{url}/c.torrent'
+
+
+@pytest.fixture
+def fetched(monkeypatch) -> dict:
+    """Parse every page without fetching it.
+
+    Returns:
+        The `refresh` argument of every page parsed by URL.
+    """
+    fetched = {}
+
+    def parse(url, parser, variant='', refresh=True, scraper=None):
+        _sleep()
+        fetched[url] = refresh
+        return list(parser([b'']))
+
+    monkeypatch.setattr(engine.page, 'parse', parse)
+    monkeypatch.setitem(scrapers._SCRAPERS, 'debian', _Flat())
+    monkeypatch.setitem(scrapers._SCRAPERS, 'ubuntu', _Nested())
+    return fetched
+
+
+def test_results_in_config_order(fetched):
+    """Verify the merged results don't depend on completion order."""
+    repos = [
+        Repo('http://one.example.com/{arch}', ['x', 'y'], RepoType.debian),
+        Repo('http://two.example.com', [], RepoType.ubuntu),
+        Repo('http://three.example.com/{arch}', ['z'], RepoType.debian),
+    ]
+    expected = []
+    for repo in repos:
+        for url in repo:
+            if repo.type == RepoType.debian:
+                expected.extend(_Flat().parse(None, url, []))
+            else:
+                for page_url in _Nested().parse_subpages(None, url, []):
+                    expected.extend(_Nested().parse(None, page_url, []))
+    for _ in range(5):
+        found = engine.scrape(_config(), repos)
+        assert [(item.filename, item.url) for item in found] == expected
+    assert found[0].repo == 'one.example.com'
+    assert found[0].arch == 'x'
+    assert found[2].arch == 'y'
+    assert found[4].repo == 'two.example.com'
+    assert found[4].arch is None
+
+
+def test_urls(fetched, monkeypatch):
+    """Verify every page a scraper asks for is fetched in order."""
+
+    class Pages(_Flat):
+        def urls(self, config, url):
+            return [f'{url}/first', f'{url}/second']
+
+    monkeypatch.setitem(scrapers._SCRAPERS, 'pages', Pages())
+    repos = [Repo('http://one.example.com', [], 'pages')]
+    found = engine.scrape(_config(), repos)
+    assert [item.url for item in found] == [
+        'http://one.example.com/first/a.torrent',
+        'http://one.example.com/first/b.torrent',
+        'http://one.example.com/second/a.torrent',
+        'http://one.example.com/second/b.torrent',
+    ]
+    assert found[0].repo == 'one.example.com'
+
+
+def test_per_host_cap(fetched, monkeypatch):
+    """Verify no more than `per_host` jobs hit a host at once."""
+    lock = threading.Lock()
+    active = {'now': 0, 'max': 0}
+
+    class Slow(Scraper):
+        def parse(self, config, url, chunks):
+            with lock:
+                active['now'] += 1
+                active['max'] = max(active['max'], active['now'])
+            time.sleep(0.02)
+            with lock:
+                active['now'] -= 1
+            return []
+
+    monkeypatch.setitem(scrapers._SCRAPERS, 'debian', Slow())
+    arches = [str(x) for x in range(8)]
+    repos = [Repo('http://one.example.com/{arch}', arches, RepoType.debian)]
+    engine.scrape(_config(workers=8, per_host=3), repos)
+    assert active['max'] == 3
+
+
+def test_recrawl_window(fetched):
+    """Verify only the newest sub-pages are refreshed."""
+    repos = [Repo('http://two.example.com', [], RepoType.ubuntu)]
+    config = _config()
+    config.recrawl = Recrawl(recent=1)
+    engine.scrape(config, repos)
+    assert fetched == {
+        'http://two.example.com': True,
+        'http://two.example.com/1.0': False,
+        'http://two.example.com/2.0': False,
+        'http://two.example.com/3.0': True,
+    }
+    config.recrawl = Recrawl(recent=1, full=True)
+    engine.scrape(config, repos)
+    assert all(fetched.values())
+
+
+def test_broken_scraper(fetched, monkeypatch):
+    """Verify a scraper that raises only loses its own repo."""
+
+    class Broken(Scraper):
+        def parse(self, config, url, chunks):
+            raise RuntimeError('broken')
+
+    class BadUrls(_Flat):
+        def urls(self, config, url):
+            raise RuntimeError('broken')
+
+    monkeypatch.setitem(scrapers._SCRAPERS, 'broken', Broken())
+    monkeypatch.setitem(scrapers._SCRAPERS, 'bad_urls', BadUrls())
+    repos = [
+        Repo('http://one.example.com', [], 'broken', 'one'),
+        Repo('http://two.example.com', [], RepoType.debian, 'two'),
+        Repo('http://three.example.com', [], 'bad_urls', 'three'),
+    ]
+    scraper = engine.Engine(_config())
+    found = scraper.scrape(repos)
+    assert [item.url for item in found] == [
+        'http://two.example.com/a.torrent',
+        'http://two.example.com/b.torrent',
+    ]
+    assert scraper.incomplete == {'one', 'three'}
@@ -0,0 +1,268 @@
+"""Tests for the manifest scraper."""
+
+import json
+import pathlib
+
+import pytest
+import threading
+
+from linux_rss_server.__main__ import ScraperThread
+from linux_rss_server.config import Config, Repo, RepoType, Retention
+from linux_rss_server.feed import Feed
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.scrapers import engine, page
+from linux_rss_server.scrapers.manifest import Manifest
+
+NETINST = 'a' * 64
+DVD = 'b' * 64
+SHA256SUMS = f'''\
+{NETINST}  debian-12.5.0-amd64-netinst.iso
+{DVD} *./debian-12.5.0-amd64-DVD-1.iso
+
+not a checksum line
+'''
+BSD_SUMS = f'''\
+SHA256 (debian-12.5.0-amd64-netinst.iso) = {NETINST.upper()}
+SHA256 (debian-12.5.0-amd64-netinst.iso.torrent) = {DVD}
+'''
+RELEASES = [
+    {
+        'link': 'https://download.example.com/f40/Fedora-40.iso.torrent',
+        'sha256': NETINST,
+        'size': '2295853056',
+    },
+    {'link': 'f40/Fedora-40.iso', 'checksum': f'sha1:{"c" * 40}'},
+    {'name': 'no link'},
+]
+OPTIONS = {'companions': True}
+OPTIONS_CONFIG = '''\
+---
+repos:
+  - url_format: 'https://cdimage.example.com/SHA256SUMS'
+    type: {type}
+    options:
+      {options}
+rss_cache: '{rss_cache}'
+'''
+
+
+def _config(tmp_path: pathlib.Path) -> Config:
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    return Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=tmp_path.joinpath('feed.rss'),
+        start_at=None,
+        file_extension='.torrent',
+    )
+
+
+def test_only_listed(mirror, tmp_path):
+    """Verify nothing is found in a manifest without torrents."""
+    mirror.pages['/bt-cd/SHA256SUMS'] = SHA256SUMS
+    url = f'{mirror.url}/bt-cd/SHA256SUMS'
+    config = _config(tmp_path)
+    config.repos = [Repo(url, None, RepoType.manifest, 'debian')]
+    assert engine.scrape(config, config.repos) == []
+
+
+def test_companions(mirror, tmp_path):
+    """Verify the files listed in a checksum file get torrents if asked."""
+    mirror.pages['/bt-cd/SHA256SUMS'] = SHA256SUMS
+    url = f'{mirror.url}/bt-cd/SHA256SUMS'
+    config = _config(tmp_path)
+    config.repos = [Repo(url, None, RepoType.manifest, 'debian')]
+    assert engine.scrape(config, config.repos) == []
+    config.repos[0].options = OPTIONS
+    found = engine.scrape(config, config.repos)
+    assert [tuple(item) for item in found] == [
+        (
+            'debian-12.5.0-amd64-netinst.iso.torrent',
+            f'{mirror.url}/bt-cd/debian-12.5.0-amd64-netinst.iso.torrent',
+            'debian',
+            None,
+            None,
+            None,
+        ),
+        (
+            'debian-12.5.0-amd64-DVD-1.iso.torrent',
+            f'{mirror.url}/bt-cd/debian-12.5.0-amd64-DVD-1.iso.torrent',
+            'debian',
+            None,
+            None,
+            None,
+        ),
+    ]
+
+
+def test_companions_per_repo(mirror, tmp_path):
+    """Verify repos of the same manifest keep their own options."""
+    mirror.pages['/bt-cd/SHA256SUMS'] = SHA256SUMS
+    url = f'{mirror.url}/bt-cd/SHA256SUMS'
+    config = _config(tmp_path)
+    config.repos = [
+        Repo(url, None, RepoType.manifest, 'plain'),
+        Repo(url, None, RepoType.manifest, 'paired', options=OPTIONS),
+    ]
+    found = engine.scrape(config, config.repos)
+    assert {item.repo for item in found} == {'paired'}
+    assert len(found) == 2
+
+
+@pytest.mark.parametrize(
+    'repo_type, options',
+    [
+        ('debian', 'companions: true'),
+        ('manifest', 'companions: sometimes'),
+        ('manifest', 'pairs: true'),
+    ],
+)
+def test_invalid_options(tmp_path, repo_type, options):
+    """Verify only manifest repos take companions, as true or false."""
+    config_file = tmp_path / 'config.yml'
+    config_file.write_text(
+        OPTIONS_CONFIG.format(
+            type=repo_type,
+            options=options,
+            rss_cache=tmp_path / 'feed.rss',
+        ),
+    )
+    with pytest.raises(ValueError):
+        Config.from_file(config_file)
+
+
+def test_options(tmp_path):
+    """Verify the options of a manifest repo are loaded."""
+    config_file = tmp_path / 'config.yml'
+    config_file.write_text(
+        OPTIONS_CONFIG.format(
+            type='manifest',
+            options='companions: true',
+            rss_cache=tmp_path / 'feed.rss',
+        ),
+    )
+    assert Config.from_file(config_file).repos[0].options == OPTIONS
+
+
+def test_bsd_sums(tmp_path):
+    """Verify tagged checksums and listed torrents are used as they are."""
+    found = list(
+        Manifest().parse(
+            _config(tmp_path),
+            'http://x/bt-cd/SHA256SUMS',
+            [BSD_SUMS.encode()],
+        ),
+    )
+    assert found == [
+        (
+            'debian-12.5.0-amd64-netinst.iso.torrent',
+            'http://x/bt-cd/debian-12.5.0-amd64-netinst.iso.torrent',
+            f'sha256:{DVD}',
+            None,
+        ),
+    ]
+
+
+def test_streaming(tmp_path):
+    """Verify lines split across chunks are put back together."""
+    config = _config(tmp_path)
+    url = 'http://x/bt-cd/SHA256SUMS'
+    content = SHA256SUMS.encode()
+    whole = list(Manifest().parse(config, url, [content]))
+    for size in (1, 7, 64):
+        chunks = [
+            content[start : start + size]
+            for start in range(0, len(content), size)
+        ]
+        assert list(Manifest().parse(config, url, chunks)) == whole
+
+
+def test_json(tmp_path):
+    """Verify JSON manifests are read with their sizes and checksums."""
+    url = 'https://example.com/releases.json'
+    content = json.dumps({'releases': RELEASES}).encode()
+    found = list(Manifest().parse(_config(tmp_path), url, [b'\n', content]))
+    assert found == [
+        (
+            'Fedora-40.iso.torrent',
+            'https://download.example.com/f40/Fedora-40.iso.torrent',
+            f'sha256:{NETINST}',
+            2295853056,
+        ),
+    ]
+
+
+def test_feed_description(tmp_path):
+    """Verify the checksum and size of a file go in its description."""
+    feed = Feed(_config(tmp_path))
+    feed.load()
+    feed.append('a.torrent', 'http://x/a.torrent', checksum='md5:ab', size=3)
+    feed.append('b.torrent', 'http://x/b.torrent')
+    assert feed.get('http://x/a.torrent').description == (
+        'a.torrent (md5:ab, 3 bytes)'
+    )
+    assert feed.get('http://x/b.torrent').description == 'b.torrent'
+    feed.close()
+
+
+def test_unchanged_repo(mirror, tmp_path, monkeypatch):
+    """Verify the files of a repo with the same manifest aren't re-added."""
+    mirror.pages['/one/SHA256SUMS'] = SHA256SUMS
+    mirror.pages['/two/SHA256SUMS'] = SHA256SUMS
+    config = _config(tmp_path)
+    config.repos = [
+        Repo(f'{mirror.url}/one/SHA256SUMS', None, RepoType.manifest, 'one'),
+        Repo(f'{mirror.url}/two/SHA256SUMS', None, RepoType.manifest, 'two'),
+    ]
+    for repo in config.repos:
+        repo.options = OPTIONS
+    scraper = ScraperThread(config, threading.Event(), Publisher())
+    scraper._setup()
+    appended = []
+    append = Feed.append
+
+    def spy(self, name, url, repo=None, *args):
+        appended.append(repo)
+        return append(self, name, url, repo, *args)
+
+    monkeypatch.setattr(Feed, 'append', spy)
+    assert scraper._generate_feed(config.repos) == {'one', 'two'}
+    assert appended == ['one', 'one', 'two', 'two']
+    appended.clear()
+    mirror.pages['/two/SHA256SUMS'] = SHA256SUMS + f'{"d" * 64}  new.iso\n'
+    assert scraper._generate_feed(config.repos) == {'two'}
+    assert appended == ['two', 'two', 'two']
+    assert len(scraper.feed) == 5
+    scraper.feed.close()
+
+
+def test_readded_arch(mirror, tmp_path):
+    """Verify the files of an unchanged repo are re-added if they're gone."""
+    for arch in ('a', 'b'):
+        mirror.pages[f'/{arch}/SHA256SUMS'] = SHA256SUMS
+    config = _config(tmp_path)
+    config.retention = Retention(drop_missing=True)
+    repo = Repo(
+        f'{mirror.url}/{{arch}}/SHA256SUMS',
+        ['a', 'b'],
+        RepoType.manifest,
+        'debian',
+        options=OPTIONS,
+    )
+    config.repos = [repo]
+    scraper = ScraperThread(config, threading.Event(), Publisher())
+    scraper._setup()
+    scraper._generate_feed(config.repos)
+    assert len(scraper.feed) == 4
+    repo.arches = ['a']
+    scraper._generate_feed(config.repos)
+    assert len(scraper.feed) == 2
+    repo.arches = ['a', 'b']
+    assert scraper._generate_feed(config.repos) == {'debian'}
+    assert len(scraper.feed) == 4
+    repo.name = 'renamed'
+    scraper._generate_feed(config.repos)
+    assert {item.repo for item in scraper.feed.items()} == {'renamed'}
+    scraper.feed.close()
@@ -0,0 +1,186 @@
+"""Tests for fetching pages from mirrors."""
+
+import time
+
+from linux_rss_server.config import Http
+from linux_rss_server.scrapers import page
+
+
+def test_reuses_connections(mirror):
+    """Verify consecutive fetches share one keep-alive connection."""
+    mirror.pages['/a/'] = 'first'
+    mirror.pages['/b/'] = 'second'
+    assert page.get(f'{mirror.url}/a/') == b'first'
+    assert page.get(f'{mirror.url}/b/') == b'second'
+    assert page.get(f'{mirror.url}/a/') == b'first'
+    assert len(mirror.requests) == 3
+    assert len(mirror.peers) == 1
+
+
+def test_read_timeout(mirror):
+    """Verify a hung mirror doesn't stall the scraper."""
+
+    def hang(handler):
+        time.sleep(2)
+
+    mirror.pages['/hung/'] = hang
+    page.configure(Http(connect_timeout=1, read_timeout=0.2))
+    started = time.monotonic()
+    assert page.get(f'{mirror.url}/hung/') == ''
+    assert time.monotonic() - started < 1.5
+
+
+def test_missing_page(mirror):
+    """Verify a missing page gives an empty result."""
+    assert page.get(f'{mirror.url}/nosuch/', attempts=1) == ''
+
+
+def _etag_page(etag: str, body: str):
+    def handler(request):
+        if request.headers.get('If-None-Match') == etag:
+            request.send_response(304)
+            request.send_header('ETag', etag)
+            request.end_headers()
+            return None
+        return body, {'ETag': etag}
+
+    return handler
+
+
+def _parser(calls: list):
+    def parser(chunks: list[bytes]):
+        content = b''.join(chunks)
+        calls.append(content)
+        return [(name, f'http://x/{name}') for name in content.decode().split()]
+
+    return parser
+
+
+def test_conditional_get(mirror, tmp_path):
+    """Verify an unchanged page is replayed without being parsed."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    page.reset_stats()
+    calls = []
+    mirror.pages['/a/'] = _etag_page('"v1"', 'one two')
+    first = page.parse(f'{mirror.url}/a/', _parser(calls))
+    second = page.parse(f'{mirror.url}/a/', _parser(calls))
+    assert first == second == [('one', 'http://x/one'), ('two', 'http://x/two')]
+    assert len(calls) == 1
+    assert mirror.requests[1][1]['If-None-Match'] == '"v1"'
+    assert page.stats() == {'fetched': 1, 'unchanged': 1}
+
+
+def test_conditional_get_persists(mirror, tmp_path):
+    """Verify validators survive a restart."""
+    cache = tmp_path.joinpath('pages.json')
+    page.load_cache(cache)
+    calls = []
+    mirror.pages['/a/'] = _etag_page('"v1"', 'one')
+    page.parse(f'{mirror.url}/a/', _parser(calls))
+    page.save_cache()
+    page.load_cache(tmp_path.joinpath('other.json'))
+    page.load_cache(cache)
+    assert page.parse(f'{mirror.url}/a/', _parser(calls)) == [
+        ('one', 'http://x/one'),
+    ]
+    assert len(calls) == 1
+
+
+def test_changed_page_is_parsed(mirror, tmp_path):
+    """Verify a changed page or a different variant is parsed again."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    calls = []
+    mirror.pages['/a/'] = _etag_page('"v1"', 'one')
+    page.parse(f'{mirror.url}/a/', _parser(calls))
+    mirror.pages['/a/'] = _etag_page('"v2"', 'one two')
+    assert len(page.parse(f'{mirror.url}/a/', _parser(calls))) == 2
+    mirror.pages['/a/'] = _etag_page('"v2"', 'one two')
+    page.parse(f'{mirror.url}/a/', _parser(calls), variant='.iso')
+    assert len(calls) == 3
+
+
+def test_identical_content_is_unchanged(mirror, tmp_path):
+    """Verify a page without validators is unchanged if its content is."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    page.reset_stats()
+    calls = []
+    url = f'{mirror.url}/a/'
+    mirror.pages['/a/'] = 'one two'
+    first = page.parse(url, _parser(calls))
+    assert not page.unchanged(url)
+    assert page.parse(url, _parser(calls)) == first
+    assert page.unchanged(url)
+    assert len(calls) == 1
+    mirror.pages['/a/'] = 'one two three'
+    assert len(page.parse(url, _parser(calls))) == 3
+    assert len(calls) == 2
+    assert page.stats() == {'fetched': 2, 'unchanged': 1}
+
+
+def test_streamed_to_parser(mirror, tmp_path):
+    """Verify the parser gets the page a chunk at a time as it's read."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    body = b'x' * (3 * page._CHUNK_SIZE)
+    mirror.pages['/a/'] = body
+    sizes = []
+
+    def parser(chunks):
+        for chunk in chunks:
+            sizes.append(len(chunk))
+            # Stop early, the rest is still read for the digest.
+            return []
+
+    page.parse(f'{mirror.url}/a/', parser)
+    assert sizes == [page._CHUNK_SIZE]
+    page.reset_stats()
+    page.parse(f'{mirror.url}/a/', parser)
+    assert page.unchanged(f'{mirror.url}/a/')
+
+
+def test_skip_harvested_page(mirror, tmp_path):
+    """Verify a page parsed before isn't fetched again without refresh."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    calls = []
+    mirror.pages['/a/'] = 'one two'
+    url = f'{mirror.url}/a/'
+    first = page.parse(url, _parser(calls), refresh=False)
+    second = page.parse(url, _parser(calls), refresh=False)
+    assert first == second == [('one', 'http://x/one'), ('two', 'http://x/two')]
+    assert len(mirror.requests) == 1
+    assert len(calls) == 1
+    assert page.stats()['fetched'] == 1
+    assert page.stats()['skipped'] == 1
+    page.parse(url, _parser(calls), variant='.iso', refresh=False)
+    assert len(mirror.requests) == 2
+
+
+def test_cache_evicts_least_recently_used(mirror, tmp_path):
+    """Verify the page cache is bounded."""
+    page.configure(Http(page_cache_size=2))
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    calls = []
+    for path in ('/a/', '/b/', '/c/'):
+        mirror.pages[path] = 'one'
+    page.parse(f'{mirror.url}/a/', _parser(calls))
+    page.parse(f'{mirror.url}/b/', _parser(calls))
+    page.parse(f'{mirror.url}/a/', _parser(calls))
+    page.parse(f'{mirror.url}/c/', _parser(calls))
+    assert len(page._cache) == 2
+    assert page._cache.get(f'{mirror.url}/a/') is not None
+    assert page._cache.get(f'{mirror.url}/b/') is None
+
+
+def test_metrics(mirror, tmp_path):
+    """Verify fetches and parses are measured."""
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    url = f'{mirror.url}/a/'
+    mirror.pages['/a/'] = 'one two'
+    fetched = page.PAGES.get(result='fetched')
+    unchanged = page.PAGES.get(result='unchanged')
+    parsed = page.PARSE_SECONDS.count(scraper='test_page')
+    page.parse(url, _parser([]))
+    page.parse(url, _parser([]))
+    assert page.FETCH_SECONDS.count(url=url) == 2
+    assert page.PARSE_SECONDS.count(scraper='test_page') == parsed + 1
+    assert page.PAGES.get(result='fetched') == fetched + 1
+    assert page.PAGES.get(result='unchanged') == unchanged + 1
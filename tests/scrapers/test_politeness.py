@@ -0,0 +1,248 @@
+"""Tests for the per host request limits."""
+
+import email.utils
+import pathlib
+import threading
+import time
+import types
+
+import pytest
+
+from linux_rss_server.config import (
+    Concurrency,
+    Config,
+    Politeness,
+    Repo,
+    RepoType,
+)
+from linux_rss_server.scrapers import page
+from linux_rss_server.scrapers.engine import Engine
+
+NOW = 1700000000
+
+
+class _Clock:
+    """A clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return NOW + self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    """Replace the clock of `page` with a `_Clock`."""
+    clock = _Clock()
+    monkeypatch.setattr(
+        page,
+        'time',
+        types.SimpleNamespace(
+            sleep=clock.sleep,
+            monotonic=clock.monotonic,
+            time=clock.time,
+        ),
+    )
+    return clock
+
+
+def _throttled(responses: list):
+    """Answer with the statuses and headers in `responses`, then a page."""
+
+    def handler(request):
+        if not responses:
+            return 'ok'
+        status, headers = responses.pop(0)
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Length', '0')
+        request.end_headers()
+        return None
+
+    return handler
+
+
+def test_rate(mirror, clock):
+    """Verify requests beyond the burst are spaced out by the rate."""
+    mirror.pages['/a/'] = 'a'
+    page.set_politeness(Politeness(rate=2, burst=2))
+    for _ in range(4):
+        assert page.get(f'{mirror.url}/a/') == b'a'
+    assert clock.sleeps == [0.5, 0.5]
+    clock.sleep(10)
+    clock.sleeps.clear()
+    for _ in range(2):
+        assert page.get(f'{mirror.url}/a/') == b'a'
+    assert clock.sleeps == []
+
+
+def test_hosts(mirror, clock):
+    """Verify every host gets its own limits."""
+    mirror.pages['/a/'] = 'a'
+    host = mirror.url.split('//')[1]
+    page.set_politeness(Politeness(rate=0), {host: Politeness(rate=1)})
+    assert page.politeness(f'{mirror.url}/a/') == Politeness(rate=1)
+    assert page.politeness('http://elsewhere/') == Politeness(rate=0)
+    for _ in range(6):
+        page.get(f'{mirror.url}/a/')
+    assert clock.sleeps == [1, 1]
+
+
+@pytest.mark.parametrize(
+    'retry_after,delay',
+    [
+        ('7', 7),
+        (email.utils.formatdate(NOW + 30, usegmt=True), 30),
+        ('100000', 300),
+        ('soon', 1),
+    ],
+)
+def test_retry_after(mirror, clock, retry_after, delay):
+    """Verify a throttled request is retried when the server asks."""
+    mirror.pages['/a/'] = _throttled([(429, {'Retry-After': retry_after})])
+    page.set_politeness(Politeness(rate=0))
+    assert page.get(f'{mirror.url}/a/') == b'ok'
+    assert clock.sleeps == [delay]
+    assert page.stats()['throttled'] == 1
+
+
+def test_retry_after_blocks_host(mirror, clock):
+    """Verify other requests to a throttled host wait too."""
+    mirror.pages['/a/'] = _throttled([(503, {'Retry-After': '20'})] * 2)
+    mirror.pages['/b/'] = 'b'
+    page.set_politeness(Politeness(rate=0))
+    assert page.get(f'{mirror.url}/a/', attempts=1) == ''
+    assert page.get(f'{mirror.url}/b/') == b'b'
+    assert clock.sleeps == [20]
+
+
+def test_exponential_backoff(mirror, clock):
+    """Verify retries back off exponentially up to `max_delay`."""
+    mirror.pages['/a/'] = _throttled([(503, {})] * 5)
+    page.set_politeness(Politeness(rate=0, backoff=1, max_delay=6))
+    assert page.get(f'{mirror.url}/a/', attempts=5) == ''
+    assert clock.sleeps == [1, 2, 4, 6]
+    assert page.stats()['throttled'] == 5
+
+
+def test_per_host_cap(mirror):
+    """Verify no more than `per_host` requests hit a host at once."""
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def slow(handler):
+        with lock:
+            active.append(handler)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(handler)
+        return 'slow'
+
+    mirror.pages['/slow/'] = slow
+    page.set_politeness(Politeness(rate=0, per_host=2))
+    threads = [
+        threading.Thread(target=page.get, args=(f'{mirror.url}/slow/',))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(peak) == 6
+    assert max(peak) == 2
+
+
+def test_stricter():
+    """Verify repos sharing a host get the strictest limits of both."""
+    loose = Politeness(rate=0, burst=8, backoff=1, max_delay=60)
+    strict = Politeness(rate=1, burst=2, per_host=1, backoff=2, max_delay=30)
+    assert loose.stricter(strict) == Politeness(1, 2, 1, 2, 60)
+    assert strict.stricter(loose) == Politeness(1, 2, 1, 2, 60)
+
+
+def test_engine_politeness():
+    """Verify the engine gives every host the limits of its repos."""
+    config = Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=[
+            Repo('http://one/{arch}/', ['a'], RepoType.debian, 'first'),
+            Repo(
+                'http://one/other/',
+                None,
+                RepoType.debian,
+                'second',
+                politeness=Politeness(rate=1),
+            ),
+            Repo(
+                'http://two/',
+                None,
+                RepoType.debian,
+                'third',
+                politeness=Politeness(per_host=5),
+            ),
+        ],
+        rss_cache=None,
+        start_at=None,
+        concurrency=Concurrency(per_host=3),
+    )
+    hosts = Engine(config)._politeness(config.repos)
+    assert hosts == {
+        'one': Politeness(rate=1, per_host=3),
+        'two': Politeness(per_host=5),
+    }
+
+
+def test_invalid_politeness():
+    """Verify bad limits are refused."""
+    for kwargs in (
+        {'rate': -1},
+        {'burst': 0},
+        {'per_host': 0},
+        {'backoff': 10, 'max_delay': 5},
+    ):
+        with pytest.raises(ValueError):
+            Politeness(**kwargs)
+
+
+def test_from_file(tmp_path: pathlib.Path):
+    """Verify the limits are read from the config and repos override them."""
+    config_file = tmp_path.joinpath('config.yml')
+    config_file.write_text(
+        '---\n'
+        f'rss_cache: {tmp_path}/feed.rss\n'
+        'politeness:\n'
+        '  rate: 0.5\n'
+        '  burst: 3\n'
+        '  max_delay: 120\n'
+        'repos:\n'
+        '  - url_format: http://one.example.com/\n'
+        '    type: debian\n'
+        '    politeness:\n'
+        '      rate: 5\n'
+        '      per_host: 1\n'
+        '  - url_format: http://two.example.com/\n'
+        '    type: debian\n',
+    )
+    config = Config.from_file(config_file)
+    assert config.politeness == Politeness(rate=0.5, burst=3, max_delay=120)
+    assert config.repos[0].politeness == Politeness(
+        rate=5,
+        burst=3,
+        per_host=1,
+        max_delay=120,
+    )
+    assert config.repos[1].politeness is None
@@ -0,0 +1,110 @@
+"""Tests for finding scrapers by repo type."""
+
+import importlib.metadata
+import pathlib
+
+import pytest
+
+from linux_rss_server import scrapers
+from linux_rss_server.config import Config, RepoType
+from linux_rss_server.scrapers.base import Scraper
+from linux_rss_server.scrapers.debian import Debian
+from linux_rss_server.scrapers.ubuntu import Ubuntu
+
+PLUGIN_CONFIG = '''\
+---
+repos:
+  - url_format: 'https://tails.example.com/'
+    type: {type}
+rss_cache: '{rss_cache}'
+'''
+
+
+class _NoParse(Scraper):
+    """A plugin that forgot to implement `Scraper.parse`."""
+
+
+def _entry_point(name: str, value: str) -> importlib.metadata.EntryPoint:
+    return importlib.metadata.EntryPoint(
+        name,
+        value,
+        scrapers.ENTRY_POINT_GROUP,
+    )
+
+
+@pytest.fixture
+def plugins(monkeypatch) -> list:
+    """Replace the installed scraper plugins with the returned list."""
+    installed = []
+    monkeypatch.setattr(scrapers, '_SCRAPERS', {})
+    monkeypatch.setattr(
+        scrapers.importlib.metadata,
+        'entry_points',
+        lambda group: [
+            entry_point
+            for entry_point in installed
+            if entry_point.group == group
+        ],
+    )
+    return installed
+
+
+def test_builtin(plugins):
+    """Verify the built in scrapers are always there."""
+    assert scrapers.types() == {'debian', 'manifest', 'ubuntu'}
+    assert isinstance(scrapers.get(RepoType.debian), Debian)
+    assert isinstance(scrapers.get('ubuntu'), Ubuntu)
+    assert scrapers.get('ubuntu') is scrapers.get('ubuntu')
+    with pytest.raises(KeyError):
+        scrapers.get('fedora')
+
+
+def test_plugin(plugins):
+    """Verify scrapers are loaded from entry points."""
+    plugins.append(
+        _entry_point('tails', 'linux_rss_server.scrapers.debian:Debian'),
+    )
+    plugins.append(
+        _entry_point('ubuntu', 'linux_rss_server.scrapers.debian:Debian'),
+    )
+    assert scrapers.types() == {'debian', 'manifest', 'tails', 'ubuntu'}
+    assert isinstance(scrapers.get('tails'), Debian)
+    assert isinstance(scrapers.get('ubuntu'), Ubuntu)
+
+
+def test_plugin_not_a_scraper(plugins):
+    """Verify an entry point has to name a scraper."""
+    plugins.append(
+        _entry_point('bad', 'linux_rss_server.scrapers:ENTRY_POINT_GROUP'),
+    )
+    with pytest.raises(TypeError):
+        scrapers.get('bad')
+
+
+def test_plugin_incomplete(plugins):
+    """Verify a scraper missing parse methods fails when it's loaded."""
+    plugins.append(_entry_point('broken', f'{__name__}:_NoParse'))
+    with pytest.raises(TypeError):
+        scrapers.get('broken')
+    with pytest.raises(TypeError):
+
+        class NoSubpages(Debian):
+            subpages = True
+
+
+def test_config_repo_type(plugins, tmp_path: pathlib.Path):
+    """Verify repos can have the types of plugins but not unknown ones."""
+    plugins.append(
+        _entry_point('tails', 'linux_rss_server.scrapers.debian:Debian'),
+    )
+    config_file = tmp_path / 'config.yml'
+    rss_cache = tmp_path / 'feed.rss'
+    config_file.write_text(
+        PLUGIN_CONFIG.format(type='Tails', rss_cache=rss_cache),
+    )
+    assert Config.from_file(config_file).repos[0].type == 'tails'
+    config_file.write_text(
+        PLUGIN_CONFIG.format(type='fedora', rss_cache=rss_cache),
+    )
+    with pytest.raises(ValueError):
+        Config.from_file(config_file)
@@ -0,0 +1,125 @@
+"""Tests for the Debian and Ubuntu scrapers."""
+
+import pathlib
+
+from linux_rss_server.config import Config, Recrawl, Repo, RepoType
+from linux_rss_server.scrapers import engine, page
+from linux_rss_server.scrapers.debian import Debian
+
+DEBIAN_LISTING = '''\
+<html><body><table>
+<tr><th><a href="?C=N;O=D">Name</a></th><th>Size</th></tr>
+<tr><td><a href="/debian-cd/current/">Parent Directory</a></td></tr>
+<tr><td><a href="debian-12.5.0-amd64-netinst.iso.torrent">netinst</a></td>
+<td><a href="elsewhere.torrent">mirror</a></td></tr>
+<tr><td><img src="/icons/x.gif"></td>
+<td><a href="not-first-cell.torrent">x</a></td></tr>
+<tr><td><a href="debian-12.5.0-amd64-DVD-1.iso.torrent">DVD</a></td></tr>
+<tr><td><a href="SHA256SUMS">SHA256SUMS</a></td></tr>
+</table></body></html>
+'''
+
+UBUNTU_ROOT = '''\
+<html><body>
+<a href="22.04/">22.04/</a>
+<a href="24.04.1/">24.04.1/</a>
+<a href="noble/">noble/</a>
+<a href="favicon.ico">22.04/</a>
+</body></html>
+'''
+
+UBUNTU_VERSION = '''\
+<html><body>
+<a href="ubuntu-{v}-desktop-amd64.iso">iso</a>
+<a href="ubuntu-{v}-desktop-amd64.iso.torrent">torrent</a>
+<a href="ubuntu-{v}-live-server-amd64.iso.torrent">torrent</a>
+</body></html>
+'''
+
+
+def _config(tmp_path: pathlib.Path, **kwargs) -> Config:
+    page.load_cache(tmp_path.joinpath('pages.json'))
+    return Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=None,
+        start_at=None,
+        file_extension='.torrent',
+        **kwargs,
+    )
+
+
+def _scrape(config: Config, repo_type: str, url: str) -> list:
+    found = engine.scrape(config, [Repo(url, None, repo_type)])
+    return [(item.filename, item.url) for item in found]
+
+
+def test_debian(mirror, tmp_path):
+    """Verify the Debian scraper only takes links heading table rows."""
+    mirror.pages['/bt-cd/'] = DEBIAN_LISTING
+    url = f'{mirror.url}/bt-cd/'
+    assert _scrape(_config(tmp_path), RepoType.debian, url) == [
+        (
+            'debian-12.5.0-amd64-netinst.iso.torrent',
+            f'{url}/debian-12.5.0-amd64-netinst.iso.torrent',
+        ),
+        (
+            'debian-12.5.0-amd64-DVD-1.iso.torrent',
+            f'{url}/debian-12.5.0-amd64-DVD-1.iso.torrent',
+        ),
+    ]
+
+
+def test_ubuntu(mirror, tmp_path):
+    """Verify the Ubuntu scraper follows the version directories."""
+    mirror.pages['/'] = UBUNTU_ROOT
+    mirror.pages['/22.04/'] = UBUNTU_VERSION.format(v='22.04')
+    mirror.pages['/24.04.1/'] = UBUNTU_VERSION.format(v='24.04.1')
+    found = _scrape(_config(tmp_path), RepoType.ubuntu, mirror.url)
+    assert [name for name, _ in found] == [
+        'ubuntu-22.04-desktop-amd64.iso.torrent',
+        'ubuntu-22.04-live-server-amd64.iso.torrent',
+        'ubuntu-24.04.1-desktop-amd64.iso.torrent',
+        'ubuntu-24.04.1-live-server-amd64.iso.torrent',
+    ]
+    assert found[0][1] == (
+        f'{mirror.url}/22.04//ubuntu-22.04-desktop-amd64.iso.torrent'
+    )
+
+
+def test_ubuntu_recrawl(mirror, tmp_path):
+    """Verify only new and recent Ubuntu versions are fetched again."""
+    mirror.pages['/'] = UBUNTU_ROOT.replace(
+        '<a href="noble/">',
+        '<a href="8.04/">8.04/</a>\n<a href="noble/">',
+    )
+    for version in ('8.04', '22.04', '24.04.1'):
+        mirror.pages[f'/{version}/'] = UBUNTU_VERSION.format(v=version)
+    config = _config(tmp_path, recrawl=Recrawl(recent=1))
+    found = _scrape(config, RepoType.ubuntu, mirror.url)
+    assert [name for name, _ in found][::2] == [
+        'ubuntu-8.04-desktop-amd64.iso.torrent',
+        'ubuntu-22.04-desktop-amd64.iso.torrent',
+        'ubuntu-24.04.1-desktop-amd64.iso.torrent',
+    ]
+    mirror.requests.clear()
+    assert _scrape(config, RepoType.ubuntu, mirror.url) == found
+    assert [path for path, _ in mirror.requests] == ['/', '/24.04.1/']
+    mirror.requests.clear()
+    config = _config(tmp_path, recrawl=Recrawl(recent=1, full=True))
+    assert _scrape(config, RepoType.ubuntu, mirror.url) == found
+    assert len(mirror.requests) == 4
+
+
+def test_parse_without_fetching(tmp_path):
+    """Verify a scraper parses content it's given without fetching it."""
+    config = _config(tmp_path)
+    chunks = [DEBIAN_LISTING[:100].encode(), DEBIAN_LISTING[100:].encode()]
+    assert [
+        name for name, _ in Debian().parse(config, 'http://x/bt-cd', chunks)
+    ] == [
+        'debian-12.5.0-amd64-netinst.iso.torrent',
+        'debian-12.5.0-amd64-DVD-1.iso.torrent',
+    ]
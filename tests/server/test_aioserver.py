@@ -0,0 +1,100 @@
+"""Tests for the asyncio server."""
+
+import http.client
+import socket
+import threading
+
+import pytest
+
+from linux_rss_server.aioserver import AsyncServer
+from linux_rss_server.config import Server
+from linux_rss_server.publisher import Publisher
+
+BODY = b'<rss>test</rss>'
+
+
+@pytest.fixture
+def serve():
+    """Run an asyncio server for the duration of a test."""
+    stop = threading.Event()
+    threads = []
+
+    def start(config: Server = None) -> AsyncServer:
+        publisher = Publisher()
+        publisher.publish(BODY)
+        server = AsyncServer(('127.0.0.1', 0), config or Server(), publisher)
+        thread = threading.Thread(
+            target=server.serve_forever,
+            args=(stop,),
+            daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+        assert server.wait_ready(5)
+        return server
+
+    yield start
+    stop.set()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_keep_alive(serve):
+    """Verify several requests are answered on one connection."""
+    server = serve()
+    client = http.client.HTTPConnection(*server.server_address)
+    for _ in range(3):
+        client.request('GET', '/')
+        response = client.getresponse()
+        assert response.status == 200
+        assert response.read() == BODY
+        assert response.getheader('Connection') == 'keep-alive'
+    client.close()
+
+
+def test_pipelining(serve):
+    """Verify pipelined requests are answered in order."""
+    server = serve(Server(max_pipelined=2))
+    with socket.create_connection(server.server_address) as sock:
+        sock.sendall(
+            b'GET / HTTP/1.1\r\nHost: x\r\n\r\n' * 4
+            + b'HEAD / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n',
+        )
+        data = b''
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.count(b'HTTP/1.1 200 OK') == 5
+    assert data.count(BODY) == 4
+    assert data.endswith(b'Connection: close\r\n\r\n')
+
+
+def test_http_1_0_closes(serve):
+    """Verify HTTP/1.0 clients get the connection closed."""
+    server = serve()
+    with socket.create_connection(server.server_address) as sock:
+        sock.sendall(b'GET / HTTP/1.0\r\n\r\n')
+        data = b''
+        while chunk := sock.recv(65536):
+            data += chunk
+    assert data.startswith(b'HTTP/1.1 200 OK')
+    assert data.endswith(BODY)
+
+
+def test_bad_request(serve):
+    """Verify garbage gets a 400."""
+    server = serve()
+    with socket.create_connection(server.server_address) as sock:
+        sock.sendall(b'nonsense\r\n\r\n')
+        assert sock.recv(65536).startswith(b'HTTP/1.1 400 Bad Request')
+
+
+def test_max_connections(serve):
+    """Verify connections over the limit are refused."""
+    server = serve(Server(max_connections=1))
+    with socket.create_connection(server.server_address) as first:
+        first.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        assert first.recv(65536).startswith(b'HTTP/1.1 200 OK')
+        with socket.create_connection(server.server_address) as second:
+            assert second.recv(65536).startswith(
+                b'HTTP/1.1 503 Service Unavailable',
+            )
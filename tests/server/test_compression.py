@@ -0,0 +1,78 @@
+"""Tests for serving precompressed feeds."""
+
+import gzip
+import http
+
+from linux_rss_server import publisher as publisher_module
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import respond
+
+BODY = b'<rss>' + b'<item>test</item>' * 1000 + b'</rss>'
+
+
+def _publisher() -> Publisher:
+    publisher = Publisher()
+    publisher.publish(BODY)
+    return publisher
+
+
+def test_gzip(monkeypatch):
+    """Verify gzip is served when it's the only compression available."""
+    monkeypatch.setattr(publisher_module, 'brotli', None)
+    monkeypatch.setattr(publisher_module, 'zstandard', None)
+    publisher = _publisher()
+    assert list(publisher.current.variants) == ['gzip', 'identity']
+    response = respond(publisher, 'GET', {'Accept-Encoding': 'gzip, br'})
+    headers = dict(response.headers)
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert headers['Content-Length'] == str(len(response.body))
+    assert gzip.decompress(response.body) == BODY
+    assert headers['ETag'] != publisher.current.etag
+
+
+def test_negotiation(monkeypatch):
+    """Verify quality values pick the variant."""
+    monkeypatch.setattr(publisher_module, 'brotli', None)
+    monkeypatch.setattr(publisher_module, 'zstandard', None)
+    publication = _publisher().current
+    for header, encoding in (
+        (None, 'identity'),
+        ('', 'identity'),
+        ('gzip', 'gzip'),
+        ('*', 'gzip'),
+        ('gzip;q=0.5, identity', 'identity'),
+        ('gzip;q=0', 'identity'),
+        ('identity;q=0, *;q=0', 'identity'),
+        ('deflate', 'identity'),
+    ):
+        assert publication.negotiate(header).encoding == encoding, header
+
+
+def test_best_compression_first():
+    """Verify the optional compressions are preferred when installed."""
+    publication = _publisher().current
+    expected = []
+    if publisher_module.brotli is not None:
+        expected.append('br')
+    if publisher_module.zstandard is not None:
+        expected.append('zstd')
+    expected.append('gzip')
+    assert publication.negotiate('gzip, zstd, br').encoding == expected[0]
+
+
+def test_not_modified_any_variant(monkeypatch):
+    """Verify a client revalidating a compressed copy gets a 304."""
+    monkeypatch.setattr(publisher_module, 'brotli', None)
+    monkeypatch.setattr(publisher_module, 'zstandard', None)
+    publisher = _publisher()
+    etag = dict(respond(publisher, 'GET', {'Accept-Encoding': 'gzip'}).headers)[
+        'ETag'
+    ]
+    response = respond(
+        publisher,
+        'GET',
+        {'Accept-Encoding': 'gzip', 'If-None-Match': etag},
+    )
+    assert response.status == http.HTTPStatus.NOT_MODIFIED
+    assert dict(response.headers)['ETag'] == etag
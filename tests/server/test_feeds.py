@@ -0,0 +1,169 @@
+"""Tests for the per repo and per arch feeds."""
+
+import http
+import os
+import pathlib
+
+import feedparser
+import pytest
+
+from linux_rss_server.config import Config
+from linux_rss_server.feed import Feed
+from linux_rss_server.index import Index
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import respond
+
+
+def _config(tmp_path: pathlib.Path) -> Config:
+    return Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=None,
+        repos=None,
+        rss_cache=tmp_path.joinpath('feed.rss'),
+        start_at=None,
+        file_extension=None,
+    )
+
+
+@pytest.fixture(params=[False, True], ids=['memory', 'spooled'])
+def publisher(request, tmp_path: pathlib.Path) -> Publisher:
+    """Publish a feed of two repos with two arches each."""
+    feed = Feed(_config(tmp_path))
+    feed.load()
+    added = 1700000000
+    for repo in ('debian', 'tails'):
+        for arch in ('amd64', 'arm64'):
+            for number in range(3):
+                name = f'{repo}-{number}-{arch}.torrent'
+                feed.append(name, f'http://{repo}/{arch}/{name}', repo, arch)
+                feed.store._db.execute(
+                    'UPDATE items SET added = ? WHERE title = ?',
+                    (added, name),
+                )
+                added += 60
+    body = feed.dump()
+    feed.close()
+    publisher = Publisher(tmp_path / 'spool' if request.param else None)
+    publisher.publish(body, index=feed.index)
+    return publisher
+
+
+def _titles(response) -> list[str]:
+    assert response.status == http.HTTPStatus.OK
+    return [entry.title for entry in feedparser.parse(response.body).entries]
+
+
+def test_whole_feed(publisher: Publisher):
+    """Verify other paths still get the whole feed."""
+    response = respond(publisher, 'GET', {}, '/anything')
+    body = response.body
+    if response.file is not None:
+        body = os.pread(response.file.fileno(), response.length, 0)
+    assert len(feedparser.parse(body).entries) == 12
+
+
+def test_repo(publisher: Publisher):
+    """Verify a repo's feed has all of its arches newest first."""
+    response = respond(publisher, 'GET', {}, '/feeds/debian')
+    assert _titles(response) == [
+        f'debian-{number}-{arch}.torrent'
+        for arch in ('arm64', 'amd64')
+        for number in (2, 1, 0)
+    ]
+    parsed = feedparser.parse(response.body)
+    assert not parsed.bozo
+    assert parsed.feed.title == 'ISO Release Feed'
+
+
+def test_arch(publisher: Publisher):
+    """Verify an arch's feed only has that arch."""
+    response = respond(publisher, 'GET', {}, '/feeds/tails/amd64/')
+    assert _titles(response) == [
+        'tails-2-amd64.torrent',
+        'tails-1-amd64.torrent',
+        'tails-0-amd64.torrent',
+    ]
+
+
+@pytest.mark.parametrize(
+    'query,titles',
+    [
+        ('limit=1', ['debian-2-amd64.torrent']),
+        (
+            'since=1700000060',
+            ['debian-2-amd64.torrent', 'debian-1-amd64.torrent'],
+        ),
+        ('since=2023-11-14T22:15:20', ['debian-2-amd64.torrent']),
+        ('match=*-0-*', ['debian-0-amd64.torrent']),
+        ('limit=0', []),
+    ],
+)
+def test_filters(publisher: Publisher, query: str, titles: list[str]):
+    """Verify the query filters."""
+    response = respond(publisher, 'GET', {}, f'/feeds/debian/amd64?{query}')
+    assert _titles(response) == titles
+
+
+def test_not_modified(publisher: Publisher):
+    """Verify selections can be polled conditionally."""
+    response = respond(publisher, 'GET', {}, '/feeds/debian/amd64?limit=1')
+    etag = dict(response.headers)['ETag']
+    response = respond(
+        publisher,
+        'GET',
+        {'If-None-Match': etag},
+        '/feeds/debian/amd64?limit=1',
+    )
+    assert response.status == http.HTTPStatus.NOT_MODIFIED
+    response = respond(
+        publisher,
+        'GET',
+        {'If-None-Match': etag},
+        '/feeds/debian/amd64?limit=2',
+    )
+    assert response.status == http.HTTPStatus.OK
+
+
+@pytest.mark.parametrize(
+    'path,status',
+    [
+        ('/feeds/ubuntu', http.HTTPStatus.NOT_FOUND),
+        ('/feeds/debian/i386', http.HTTPStatus.NOT_FOUND),
+        ('/feeds/debian/amd64/extra', http.HTTPStatus.NOT_FOUND),
+        ('/feeds/', http.HTTPStatus.NOT_FOUND),
+        ('/feeds/debian?limit=x', http.HTTPStatus.BAD_REQUEST),
+        ('/feeds/debian?limit=-1', http.HTTPStatus.BAD_REQUEST),
+        ('/feeds/debian?since=yesterday', http.HTTPStatus.BAD_REQUEST),
+    ],
+)
+def test_bad_requests(publisher: Publisher, path: str, status):
+    """Verify unknown selections and bad filters are refused."""
+    assert respond(publisher, 'GET', {}, path).status == status
+
+
+def test_no_index():
+    """Verify selections wait for an index."""
+    publisher = Publisher()
+    publisher.publish(b'<rss></rss>')
+    response = respond(publisher, 'GET', {}, '/feeds/debian')
+    assert response.status == http.HTTPStatus.SERVICE_UNAVAILABLE
+
+
+def test_load_index(tmp_path: pathlib.Path):
+    """Verify the index written with the feed is loaded with it."""
+    config = _config(tmp_path)
+    feed = Feed(config)
+    feed.load()
+    feed.append('a.torrent', 'http://debian/amd64/a.torrent', 'debian', 'a')
+    feed.dump()
+    feed.close()
+    index = Index.load(config.feed_index)
+    assert len(index) == 1
+    assert index.etag == feed.index.etag
+    publisher = Publisher()
+    publisher.load(config.rss_cache, config.feed_index)
+    assert publisher.current.index is not None
+    stale = Publisher()
+    stale.publish(b'<rss></rss>', index=index)
+    assert stale.current.index is None
@@ -0,0 +1,60 @@
+"""Tests for serving the metrics."""
+
+import http
+import pathlib
+
+from linux_rss_server import metrics, server
+from linux_rss_server.config import Config
+from linux_rss_server.feed import DUMP_SECONDS, ENTRIES_ADDED, Feed
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import respond
+
+
+def test_metrics():
+    """Verify the metrics are served even before there's a feed."""
+    response = respond(Publisher(), 'GET', {}, '/metrics')
+    assert response.status == http.HTTPStatus.OK
+    assert dict(response.headers)['Content-Type'] == metrics.CONTENT_TYPE
+    assert b'# TYPE linux_rss_http_requests_total counter' in response.body
+    response = respond(Publisher(), 'HEAD', {}, '/metrics')
+    assert response.body == b''
+
+
+def test_request_metrics():
+    """Verify requests are counted by status with the bytes served."""
+    publisher = Publisher()
+    publisher.publish(b'<rss></rss>')
+    ok = server.REQUESTS.get(status=200)
+    not_modified = server.REQUESTS.get(status=304)
+    sent = server.RESPONSE_BYTES.get()
+    observed = server.REQUEST_SECONDS.count(status=200)
+    respond(publisher, 'GET', {})
+    respond(publisher, 'GET', {'If-None-Match': publisher.current.etag})
+    assert server.REQUESTS.get(status=200) == ok + 1
+    assert server.REQUESTS.get(status=304) == not_modified + 1
+    assert server.RESPONSE_BYTES.get() == sent + len(b'<rss></rss>')
+    assert server.REQUEST_SECONDS.count(status=200) == observed + 1
+
+
+def test_feed_metrics(tmp_path: pathlib.Path):
+    """Verify added entries and feed writes are measured."""
+    feed = Feed(
+        Config(
+            check_every=None,
+            healthcheck_url=None,
+            port=None,
+            repos=None,
+            rss_cache=tmp_path.joinpath('feed.rss'),
+            start_at=None,
+        ),
+    )
+    feed.load()
+    added = ENTRIES_ADDED.get(repo='debian')
+    dumps = DUMP_SECONDS.count()
+    feed.append('a.torrent', 'http://debian/a.torrent', 'debian', 'amd64')
+    feed.append('a.torrent', 'http://debian/a.torrent', 'debian', 'amd64')
+    feed.dump()
+    feed.dump()
+    feed.close()
+    assert ENTRIES_ADDED.get(repo='debian') == added + 1
+    assert DUMP_SECONDS.count() == dumps + 1
@@ -0,0 +1,116 @@
+"""Tests for answering feed requests."""
+
+import email.utils
+import http
+import http.client
+import threading
+
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import (
+    ThreadedServer,
+    request_handler_factory,
+    respond,
+)
+
+BODY = b'<rss>test</rss>'
+
+
+def _publisher() -> Publisher:
+    publisher = Publisher()
+    publisher.publish(BODY, modified=1700000000)
+    return publisher
+
+
+def test_nothing_published():
+    """Verify the server asks clients to come back later."""
+    response = respond(Publisher(), 'GET', {})
+    assert response.status == http.HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.body == b''
+
+
+def test_get():
+    """Verify the feed is served with cache headers."""
+    publisher = _publisher()
+    response = respond(publisher, 'GET', {})
+    headers = dict(response.headers)
+    assert response.status == http.HTTPStatus.OK
+    assert response.body == BODY
+    assert headers['Content-Length'] == str(len(BODY))
+    assert headers['ETag'] == publisher.current.etag
+    assert headers['Last-Modified'] == 'Tue, 14 Nov 2023 22:13:20 GMT'
+
+
+def test_head():
+    """Verify HEAD gets the headers without the body."""
+    response = respond(_publisher(), 'HEAD', {})
+    assert response.status == http.HTTPStatus.OK
+    assert response.body == b''
+    assert dict(response.headers)['Content-Length'] == str(len(BODY))
+
+
+def test_if_none_match():
+    """Verify a matching ETag gets a 304."""
+    publisher = _publisher()
+    etag = publisher.current.etag
+    for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        response = respond(publisher, 'GET', {'If-None-Match': header})
+        assert response.status == http.HTTPStatus.NOT_MODIFIED
+        assert response.body == b''
+    response = respond(publisher, 'GET', {'If-None-Match': '"other"'})
+    assert response.status == http.HTTPStatus.OK
+
+
+def test_if_modified_since():
+    """Verify an up to date client gets a 304."""
+    publisher = _publisher()
+    for since, status in (
+        (1700000000, http.HTTPStatus.NOT_MODIFIED),
+        (1700000001, http.HTTPStatus.NOT_MODIFIED),
+        (1699999999, http.HTTPStatus.OK),
+    ):
+        header = email.utils.formatdate(since, usegmt=True)
+        response = respond(publisher, 'GET', {'If-Modified-Since': header})
+        assert response.status == status
+    response = respond(publisher, 'GET', {'If-Modified-Since': 'garbage'})
+    assert response.status == http.HTTPStatus.OK
+
+
+def test_republish_same_body():
+    """Verify publishing the same feed keeps its validators."""
+    publisher = _publisher()
+    current = publisher.current
+    assert publisher.publish(BODY) is current
+    assert publisher.publish(BODY + b' ') is not current
+
+
+def test_serves_over_http():
+    """Verify the threaded server serves the feed on a kept alive socket."""
+    publisher = _publisher()
+    server = ThreadedServer(
+        ('127.0.0.1', 0),
+        request_handler_factory(publisher),
+    )
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={'stop': threading.Event()},
+        daemon=True,
+    )
+    thread.start()
+    try:
+        client = http.client.HTTPConnection(*server.server_address)
+        client.request('GET', '/')
+        response = client.getresponse()
+        assert response.status == 200
+        assert response.read() == BODY
+        client.request(
+            'GET',
+            '/',
+            headers={'If-None-Match': publisher.current.etag},
+        )
+        response = client.getresponse()
+        assert response.status == 304
+        assert response.read() == b''
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,198 @@
+"""Tests for serving spooled feeds and byte ranges."""
+
+import http
+import http.client
+import socket
+import threading
+
+import pytest
+
+from linux_rss_server.aioserver import AsyncServer
+from linux_rss_server.config import Server
+from linux_rss_server.publisher import IDENTITY, Publisher
+from linux_rss_server.server import (
+    ThreadedServer,
+    request_handler_factory,
+    respond,
+)
+
+BODY = b'<rss>' + bytes(range(256)) * 64 + b'</rss>'
+
+
+def _headers(response) -> dict:
+    return dict(response.headers)
+
+
+@pytest.mark.parametrize(
+    'header,start,stop',
+    [
+        ('bytes=0-9', 0, 10),
+        ('bytes=10-', 10, len(BODY)),
+        ('bytes=-10', len(BODY) - 10, len(BODY)),
+        ('bytes=5-100000', 5, len(BODY)),
+        ('bytes=-100000', 0, len(BODY)),
+    ],
+)
+def test_range(header, start, stop):
+    """Verify a satisfiable range gets just those bytes."""
+    publisher = Publisher()
+    publisher.publish(BODY)
+    response = respond(publisher, 'GET', {'Range': header})
+    assert response.status == http.HTTPStatus.PARTIAL_CONTENT
+    assert response.body == BODY[start:stop]
+    headers = _headers(response)
+    assert headers['Content-Length'] == str(stop - start)
+    assert headers['Content-Range'] == f'bytes {start}-{stop - 1}/{len(BODY)}'
+
+
+@pytest.mark.parametrize(
+    'header',
+    ['bytes=0-1,5-6', 'bytes=5-1', 'lines=1-2', 'bytes=a-b', 'bytes=--1'],
+)
+def test_range_ignored(header):
+    """Verify ranges that aren't understood get the whole feed."""
+    publisher = Publisher()
+    publisher.publish(BODY)
+    response = respond(publisher, 'GET', {'Range': header})
+    assert response.status == http.HTTPStatus.OK
+    assert response.body == BODY
+
+
+@pytest.mark.parametrize('header', [f'bytes={len(BODY)}-', 'bytes=-0'])
+def test_range_not_satisfiable(header):
+    """Verify ranges outside the feed are refused."""
+    publisher = Publisher()
+    publisher.publish(BODY)
+    response = respond(publisher, 'GET', {'Range': header})
+    assert response.status == http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+    assert _headers(response)['Content-Range'] == f'bytes */{len(BODY)}'
+
+
+def test_if_range():
+    """Verify a range for another version of the feed gets the whole feed."""
+    publisher = Publisher()
+    publisher.publish(BODY)
+    etag = publisher.current.etag
+    response = respond(
+        publisher,
+        'GET',
+        {'Range': 'bytes=0-9', 'If-Range': etag},
+    )
+    assert response.status == http.HTTPStatus.PARTIAL_CONTENT
+    response = respond(
+        publisher,
+        'GET',
+        {'Range': 'bytes=0-9', 'If-Range': '"stale"'},
+    )
+    assert response.status == http.HTTPStatus.OK
+    assert response.body == BODY
+
+
+def test_spool(tmp_path):
+    """Verify spooled publications live in versioned files."""
+    publisher = Publisher(tmp_path)
+    first = publisher.publish(BODY)
+    assert first.body is None
+    variant = first.variants[IDENTITY]
+    assert variant.body is None
+    assert variant.size == len(BODY)
+    assert (tmp_path / f'{first.etag.strip(chr(34))}.identity').exists()
+    files = set(tmp_path.iterdir())
+    assert len(files) == len(first.variants)
+    second = publisher.publish(BODY + b' ')
+    assert files.isdisjoint(tmp_path.iterdir())
+    assert len(list(tmp_path.iterdir())) == len(second.variants)
+    # The old files are still readable by requests that had them open.
+    variant.file.seek(0)
+    assert variant.file.read() == BODY
+
+
+def test_spool_respond(tmp_path):
+    """Verify spooled publications are answered with the file to send."""
+    publisher = Publisher(tmp_path)
+    publisher.publish(BODY)
+    response = respond(publisher, 'GET', {'Range': 'bytes=10-19'})
+    assert response.body == b''
+    assert response.file is publisher.current.variants[IDENTITY].file
+    assert (response.offset, response.length) == (10, 10)
+    response = respond(publisher, 'HEAD', {})
+    assert response.file is None
+
+
+def test_clean(tmp_path):
+    """Verify files left behind by a previous run are removed."""
+    (tmp_path / 'stale.identity').write_bytes(b'stale')
+    publisher = Publisher(tmp_path)
+    publisher.publish(BODY)
+    publisher.clean()
+    assert len(list(tmp_path.iterdir())) == len(publisher.current.variants)
+
+
+def _serve_threaded(publisher):
+    server = ThreadedServer(
+        ('127.0.0.1', 0),
+        request_handler_factory(publisher),
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.shutdown
+
+
+def _serve_asyncio(publisher):
+    server = AsyncServer(('127.0.0.1', 0), Server(), publisher)
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=server.serve_forever,
+        args=(stop,),
+        daemon=True,
+    )
+    thread.start()
+    server.wait_ready(5)
+    return server, stop.set
+
+
+@pytest.mark.parametrize('serve', [_serve_threaded, _serve_asyncio])
+def test_sendfile(tmp_path, serve):
+    """Verify both engines send spooled feeds and ranges of them."""
+    publisher = Publisher(tmp_path)
+    publisher.publish(BODY)
+    server, stop = serve(publisher)
+    try:
+        client = http.client.HTTPConnection(*server.server_address)
+        client.request('GET', '/')
+        response = client.getresponse()
+        assert response.status == 200
+        assert response.read() == BODY
+        client.request('GET', '/', headers={'Range': 'bytes=100-199'})
+        response = client.getresponse()
+        assert response.status == 206
+        assert response.read() == BODY[100:200]
+        # The connection is still in step after the ranges.
+        client.request('HEAD', '/')
+        response = client.getresponse()
+        assert response.status == 200
+        assert response.read() == b''
+        client.close()
+    finally:
+        stop()
+
+
+def test_sendfile_pipelined(tmp_path):
+    """Verify pipelined responses from files stay in order."""
+    publisher = Publisher(tmp_path)
+    publisher.publish(BODY)
+    server, stop = _serve_asyncio(publisher)
+    try:
+        with socket.create_connection(server.server_address) as sock:
+            sock.sendall(
+                b'GET / HTTP/1.1\r\nHost: x\r\nRange: bytes=0-4\r\n\r\n'
+                b'GET / HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n',
+            )
+            data = b''
+            while chunk := sock.recv(65536):
+                data += chunk
+        first, _, rest = data.partition(b'\r\n\r\n')
+        assert first.startswith(b'HTTP/1.1 206')
+        assert rest.startswith(b'<rss>HTTP/1.1 200 OK')
+        assert rest.endswith(BODY)
+    finally:
+        stop()
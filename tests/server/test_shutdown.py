@@ -0,0 +1,118 @@
+"""Tests for stopping the servers."""
+
+import http.client
+import selectors
+import socket
+import threading
+import time
+
+from linux_rss_server import server as server_module
+from linux_rss_server.aioserver import AsyncServer
+from linux_rss_server.config import Server
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import (
+    StopEvent,
+    ThreadedServer,
+    request_handler_factory,
+)
+
+BODY = b'<rss>test</rss>'
+
+
+def _publisher() -> Publisher:
+    publisher = Publisher()
+    publisher.publish(BODY)
+    return publisher
+
+
+def _start(server, stop) -> threading.Thread:
+    thread = threading.Thread(
+        target=server.serve_forever,
+        kwargs={'stop': stop},
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def test_stop_event_wakes_selector():
+    """Verify a `StopEvent` is readable only while it's set."""
+    stop = StopEvent()
+    with selectors.DefaultSelector() as selector:
+        selector.register(stop, selectors.EVENT_READ)
+        assert selector.select(0) == []
+        stop.set()
+        assert len(selector.select(0)) == 1
+        stop.clear()
+        assert selector.select(0) == []
+    stop.close()
+
+
+def test_threaded_stops_without_polling():
+    """Verify the threaded server stops as soon as `stop` is set."""
+    stop = StopEvent()
+    server = ThreadedServer(
+        ('127.0.0.1', 0),
+        request_handler_factory(_publisher()),
+    )
+    thread = _start(server, stop)
+    time.sleep(0.1)
+    started = time.monotonic()
+    stop.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 0.2
+    server.server_close()
+
+
+def test_threaded_drains(monkeypatch):
+    """Verify requests in progress are answered and idle clients let go."""
+    answering = threading.Event()
+
+    def slow_respond(*args):
+        answering.set()
+        time.sleep(0.3)
+        return respond(*args)
+
+    respond = server_module.respond
+    monkeypatch.setattr(server_module, 'respond', slow_respond)
+    stop = StopEvent()
+    server = ThreadedServer(
+        ('127.0.0.1', 0),
+        request_handler_factory(_publisher()),
+        drain_timeout=5,
+    )
+    thread = _start(server, stop)
+    idle = socket.create_connection(server.server_address)
+    client = http.client.HTTPConnection(*server.server_address)
+    client.request('GET', '/')
+    assert answering.wait(5)
+    started = time.monotonic()
+    stop.set()
+    response = client.getresponse()
+    assert response.status == 200
+    assert response.read() == BODY
+    thread.join(5)
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 2
+    assert idle.recv(1) == b''
+    idle.close()
+    client.close()
+    server.server_close()
+
+
+def test_asyncio_drains():
+    """Verify the asyncio server closes idle connections when stopped."""
+    stop = StopEvent()
+    server = AsyncServer(('127.0.0.1', 0), Server(), _publisher())
+    thread = _start(server, stop)
+    assert server.wait_ready(5)
+    with socket.create_connection(server.server_address) as idle:
+        idle.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        assert idle.recv(65536).startswith(b'HTTP/1.1 200 OK')
+        started = time.monotonic()
+        stop.set()
+        thread.join(5)
+        assert not thread.is_alive()
+        assert time.monotonic() - started < 1
+        assert idle.recv(1) == b''
@@ -0,0 +1,108 @@
+"""Tests for serving the feed quickly after starting."""
+
+import gzip
+import pathlib
+import subprocess
+import sys
+import threading
+import time
+
+from linux_rss_server import publisher as publisher_module
+from linux_rss_server.publisher import IDENTITY, Publisher
+from linux_rss_server.server import respond
+
+BODY = b'<rss>' + b'<item>test</item>' * 1000 + b'</rss>'
+HEAVY = ('bs4', 'feedgen', 'feedparser', 'lxml', 'requests', 'urllib3')
+
+
+def _gate(monkeypatch) -> threading.Event:
+    """Make compression wait until the returned event is set."""
+    release = threading.Event()
+
+    def compress(body: bytes) -> bytes:
+        release.wait(5)
+        return gzip.compress(body, mtime=0)
+
+    monkeypatch.setattr(
+        publisher_module,
+        '_compressors',
+        lambda: {'gzip': compress},
+    )
+    return release
+
+
+def _wait_for(predicate) -> bool:
+    deadline = time.monotonic() + 5
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_serving_imports():
+    """Verify the entry point doesn't import the scraping libraries."""
+    code = (
+        'import sys, linux_rss_server.__main__, linux_rss_server.workers; '
+        f'print(",".join(m for m in {HEAVY!r} if m in sys.modules))'
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.strip() == ''
+
+
+def test_deferred_compression(monkeypatch):
+    """Verify a deferred feed is served before it's compressed."""
+    release = _gate(monkeypatch)
+    publisher = Publisher()
+    first = publisher.publish(BODY, defer=True)
+    assert list(first.variants) == [IDENTITY]
+    response = respond(publisher, 'GET', {'Accept-Encoding': 'gzip'})
+    assert response.body == BODY
+    release.set()
+    assert _wait_for(lambda: 'gzip' in publisher.current.variants)
+    assert publisher.current.etag == first.etag
+    assert publisher.current.modified == first.modified
+    response = respond(publisher, 'GET', {'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(response.body) == BODY
+
+
+def test_deferred_superseded(monkeypatch):
+    """Verify a newer publication isn't replaced by a deferred one."""
+    release = _gate(monkeypatch)
+    publisher = Publisher()
+    publisher.publish(BODY, defer=True)
+    monkeypatch.setattr(publisher_module, '_compressors', lambda: {})
+    newer = publisher.publish(BODY + b' ')
+    release.set()
+    threads = [
+        thread
+        for thread in threading.enumerate()
+        if thread is not threading.current_thread() and thread.daemon
+    ]
+    for thread in threads:
+        thread.join(1)
+    assert publisher.current is newer
+
+
+def test_deferred_load_spooled(monkeypatch, tmp_path: pathlib.Path):
+    """Verify a spooled feed loaded at startup gets its variants."""
+    release = _gate(monkeypatch)
+    rss = tmp_path / 'feed.rss'
+    rss.write_bytes(BODY)
+    spool = tmp_path / 'spool'
+    publisher = Publisher(spool)
+    first = publisher.load(rss, defer=True)
+    assert first.modified == rss.stat().st_mtime
+    assert len(list(spool.iterdir())) == 1
+    release.set()
+    assert _wait_for(lambda: 'gzip' in publisher.current.variants)
+    assert len(list(spool.iterdir())) == 2
+    variant = publisher.current.variants['gzip']
+    assert gzip.decompress(pathlib.Path(variant.file.name).read_bytes()) == (
+        BODY
+    )
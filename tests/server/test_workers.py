@@ -0,0 +1,170 @@
+"""Tests for serving from worker processes."""
+
+import http.client
+import pathlib
+import re
+import socket
+import threading
+import time
+
+import pytest
+
+from linux_rss_server.config import Config, Server
+from linux_rss_server.publisher import Publisher
+from linux_rss_server.server import StopEvent
+from linux_rss_server.workers import METRICS_INTERVAL, Workers
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(port: int, timeout: float = 10, path: str = '/') -> bytes:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            client.request('GET', path)
+            response = client.getresponse()
+            body = response.read()
+            client.close()
+            if response.status == 200:
+                return body
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError('The workers never answered')
+        time.sleep(0.05)
+
+
+def _replace(path: pathlib.Path, body: bytes):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    tmp.write_bytes(body)
+    tmp.replace(path)
+
+
+def test_watch_reloads(tmp_path):
+    """Verify the publisher picks up a replaced feed file."""
+    path = tmp_path / 'feed.rss'
+    publisher = Publisher()
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=publisher.watch,
+        args=(path, stop, 0.01),
+        daemon=True,
+    )
+    thread.start()
+    _replace(path, b'<rss>one</rss>')
+    deadline = time.monotonic() + 5
+    while publisher.current is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert publisher.current.body == b'<rss>one</rss>'
+    _replace(path, b'<rss>two</rss>')
+    while (
+        publisher.current.body != b'<rss>two</rss>'
+        and time.monotonic() < deadline
+    ):
+        time.sleep(0.01)
+    assert publisher.current.body == b'<rss>two</rss>'
+    stop.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+@pytest.mark.parametrize('notify', [False, True])
+def test_workers_share_port(tmp_path, notify):
+    """Verify the workers serve the feed and reload it when it changes."""
+    path = tmp_path / 'feed.rss'
+    _replace(path, b'<rss>one</rss>')
+    port = _free_port()
+    config = Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=port,
+        repos=None,
+        rss_cache=path,
+        start_at=None,
+        server=Server(
+            workers=2,
+            reload_interval=600 if notify else 0.05,
+            drain_timeout=1,
+        ),
+    )
+    workers = Workers(config)
+    stop = StopEvent()
+    workers.start()
+    watcher = threading.Thread(target=workers.watch, args=(stop,))
+    watcher.start()
+    try:
+        assert _get(port) == b'<rss>one</rss>'
+        _replace(path, b'<rss>two</rss>')
+        if notify:
+            workers.notify()
+        deadline = time.monotonic() + 10
+        # Every worker has to reload so keep asking until a run of fresh
+        # connections all see the new feed.
+        while any(_get(port) != b'<rss>two</rss>' for _ in range(10)):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        watcher.join(5)
+        workers.stop(5)
+    assert workers.exitcode == 0
+    assert not any(
+        process.is_alive() for process, _ in workers.processes.values()
+    )
+
+
+def test_workers_share_metrics(tmp_path):
+    """Verify every worker serves the request counts of all of them."""
+    path = tmp_path / 'feed.rss'
+    _replace(path, b'<rss>one</rss>')
+    port = _free_port()
+    config = Config(
+        check_every=None,
+        healthcheck_url=None,
+        port=port,
+        repos=None,
+        rss_cache=path,
+        start_at=None,
+        server=Server(workers=2, drain_timeout=1),
+    )
+    workers = Workers(config)
+    stop = StopEvent()
+    workers.start()
+    watcher = threading.Thread(target=workers.watch, args=(stop,))
+    watcher.start()
+    counts = {}
+    complete = 0
+    try:
+        deadline = time.monotonic() + METRICS_INTERVAL + 20
+        # Keep going for a while after a response has the counts of both
+        # workers.
+        while complete < 10:
+            assert time.monotonic() < deadline
+            for _ in range(10):
+                _get(port)
+            text = _get(port, path='/metrics').decode()
+            assert text.count('# TYPE linux_rss_http_requests_total ') == 1
+            found = dict(
+                re.findall(
+                    r'linux_rss_http_requests_total'
+                    r'\{worker="(\d+)",status="200"\} (\d+)',
+                    text,
+                ),
+            )
+            for worker, count in found.items():
+                # The counts never go backwards whichever worker answers.
+                assert int(count) >= counts.get(worker, 0)
+                counts[worker] = int(count)
+            if set(found) == {'0', '1'}:
+                complete += 1
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        watcher.join(5)
+        workers.stop(5)
+    assert workers.exitcode == 0